@@ -1,7 +1,17 @@
-import json
-from typing import List
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from langchain_core.runnables import RunnableConfig
 from shared.state import ResearchState, CuratedSection, Subtopic
-from config.models import llm_invoke
+from config.models import allm_invoke, llm_invoke
+from agents.speculative import SPECULATIVE_CURATION, SPECULATOR, thread_id_of
+from shared.router import ROUTER, TIER_ROUTER
+from shared.telemetry import TELEMETRY
+from shared.tokens import estimate_tokens, token_budget
+from shared.keywords import KeywordMatcher, load_terms
+from shared.structured import is_parseable, parse_structured, validate_curated
 
 ADVANCED_KEYWORDS = [
     "teoría", "cuántic", "bayes", "bayesiano", "medición causal",
@@ -12,17 +22,122 @@ ADVANCED_KEYWORDS = [
     "macro dinámic", "econometría avanzada", "inferencia causal",
 ]
 
+# Vocabulario extendido opcional (miles de términos, varios idiomas, con pesos).
+# Ver shared.keywords.load_terms para el formato.
+ADVANCED_KEYWORDS_FILE = os.getenv("ADVANCED_KEYWORDS_FILE", "")
+
+
+def build_keyword_matcher(path: str = ADVANCED_KEYWORDS_FILE) -> KeywordMatcher:
+    terms = [(kw, 1.0) for kw in ADVANCED_KEYWORDS]
+    if path:
+        terms.extend(load_terms(path))
+    return KeywordMatcher(terms)
+
+
+# Se construye una sola vez al importar; el scan es de una pasada.
+KEYWORD_MATCHER = build_keyword_matcher()
+
+# Cantidad máxima de llamadas al modelo en vuelo durante la curación.
+# 1 = modo secuencial (comportamiento original).
+CURATOR_MAX_WORKERS = int(os.getenv("CURATOR_MAX_WORKERS", "4"))
+
+CURATOR_SYSTEM_PROMPT = (
+    "Eres el Agente Curador dentro de un sistema de investigación multi-agente.\n"
+    "Recibes un subtema validado por un humano y debes profundizarlo.\n"
+    "Tu salida DEBE ser un JSON ESTRICTO con el siguiente formato:\n"
+    "{\n"
+    "  \"key_points\": [\"punto 1\", \"punto 2\", \"punto 3\"],\n"
+    "  \"synthesis\": \"párrafo breve integrando los puntos clave\",\n"
+    "  \"recommended_sources\": [\"Fuente 1\", \"Fuente 2\", \"Fuente 3\"]\n"
+    "}\n"
+    "Reglas:\n"
+    "- 3 a 6 key_points, concretos, específicos del subtema.\n"
+    "- La synthesis debe ser clara, accionable y referida al subtema, no genérica.\n"
+    "- Las recommended_sources son sugerencias (autores, papers, libros, reportes, instituciones), sin links obligatorios.\n"
+    "- NO incluyas texto fuera del JSON. No uses markdown, ni explicaciones adicionales.\n"
+)
+
+TIER_ORDER = ("cheap", "standard", "premium")
+
+
+def subtopic_key(topic: str, sub: Subtopic) -> str:
+    """Identidad de un subtema para reutilizar su curación: tema + título + justificación."""
+    return "\x1f".join((topic.strip(), sub["title"].strip(), sub.get("rationale", "").strip()))
+
+
+def curator_user_prompt(topic: str, sub: Subtopic) -> str:
+    subtopic_title = sub["title"]
+    rationale = sub.get("rationale", "").strip()
+    return (
+        f"Tema principal: \"{topic}\"\n"
+        f"Subtema: \"{subtopic_title}\"\n"
+        f"Justificación original: \"{rationale}\"\n"
+        "Genera SOLO el JSON indicado."
+    )
+
+
+def _fit_tier_to_prompt_size(tier: str, topic: str, subtopics: List[Subtopic]) -> str:
+    """
+    Sube el tier si el prompt más largo del lote no entra en su presupuesto
+    (p. ej. subtemas agregados a mano con justificaciones muy largas).
+    """
+    if not subtopics:
+        return tier
+    system_tokens = estimate_tokens(CURATOR_SYSTEM_PROMPT)
+    largest = max(estimate_tokens(curator_user_prompt(topic, s)) for s in subtopics) + system_tokens
+    TELEMETRY.record("curator_prompt_estimate", agent="curator", max_prompt_tokens=largest)
+    return fit_tier_to_prompt_tokens(tier, largest)
+
+
+def fit_tier_to_prompt_tokens(tier: str, prompt_tokens: int) -> str:
+    """Primer tier desde tier hacia arriba cuyo presupuesto admite prompt_tokens."""
+    for candidate in TIER_ORDER[TIER_ORDER.index(tier):]:
+        if prompt_tokens <= token_budget(candidate):
+            return candidate
+    # Ni premium alcanza: llm_invoke recortará el prompt.
+    return "premium"
+
+
 def estimate_curator_tier(topic: str, subtopics: List[Subtopic]) -> str:
     """
     - cheap: temas descriptivos / introductorios
     - standard: mezcla o duda razonable
     - premium: muchos subtemas + señales fuertes de complejidad técnica
 
-    Mira señales semánticas básicas
+    Mira señales semánticas básicas y, al final, el tamaño real de los prompts.
+    """
+    return _fit_tier_to_prompt_size(semantic_tier(topic, subtopics), topic, subtopics)
+
+
+def subtopic_difficulty(topic: str, sub: Subtopic) -> float:
+    """Dificultad 0..1 de un subtema según las señales avanzadas (3 o más = 1)."""
+    text = f"{topic} {sub['title']} {sub.get('rationale', '')}"
+    return min(1.0, KEYWORD_MATCHER.score(text) / 3.0)
+
+
+def curator_prompt_tokens(topic: str, sub: Subtopic) -> int:
+    return estimate_tokens(CURATOR_SYSTEM_PROMPT) + estimate_tokens(curator_user_prompt(topic, sub))
+
+
+def curator_tiers(topic: str, subtopics: List[Subtopic]) -> List[str]:
+    """
+    Tier de cada subtema, en el mismo orden. Con TIER_ROUTER=static es el tier
+    del lote repetido; con "learned" lo elige el router, subtema por subtema.
     """
-    text = (topic + " " + " ".join(s["title"] for s in subtopics)).lower()
+    if TIER_ROUTER != "learned":
+        return [estimate_curator_tier(topic, subtopics)] * len(subtopics)
+    return [
+        ROUTER.route(subtopic_difficulty(topic, sub), curator_prompt_tokens(topic, sub))
+        for sub in subtopics
+    ]
+
+
+def semantic_tier(topic: str, subtopics: List[Subtopic]) -> str:
+    """Tier por lote según las señales avanzadas del tema y la cantidad de subtemas."""
+    text = topic + " " + " ".join(s["title"] for s in subtopics)
 
-    advanced_hits = sum(1 for kw in ADVANCED_KEYWORDS if kw in text)
+    # Puntaje ponderado (con pesos 1 equivale a la cantidad de términos encontrados).
+    advanced_hits = KEYWORD_MATCHER.score(text)
 
     n = len(subtopics)
 
@@ -45,7 +160,83 @@ def estimate_curator_tier(topic: str, subtopics: List[Subtopic]) -> str:
     return "premium"
 
 
-def curator_node(state: ResearchState) -> ResearchState:
+def curated_parseable(raw: str) -> bool:
+    # Solo se cachean respuestas que parse_curated puede usar.
+    return is_parseable(raw, dict, validate_curated)
+
+
+def curate_subtopic(topic: str, sub: Subtopic, tier: str) -> CuratedSection:
+    """
+    Cura un único subtema: una llamada al modelo + parseo con fallback.
+    Si la respuesta no es parseable devuelve contenido genérico para ese subtema,
+    sin afectar al resto.
+    """
+    raw = llm_invoke(tier, CURATOR_SYSTEM_PROMPT, curator_user_prompt(topic, sub), json_mode=True,
+                     cacheable=curated_parseable)
+    return parse_curated(raw, topic, sub["title"], tier)
+
+
+async def acurate_subtopic(topic: str, sub: Subtopic, tier: str) -> CuratedSection:
+    """Versión async de curate_subtopic."""
+    raw = await allm_invoke(tier, CURATOR_SYSTEM_PROMPT, curator_user_prompt(topic, sub), json_mode=True,
+                            cacheable=curated_parseable)
+    return parse_curated(raw, topic, sub["title"], tier)
+
+
+def parse_curated(raw: str, topic: str, subtopic_title: str, tier: str) -> CuratedSection:
+    """Parsea el JSON del curador; ante cualquier problema arma contenido genérico."""
+    # Intentamos parsear el JSON devuelto por el modelo
+    key_points: List[str] = []
+    synthesis: str = ""
+    recommended_sources: List[str] = []
+
+    try:
+        # JSON limpio o recuperado de texto con ruido; validado y normalizado.
+        data = parse_structured(raw, "curator", dict, validate_curated)
+        key_points = data["key_points"]
+        synthesis = data["synthesis"]
+        recommended_sources = data["recommended_sources"]
+
+        # para no dejar nada vacío
+        if not key_points:
+            key_points = [
+                f"Aspectos relevantes a profundizar sobre {subtopic_title} en el contexto de {topic}.",
+            ]
+        if not synthesis:
+            synthesis = (
+                f"Síntesis preliminar sobre {subtopic_title}, destacando los puntos clave "
+                f"y su relación con el tema general {topic}."
+            )
+        if not recommended_sources:
+            recommended_sources = [
+                f"Referencias especializadas sobre {subtopic_title} relacionadas con {topic}.",
+            ]
+
+    except Exception:
+        # en caso que no devuelva nada parseable dejamos que se encargue el reporter
+        TELEMETRY.record("json_fallback", agent="curator", topic=topic, subtopic=subtopic_title, tier=tier)
+        key_points = [
+            f"Analizar el rol de {subtopic_title} dentro de {topic}.",
+            "Identificar evidencia empírica o casos de estudio relevantes.",
+            "Explorar implicancias técnicas, éticas, económicas o regulatorias (según corresponda).",
+        ]
+        synthesis = (
+            f"Análisis preliminar de {subtopic_title} como componente clave de {topic}, "
+            "proponiendo líneas claras para el informe final."
+        )
+        recommended_sources = [
+            f"Artículos académicos y reportes técnicos sobre {subtopic_title}.",
+        ]
+
+    return CuratedSection(
+        subtopic_title=subtopic_title,
+        key_points="\n".join(f"- {kp}" for kp in key_points),
+        synthesis=synthesis,
+        recommended_sources=recommended_sources,
+    )
+
+
+def curator_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> ResearchState:
     """
     Nodo del Agente Curador.
 
@@ -55,6 +246,8 @@ def curator_node(state: ResearchState) -> ResearchState:
 
     Salida:
     - state["curated_sections"]: lista de CuratedSection, una por subtema aprobado.
+    - state["curated_by_key"]: las mismas secciones indexadas por subtopic_key, para
+      que una edición posterior solo recure los subtemas nuevos o modificados.
 
     Rol:
     Toma los subtemas aprobados y, usando un modelo elegido según la complejidad,
@@ -65,117 +258,109 @@ def curator_node(state: ResearchState) -> ResearchState:
     Esto alimenta al reporter, que arma el informe final. 
     """
 
+    topic, approved, tiers, previous, pending = _plan_curation(state)
+    thread_id = thread_id_of(config)
+
+    def curate(sub: Subtopic, tier: str) -> CuratedSection:
+        # Reutilizamos lo curado durante la pausa de aprobación, si sigue siendo válido.
+        if SPECULATIVE_CURATION:
+            section = SPECULATOR.take(thread_id, topic, sub, tier)
+            if section is not None:
+                return section
+        start = time.perf_counter()
+        section = curate_subtopic(topic, sub, tier)
+        _record_route(topic, sub, tier, start)
+        return section
+
+    workers = max(1, min(CURATOR_MAX_WORKERS, len(pending)))
+
+    if workers == 1:
+        fresh: List[CuratedSection] = [curate(sub, tier) for sub, tier in zip(pending, tiers)]
+    else:
+        # map() conserva el orden de entrada, así las secciones salen en el mismo
+        # orden que los subtemas aprobados.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fresh = list(pool.map(curate, pending, tiers))
+
+    return _merge_curation(thread_id, topic, approved, previous, pending, fresh)
+
+
+async def acurator_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> ResearchState:
+    """
+    Versión async de curator_node: las llamadas se lanzan con asyncio.gather,
+    con hasta CURATOR_MAX_WORKERS en vuelo, sin ocupar un hilo por llamada.
+    """
+    topic, approved, tiers, previous, pending = _plan_curation(state)
+    thread_id = thread_id_of(config)
+    semaphore = asyncio.Semaphore(max(1, CURATOR_MAX_WORKERS))
+
+    async def curate(sub: Subtopic, tier: str) -> CuratedSection:
+        if SPECULATIVE_CURATION:
+            # take() puede esperar un future en vuelo: se hace fuera del loop.
+            section = await asyncio.to_thread(SPECULATOR.take, thread_id, topic, sub, tier)
+            if section is not None:
+                return section
+        async with semaphore:
+            start = time.perf_counter()
+            section = await acurate_subtopic(topic, sub, tier)
+            _record_route(topic, sub, tier, start)
+            return section
+
+    # gather() devuelve los resultados en el orden de entrada.
+    fresh = list(await asyncio.gather(*(curate(sub, tier) for sub, tier in zip(pending, tiers))))
+    return _merge_curation(thread_id, topic, approved, previous, pending, fresh)
+
+
+def _record_route(topic: str, sub: Subtopic, tier: str, start: float):
+    # Un evento por subtema curado: junto con json_fallback alimenta al router
+    # aprendido y a bench/route_eval.py.
+    if TELEMETRY.enabled:
+        TELEMETRY.record(
+            "route", agent="curator", topic=topic, subtopic=sub["title"], tier=tier,
+            router=TIER_ROUTER, difficulty=round(subtopic_difficulty(topic, sub), 3),
+            prompt_tokens=curator_prompt_tokens(topic, sub),
+            ms=(time.perf_counter() - start) * 1000.0,
+        )
+
+
+def _plan_curation(state: ResearchState):
+    """Valida la entrada, elige los tiers y separa lo reutilizable de lo que hay que curar."""
     topic = state["topic"]
     approved: List[Subtopic] = state.get("approved_subtopics", [])
 
     if not approved:
         raise ValueError("CuratorNode: no hay subtemas aprobados para analizar.")
 
-    # Selección de tier en base al contenido
-    tier = estimate_curator_tier(topic, approved)
-
     #print(f"[curator] recibió {len(approved)} subtemas aprobados")
-    #print(f"[curator] modelo usado: {tier}")
-
-    curated_sections: List[CuratedSection] = []
-
-    system_prompt = (
-        "Eres el Agente Curador dentro de un sistema de investigación multi-agente.\n"
-        "Recibes un subtema validado por un humano y debes profundizarlo.\n"
-        "Tu salida DEBE ser un JSON ESTRICTO con el siguiente formato:\n"
-        "{\n"
-        "  \"key_points\": [\"punto 1\", \"punto 2\", \"punto 3\"],\n"
-        "  \"synthesis\": \"párrafo breve integrando los puntos clave\",\n"
-        "  \"recommended_sources\": [\"Fuente 1\", \"Fuente 2\", \"Fuente 3\"]\n"
-        "}\n"
-        "Reglas:\n"
-        "- 3 a 6 key_points, concretos, específicos del subtema.\n"
-        "- La synthesis debe ser clara, accionable y referida al subtema, no genérica.\n"
-        "- Las recommended_sources son sugerencias (autores, papers, libros, reportes, instituciones), sin links obligatorios.\n"
-        "- NO incluyas texto fuera del JSON. No uses markdown, ni explicaciones adicionales.\n"
-    )
 
-    for sub in approved:
-        subtopic_title = sub["title"]
-        rationale = sub.get("rationale", "").strip()
-
-        user_prompt = (
-            f"Tema principal: \"{topic}\"\n"
-            f"Subtema: \"{subtopic_title}\"\n"
-            f"Justificación original: \"{rationale}\"\n"
-            "Genera SOLO el JSON indicado."
+    # Secciones de una corrida anterior del mismo thread (edición incremental).
+    previous = state.get("curated_by_key") or {}
+    pending = [sub for sub in approved if subtopic_key(topic, sub) not in previous]
+
+    # Selección de tier en base al contenido: uno por lote (static) o uno por subtema (learned).
+    # El tier estático se calcula sobre todo el plan aprobado, como antes.
+    if TIER_ROUTER == "learned":
+        tiers = curator_tiers(topic, pending)
+    else:
+        tiers = [estimate_curator_tier(topic, approved)] * len(pending)
+    if previous:
+        TELEMETRY.record(
+            "curator_reuse", agent="curator",
+            reused=len(approved) - len(pending), curated=len(pending),
         )
+    return topic, approved, tiers, previous, pending
 
-        raw = llm_invoke(tier, system_prompt, user_prompt)
-
-        # Intentamos parsear el JSON devuelto por el modelo
-        key_points: List[str] = []
-        synthesis: str = ""
-        recommended_sources: List[str] = []
-
-        try:
-            data = json.loads(raw)
-
-            if not isinstance(data, dict):
-                raise ValueError("La respuesta no es un objeto JSON.")
-
-            # key_points
-            raw_kp = data.get("key_points", [])
-            if isinstance(raw_kp, list):
-                key_points = [
-                    str(p).strip()
-                    for p in raw_kp
-                    if str(p).strip()
-                ]
-
-            synthesis = str(data.get("synthesis", "")).strip()
-
-            # recommended_sources
-            raw_src = data.get("recommended_sources", [])
-            if isinstance(raw_src, list):
-                recommended_sources = [
-                    str(s).strip()
-                    for s in raw_src
-                    if str(s).strip()
-                ]
-
-            # para no dejar nada vacío
-            if not key_points:
-                key_points = [
-                    f"Aspectos relevantes a profundizar sobre {subtopic_title} en el contexto de {topic}.",
-                ]
-            if not synthesis:
-                synthesis = (
-                    f"Síntesis preliminar sobre {subtopic_title}, destacando los puntos clave "
-                    f"y su relación con el tema general {topic}."
-                )
-            if not recommended_sources:
-                recommended_sources = [
-                    f"Referencias especializadas sobre {subtopic_title} relacionadas con {topic}.",
-                ]
-
-        except Exception:
-            # en caso que no devuelva nada parseable dejamos que se encargue el reporter
-            key_points = [
-                f"Analizar el rol de {subtopic_title} dentro de {topic}.",
-                "Identificar evidencia empírica o casos de estudio relevantes.",
-                "Explorar implicancias técnicas, éticas, económicas o regulatorias (según corresponda).",
-            ]
-            synthesis = (
-                f"Análisis preliminar de {subtopic_title} como componente clave de {topic}, "
-                "proponiendo líneas claras para el informe final."
-            )
-            recommended_sources = [
-                f"Artículos académicos y reportes técnicos sobre {subtopic_title}.",
-            ]
 
-        curated_sections.append(
-            CuratedSection(
-                subtopic_title=subtopic_title,
-                key_points="\n".join(f"- {kp}" for kp in key_points),
-                synthesis=synthesis,
-                recommended_sources=recommended_sources,
-            )
-        )
+def _merge_curation(thread_id, topic, approved, previous, pending, fresh) -> ResearchState:
+    if SPECULATIVE_CURATION:
+        SPECULATOR.discard(thread_id, topic)
+
+    by_key = dict(previous)
+    by_key.update((subtopic_key(topic, sub), sec) for sub, sec in zip(pending, fresh))
+    curated_sections = [by_key[subtopic_key(topic, sub)] for sub in approved]
 
-    return {"curated_sections": curated_sections}
\ No newline at end of file
+    return {
+        "curated_sections": curated_sections,
+        # Solo se guardan las del plan actual, para no crecer con cada edición.
+        "curated_by_key": {subtopic_key(topic, sub): by_key[subtopic_key(topic, sub)] for sub in approved},
+    }
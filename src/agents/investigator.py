@@ -1,8 +1,54 @@
-import json
 from typing import List
 
 from shared.state import ResearchState, Subtopic
-from config.models import llm_invoke
+from config.models import allm_invoke, llm_invoke
+from shared.telemetry import TELEMETRY
+from shared.dedup import dedup_subtopics
+from shared.structured import is_parseable, parse_structured, validate_subtopics
+
+INVESTIGATOR_SYSTEM_PROMPT = (
+    "Eres el Agente Investigador de un sistema de investigación multi-agente.\n"
+    "Tu tarea es, dado un tema general, proponer entre 5 y 8 subtemas concretos, no redundantes, "
+    "cada uno con una breve justificación (2-3 líneas máximo).\n"
+    "La salida debe ser JSON ESTRICTO, sin texto adicional ni explicaciones.\n"
+    "Formato esperado:\n"
+    "[\n"
+    "  {\"id\": 1, \"title\": \"...\", \"rationale\": \"...\"},\n"
+    "  {\"id\": 2, \"title\": \"...\", \"rationale\": \"...\"}\n"
+    "]\n"
+    "Condiciones:\n"
+    "- Los IDs deben ser enteros consecutivos empezando en 1.\n"
+    "- 'title' debe ser claro y accionable.\n"
+    "- 'rationale' explica por qué ese subtema es relevante para el análisis del tema.\n"
+)
+
+
+def investigator_user_prompt(topic: str) -> str:
+    return f'Tema: "{topic}"\nGenera la lista JSON ahora.'
+
+
+def subtopics_parseable(raw: str) -> bool:
+    # Solo se cachean respuestas que parse_subtopics puede usar.
+    return is_parseable(raw, list, validate_subtopics)
+
+
+def parse_subtopics(raw: str, topic: str) -> List[Subtopic]:
+    """Parsea la respuesta del modelo; si no sirve, devuelve subtemas genéricos."""
+    try:
+        # Tolera fences de markdown, texto alrededor y JSON cortado (ver shared/structured.py).
+        subs = parse_structured(raw, "investigator", list, validate_subtopics)
+
+    except Exception:
+        # por si falla el nodo, que no se rompa el grafo
+        TELEMETRY.record("json_fallback", agent="investigator")
+        subs = [
+            Subtopic(id=1, title=f"Fundamentos de {topic}", rationale="Conceptos base y contexto general."),
+            Subtopic(id=2, title=f"Aplicaciones de {topic}", rationale="Casos de uso y ejemplos prácticos."),
+            Subtopic(id=3, title=f"Desafíos y riesgos en {topic}", rationale="Limitaciones técnicas, éticas o económicas."),
+            Subtopic(id=4, title=f"Perspectivas futuras de {topic}", rationale="Tendencias probables y líneas de evolución."),
+        ]
+
+    return subs
 
 
 def investigator_node(state: ResearchState) -> ResearchState:
@@ -14,62 +60,18 @@ def investigator_node(state: ResearchState) -> ResearchState:
 
     topic = state["topic"]
 
-    system_prompt = (
-        "Eres el Agente Investigador de un sistema de investigación multi-agente.\n"
-        "Tu tarea es, dado un tema general, proponer entre 5 y 8 subtemas concretos, no redundantes, "
-        "cada uno con una breve justificación (2-3 líneas máximo).\n"
-        "La salida debe ser JSON ESTRICTO, sin texto adicional ni explicaciones.\n"
-        "Formato esperado:\n"
-        "[\n"
-        "  {\"id\": 1, \"title\": \"...\", \"rationale\": \"...\"},\n"
-        "  {\"id\": 2, \"title\": \"...\", \"rationale\": \"...\"}\n"
-        "]\n"
-        "Condiciones:\n"
-        "- Los IDs deben ser enteros consecutivos empezando en 1.\n"
-        "- 'title' debe ser claro y accionable.\n"
-        "- 'rationale' explica por qué ese subtema es relevante para el análisis del tema.\n"
-    )
-
-    user_prompt = f'Tema: "{topic}"\nGenera la lista JSON ahora.'
-
     #print(f"[investigator] topic recibido: {topic}")
 
-    raw = llm_invoke("cheap", system_prompt, user_prompt)
+    raw = llm_invoke("cheap", INVESTIGATOR_SYSTEM_PROMPT, investigator_user_prompt(topic),
+                     cacheable=subtopics_parseable)
 
+    # Casi-duplicados fuera antes de la aprobación: cada uno costaría una llamada del Curator.
+    return {"initial_subtopics": dedup_subtopics(parse_subtopics(raw, topic), "investigator")}
 
-    subs: List[Subtopic] = []
-    try:
-        data = json.loads(raw)
-
-        if not isinstance(data, list):
-            raise ValueError("La respuesta no es una lista JSON.")
-
-        for i, item in enumerate(data, start=1):
-            if not isinstance(item, dict):
-                continue
-            title = str(item.get("title", "")).strip()
-            rationale = str(item.get("rationale", "")).strip()
-            if not title:
-                continue
-
-            subs.append(
-                Subtopic(
-                    id=i,
-                    title=title,
-                    rationale=rationale or "Subtema relevante para el análisis del tema."
-                )
-            )
-
-        if not subs:
-            raise ValueError("Lista de subtemas vacía.")
-
-    except Exception:
-        # por si falla el nodo, que no se rompa el grafo 
-        subs = [
-            Subtopic(id=1, title=f"Fundamentos de {topic}", rationale="Conceptos base y contexto general."),
-            Subtopic(id=2, title=f"Aplicaciones de {topic}", rationale="Casos de uso y ejemplos prácticos."),
-            Subtopic(id=3, title=f"Desafíos y riesgos en {topic}", rationale="Limitaciones técnicas, éticas o económicas."),
-            Subtopic(id=4, title=f"Perspectivas futuras de {topic}", rationale="Tendencias probables y líneas de evolución."),
-        ]
 
-    return {"initial_subtopics": subs}
\ No newline at end of file
+async def ainvestigator_node(state: ResearchState) -> ResearchState:
+    """Versión async de investigator_node."""
+    topic = state["topic"]
+    raw = await allm_invoke("cheap", INVESTIGATOR_SYSTEM_PROMPT, investigator_user_prompt(topic),
+                            cacheable=subtopics_parseable)
+    return {"initial_subtopics": dedup_subtopics(parse_subtopics(raw, topic), "investigator")}
@@ -1,26 +1,293 @@
-from typing import List
+import asyncio
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
-from shared.state import ResearchState, CuratedSection
-from config.models import llm_invoke
+from shared.state import REPORT_TOKEN, ResearchState, CuratedSection
+from config.models import allm_invoke, allm_stream, llm_invoke, llm_stream
+from agents.curator import KEYWORD_MATCHER
+from shared.keywords import normalize
+from shared.router import ROUTER, TIER_ROUTER
+from shared.telemetry import TELEMETRY
+from shared.tokens import estimate_tokens
 
+# "auto" (default): map-reduce si el material curado supera el presupuesto,
+# "single": una sola llamada premium, "map_reduce": siempre por secciones.
+REPORTER_MODE = os.getenv("REPORTER_MODE", "auto")
+# Tokens estimados del material curado a partir de los cuales conviene map-reduce.
+REPORTER_MAP_REDUCE_TOKENS = int(os.getenv("REPORTER_MAP_REDUCE_TOKENS", "6000"))
+REPORTER_SECTION_TIER = os.getenv("REPORTER_SECTION_TIER", "premium")
+REPORTER_MAX_WORKERS = int(os.getenv("REPORTER_MAX_WORKERS", "4"))
+# Largo máximo de la síntesis incluida en cada digest del pase final.
+DIGEST_CHARS = 400
 
-def reporter_node(state: ResearchState) -> ResearchState:
+SECTIONS_MARKER = "<<<SECCIONES>>>"
+
+REPORTER_SYSTEM_PROMPT = (
+    "Eres el Agente Reportero de un sistema de investigación multi-agente.\n"
+    "Tu tarea es escribir un INFORME FINAL en ESPAÑOL, en formato MARKDOWN, "
+    "a partir del contenido curado que recibes.\n"
+    "No introduzcas subtemas completamente nuevos; podés profundizar o descomponer los aprobados.\n"
+    "Requisitos del informe:\n"
+    "- Título principal claro.\n"
+    "- Resumen ejecutivo breve (5-8 líneas) al inicio.\n"
+    "- Una sección por cada subtema, con encabezado '## ...'.\n"
+    "- En cada sección, integrar los puntos clave y la síntesis de forma fluida.\n"
+    "- Mencionar o listar fuentes sugeridas cuando aporten claridad (sin necesidad de links reales).\n"
+    "- Conclusión final corta, resaltando hallazgos clave y posibles líneas futuras.\n"
+    "- Estilo: claro, profesional, directo, sin relleno innecesario.\n"
+    "- No inventes datos específicos ni números si no están sugeridos.\n"
+    "- Respeta la estructura, pero podés mejorar el orden lógico.\n"
+)
+
+SECTION_SYSTEM_PROMPT = (
+    "Eres el Agente Reportero de un sistema de investigación multi-agente.\n"
+    "Escribes UNA sola sección de un informe en ESPAÑOL y en MARKDOWN.\n"
+    "Requisitos:\n"
+    "- Empieza exactamente con el encabezado '## <título del subtema>'.\n"
+    "- Integra los puntos clave y la síntesis de forma fluida.\n"
+    "- Menciona fuentes sugeridas cuando aporten claridad (sin links reales).\n"
+    "- No escribas título general, resumen ejecutivo ni conclusión del informe.\n"
+    "- No inventes datos específicos ni números si no están sugeridos.\n"
+)
+
+FRAME_SYSTEM_PROMPT = (
+    "Eres el Agente Reportero de un sistema de investigación multi-agente.\n"
+    "Las secciones del informe ya fueron redactadas; recibes un resumen breve de cada una.\n"
+    "Escribe SOLO el marco del informe en ESPAÑOL y en MARKDOWN, con este formato exacto:\n"
+    "# <Título principal>\n\n"
+    "## Resumen ejecutivo\n"
+    "<5-8 líneas>\n\n"
+    f"{SECTIONS_MARKER}\n\n"
+    "## Conclusión\n"
+    "<conclusión corta: hallazgos clave y posibles líneas futuras>\n"
+    f"No reemplaces ni quites la línea {SECTIONS_MARKER}. No escribas las secciones.\n"
+)
+
+
+def _section_outline(sec: CuratedSection) -> str:
+    title = sec["subtopic_title"]
+    key_points = sec.get("key_points", "").strip()
+    synthesis = sec.get("synthesis", "").strip()
+    sources = sec.get("recommended_sources", [])
+
+    return (
+        f"SUBTEMA: {title}\n"
+        f"PUNTOS CLAVE:\n{key_points}\n\n"
+        f"SINTESIS:\n{synthesis}\n\n"
+        f"FUENTES SUGERIDAS:\n- " + "\n- ".join(sources)
+    )
+
+
+def _fallback_report(topic: str, sections: List[CuratedSection]) -> str:
+    sections_titles = "\n".join(f"- {sec['subtopic_title']}" for sec in sections)
+    return (
+        f"# Informe sobre {topic}\n\n"
+        "## Resumen ejecutivo\n"
+        "Este informe presenta una síntesis estructurada del tema a partir de subtemas clave.\n\n"
+        "## Subtemas abordados\n"
+        f"{sections_titles}\n\n"
+        "## Conclusión\n"
+        "Se recomienda revisar en detalle las secciones anteriores y complementar con fuentes específicas.\n"
+    )
+
+
+def _section_prompt(topic: str, sec: CuratedSection) -> str:
+    return (
+        f"Tema principal del informe: \"{topic}\"\n\n"
+        "Material curado de la sección:\n\n"
+        f"{_section_outline(sec)}\n"
+    )
+
+
+def _finish_section(sec: CuratedSection, text: str) -> str:
+    title = sec["subtopic_title"]
+    text = text.strip()
+    if not text:
+        TELEMETRY.record("empty_section_fallback", agent="reporter", subtopic=title)
+        text = f"{sec.get('synthesis', '').strip()}\n\n{sec.get('key_points', '').strip()}"
+    if not text.startswith("## "):
+        text = f"## {title}\n\n{text}"
+    return text
+
+
+def section_tier(topic: str, sec: CuratedSection) -> str:
     """
-    Nodo del Agente Reportero.
+    REPORTER_SECTION_TIER, o con TIER_ROUTER=learned el tier que elija el router
+    para esta sección (el marco y el pase único siguen en premium).
+    """
+    if TIER_ROUTER != "learned":
+        return REPORTER_SECTION_TIER
+    prompt = _section_prompt(topic, sec)
+    difficulty = min(1.0, KEYWORD_MATCHER.score(f"{topic} {prompt}") / 3.0)
+    return ROUTER.route(difficulty, estimate_tokens(SECTION_SYSTEM_PROMPT) + estimate_tokens(prompt))
 
-    Entrada:
-    - state["topic"]: tema principal.
-    - state["curated_sections"]: lista de secciones curadas por el Curator.
 
-    Salida:
-    - state["final_report"]: string en formato Markdown con el informe final.
+def write_section(topic: str, sec: CuratedSection) -> str:
+    """Redacta la sección '## ...' de un subtema a partir de su CuratedSection."""
+    tier = section_tier(topic, sec)
+    text = llm_invoke(tier, SECTION_SYSTEM_PROMPT, _section_prompt(topic, sec), nostream=True)
+    return _finish_section(sec, text)
 
-    Rol:
-    - Transformar el contenido curado en un informe coherente, claro y presentable.
-    - No investiga desde cero ni decide subtemas: solo organiza y redacta.
-    - Usa siempre un modelo de mayor calidad (tier 'premium'), dado que es la capa de output final.
+
+async def awrite_section(topic: str, sec: CuratedSection) -> str:
+    tier = section_tier(topic, sec)
+    text = await allm_invoke(tier, SECTION_SYSTEM_PROMPT, _section_prompt(topic, sec), nostream=True)
+    return _finish_section(sec, text)
+
+
+def section_key(topic: str, sec: CuratedSection) -> str:
+    """Hash del contenido curado: si no cambió, la sección escrita se reutiliza."""
+    payload = json.dumps([topic, sec], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _frame_prompt(topic: str, sections: List[CuratedSection]) -> str:
+    frame_digest = "\n".join(
+        f"- {sec['subtopic_title']}: {sec.get('synthesis', '').strip()[:DIGEST_CHARS]}"
+        for sec in sections
+    )
+    return f"Tema principal del informe: \"{topic}\"\n\nSecciones:\n{frame_digest}\n"
+
+
+def _pending_sections(topic, sections, previous):
+    keys = [section_key(topic, sec) for sec in sections]
+    pending = [sec for sec, key in zip(sections, keys) if key not in previous]
+    if previous:
+        TELEMETRY.record(
+            "reporter_reuse", agent="reporter",
+            reused=len(sections) - len(pending), written=len(pending),
+        )
+    return keys, pending
+
+
+def _stream_writer():
+    """Writer del stream "custom" del grafo; None fuera de una corrida (p. ej. un test directo)."""
+    try:
+        from langgraph.config import get_stream_writer
+
+        return get_stream_writer()
+    except (ImportError, RuntimeError):
+        return None
+
+
+class _ReportEmitter:
+    """
+    Emite el informe map-reduce por el stream "custom" en el orden final:
+    encabezado del marco, cada sección apenas está lista (respetando el orden
+    curado) y el cierre. Lo emitido, concatenado, es igual a final_report.
+    """
+
+    def __init__(self):
+        self.write = _stream_writer()
+        self.started = False
+
+    def __call__(self, text: str):
+        text = text.strip()
+        if not text or self.write is None:
+            return
+        self.write({REPORT_TOKEN: ("\n\n" if self.started else "") + text})
+        self.started = True
+
+
+def _frame_parts(topic: str, frame: str) -> Tuple[str, str]:
+    """Divide el marco en lo que va antes y después de las secciones."""
+    frame = frame.strip()
+    if SECTIONS_MARKER in frame:
+        head, tail = frame.split(SECTIONS_MARKER, 1)
+        return head, tail
+    if "## Conclusión" in frame:
+        head, tail = frame.split("## Conclusión", 1)
+        return head, "## Conclusión" + tail
+    return frame or f"# Informe sobre {topic}", ""
+
+
+def _assemble(head: str, written: List[str], tail: str) -> str:
+    return "\n\n".join(part.strip() for part in (head, *written, tail) if part.strip())
+
+
+def _map_reduce_report(
+    topic: str,
+    sections: List[CuratedSection],
+    previous: Dict[str, str],
+) -> Tuple[str, Dict[str, str]]:
     """
+    Informe jerárquico: cada sección se redacta en paralelo y un pase premium
+    corto arma título, resumen ejecutivo y conclusión a partir de digests.
+    El prompt del pase final crece con la cantidad de secciones, no con su largo.
 
+    Las llamadas no se muestran token a token (se pisarían entre sí): el
+    informe se emite por partes, en orden, a medida que cada una termina.
+    Las secciones ya escritas en previous (misma sección curada) no se regeneran.
+    Devuelve el informe y el mapa section_key -> texto de las secciones actuales.
+    """
+    keys, pending = _pending_sections(topic, sections, previous)
+    emit = _ReportEmitter()
+
+    workers = max(1, min(REPORTER_MAX_WORKERS, len(pending) + 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        frame_future = pool.submit(
+            llm_invoke, "premium", FRAME_SYSTEM_PROMPT, _frame_prompt(topic, sections), nostream=True
+        )
+        futures = {section_key(topic, sec): pool.submit(write_section, topic, sec) for sec in pending}
+        head, tail = _frame_parts(topic, frame_future.result())
+        emit(head)
+        written = {}
+        for key in keys:
+            written[key] = futures[key].result() if key in futures else previous[key]
+            emit(written[key])
+        emit(tail)
+
+    return _assemble(head, [written[key] for key in keys], tail), written
+
+
+async def _amap_reduce_report(
+    topic: str,
+    sections: List[CuratedSection],
+    previous: Dict[str, str],
+) -> Tuple[str, Dict[str, str]]:
+    """Versión async de _map_reduce_report."""
+    keys, pending = _pending_sections(topic, sections, previous)
+    emit = _ReportEmitter()
+    semaphore = asyncio.Semaphore(max(1, REPORTER_MAX_WORKERS))
+
+    async def write(sec: CuratedSection) -> str:
+        async with semaphore:
+            return await awrite_section(topic, sec)
+
+    frame_task = asyncio.ensure_future(
+        allm_invoke("premium", FRAME_SYSTEM_PROMPT, _frame_prompt(topic, sections), nostream=True)
+    )
+    tasks = {section_key(topic, sec): asyncio.ensure_future(write(sec)) for sec in pending}
+    try:
+        head, tail = _frame_parts(topic, await frame_task)
+        emit(head)
+        written = {}
+        for key in keys:
+            written[key] = await tasks[key] if key in tasks else previous[key]
+            emit(written[key])
+        emit(tail)
+    finally:
+        for task in (frame_task, *tasks.values()):
+            task.cancel()
+
+    return _assemble(head, [written[key] for key in keys], tail), written
+
+
+def use_map_reduce(sections: List[CuratedSection], revising: bool = False) -> bool:
+    mode = REPORTER_MODE.lower()
+    if mode == "single":
+        return False
+    if mode == "map_reduce" or revising:
+        # En una edición, por secciones permite regenerar solo las afectadas.
+        return True
+    outline_tokens = sum(estimate_tokens(_section_outline(sec)) for sec in sections)
+    return outline_tokens > REPORTER_MAP_REDUCE_TOKENS
+
+
+def _report_inputs(state: ResearchState):
     topic = state.get("topic", "").strip()
     sections: List[CuratedSection] = state.get("curated_sections", [])
 
@@ -29,64 +296,122 @@ def reporter_node(state: ResearchState) -> ResearchState:
 
     if not sections:
         raise ValueError("ReporterNode: no hay secciones curadas para construir el informe.")
-    
+
     #print(f"[reporter] generando informe final con {len(sections)} secciones")
 
-    # Preparamos un resumen estructurado de lo que ya hizo el Curator
-    outline_parts = []
-    for sec in sections:
-        title = sec["subtopic_title"]
-        key_points = sec.get("key_points", "").strip()
-        synthesis = sec.get("synthesis", "").strip()
-        sources = sec.get("recommended_sources", [])
-
-        outline_parts.append(
-            f"SUBTEMA: {title}\n"
-            f"PUNTOS CLAVE:\n{key_points}\n\n"
-            f"SINTESIS:\n{synthesis}\n\n"
-            f"FUENTES SUGERIDAS:\n- " + "\n- ".join(sources)
-        )
+    # Si el thread ya tiene un informe, esta corrida es una edición incremental.
+    revising = bool(state.get("final_report"))
+    return topic, sections, use_map_reduce(sections, revising)
 
-    outline = "\n\n---\n\n".join(outline_parts)
-
-    system_prompt = (
-        "Eres el Agente Reportero de un sistema de investigación multi-agente.\n"
-        "Tu tarea es escribir un INFORME FINAL en ESPAÑOL, en formato MARKDOWN, "
-        "a partir del contenido curado que recibes.\n"
-        "No introduzcas subtemas completamente nuevos; podés profundizar o descomponer los aprobados.\n"
-        "Requisitos del informe:\n"
-        "- Título principal claro.\n"
-        "- Resumen ejecutivo breve (5-8 líneas) al inicio.\n"
-        "- Una sección por cada subtema, con encabezado '## ...'.\n"
-        "- En cada sección, integrar los puntos clave y la síntesis de forma fluida.\n"
-        "- Mencionar o listar fuentes sugeridas cuando aporten claridad (sin necesidad de links reales).\n"
-        "- Conclusión final corta, resaltando hallazgos clave y posibles líneas futuras.\n"
-        "- Estilo: claro, profesional, directo, sin relleno innecesario.\n"
-        "- No inventes datos específicos ni números si no están sugeridos.\n"
-        "- Respeta la estructura, pero podés mejorar el orden lógico.\n"
-    )
 
-    user_prompt = (
+def _report_user_prompt(topic: str, sections: List[CuratedSection]) -> str:
+    # Preparamos un resumen estructurado de lo que ya hizo el Curator
+    outline = "\n\n---\n\n".join(_section_outline(sec) for sec in sections)
+    return (
         f"Tema principal del informe: \"{topic}\"\n\n"
         "A continuación tienes el material curado generado por otro agente.\n"
         "Úsalo como base para redactar el informe final en Markdown:\n\n"
         f"{outline}\n"
     )
 
-    report_md = llm_invoke("premium", system_prompt, user_prompt).strip()
 
+def _heading_key(title: str) -> str:
+    return " ".join(normalize(title).strip(" #*:.").split())
+
+
+def split_sections(topic: str, sections: List[CuratedSection], report_md: str) -> Dict[str, str]:
+    """
+    Recorta del informe de pase único el bloque '## ...' de cada subtema y lo
+    indexa por section_key, igual que lo guarda el modo map-reduce. Así la
+    primera edición reutiliza las secciones que no cambiaron. Un subtema cuyo
+    encabezado no se reconoce queda afuera (se redactará de nuevo al editar).
+    """
+    blocks: List[Tuple[str, List[str]]] = []
+    for line in report_md.splitlines():
+        if line.startswith("## "):
+            blocks.append((_heading_key(line[3:]), [line]))
+        elif line.startswith("# "):
+            blocks.append(("", [line]))
+        elif blocks:
+            blocks[-1][1].append(line)
+
+    written: Dict[str, str] = {}
+    used = set()
+    for sec in sections:
+        title = _heading_key(sec["subtopic_title"])
+        if not title:
+            continue
+        # Primero el encabezado idéntico; si no, uno que contenga al título o esté contenido en él.
+        match = next((i for i, (head, _) in enumerate(blocks) if i not in used and head == title), None)
+        if match is None:
+            match = next(
+                (i for i, (head, _) in enumerate(blocks)
+                 if i not in used and head and (title in head or head in title)),
+                None,
+            )
+        if match is not None:
+            used.add(match)
+            written[section_key(topic, sec)] = "\n".join(blocks[match][1]).strip()
+    return written
+
+
+def _single_result(topic: str, sections: List[CuratedSection], report_md: str) -> ResearchState:
+    report_md = report_md.strip()
     # En caso de respuesta vacía o rota
     if not report_md:
         # No debería pasar, pero así no se rompe el grafo
-        sections_titles = "\n".join(f"- {sec['subtopic_title']}" for sec in sections)
-        report_md = (
-            f"# Informe sobre {topic}\n\n"
-            "## Resumen ejecutivo\n"
-            "Este informe presenta una síntesis estructurada del tema a partir de subtemas clave.\n\n"
-            "## Subtemas abordados\n"
-            f"{sections_titles}\n\n"
-            "## Conclusión\n"
-            "Se recomienda revisar en detalle las secciones anteriores y complementar con fuentes específicas.\n"
-        )
+        TELEMETRY.record("empty_report_fallback", agent="reporter")
+        return {"final_report": _fallback_report(topic, sections), "written_sections": {}}
+    return {"final_report": report_md, "written_sections": split_sections(topic, sections, report_md)}
+
+
+def _map_reduce_result(topic, sections, report_md, written) -> ResearchState:
+    return {
+        "final_report": report_md or _fallback_report(topic, sections),
+        "written_sections": written,
+    }
+
+
+def reporter_node(state: ResearchState) -> ResearchState:
+    """
+    Nodo del Agente Reportero.
+
+    Entrada:
+    - state["topic"]: tema principal.
+    - state["curated_sections"]: lista de secciones curadas por el Curator.
+
+    Salida:
+    - state["final_report"]: string en formato Markdown con el informe final.
+
+    Rol:
+    - Transformar el contenido curado en un informe coherente, claro y presentable.
+    - No investiga desde cero ni decide subtemas: solo organiza y redacta.
+    - Usa siempre un modelo de mayor calidad (tier 'premium'), dado que es la capa de output final.
+    - Con mucho material curado, o al editar un informe ya generado, pasa a modo
+      map-reduce (ver _map_reduce_report) y reutiliza las secciones sin cambios.
+      El pase único también guarda sus secciones (split_sections) para eso.
+    """
+    topic, sections, map_reduce = _report_inputs(state)
+
+    if map_reduce:
+        TELEMETRY.record("reporter_mode", agent="reporter", mode="map_reduce", sections=len(sections))
+        report_md, written = _map_reduce_report(topic, sections, state.get("written_sections") or {})
+        return _map_reduce_result(topic, sections, report_md, written)
+
+    # Se pide en streaming para que el runner pueda mostrar el informe mientras
+    # se genera; el texto final es el mismo que con una llamada bloqueante.
+    report_md = llm_stream("premium", REPORTER_SYSTEM_PROMPT, _report_user_prompt(topic, sections))
+    return _single_result(topic, sections, report_md)
+
+
+async def areporter_node(state: ResearchState) -> ResearchState:
+    """Versión async de reporter_node."""
+    topic, sections, map_reduce = _report_inputs(state)
+
+    if map_reduce:
+        TELEMETRY.record("reporter_mode", agent="reporter", mode="map_reduce", sections=len(sections))
+        report_md, written = await _amap_reduce_report(topic, sections, state.get("written_sections") or {})
+        return _map_reduce_result(topic, sections, report_md, written)
 
-    return {"final_report": report_md}
+    report_md = await allm_stream("premium", REPORTER_SYSTEM_PROMPT, _report_user_prompt(topic, sections))
+    return _single_result(topic, sections, report_md)
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from shared.state import CuratedSection, Subtopic
+
+# Curación especulativa: mientras el grafo espera el comando humano en
+# approval_node, se curan en segundo plano los subtemas iniciales.
+SPECULATIVE_CURATION = os.getenv("SPECULATIVE_CURATION", "0").lower() in ("1", "true", "yes")
+SPECULATIVE_MAX_WORKERS = int(os.getenv("SPECULATIVE_MAX_WORKERS", "4"))
+# Trabajos de threads que nunca volvieron de la pausa (sesión abandonada) se
+# descartan pasado este tiempo.
+SPECULATIVE_TTL_S = float(os.getenv("SPECULATIVE_TTL_S", "3600"))
+
+TIER_RANK = {"cheap": 0, "standard": 1, "premium": 2}
+
+# (thread_id, topic, title, rationale)
+SpecKey = Tuple[str, str, str, str]
+
+
+def thread_id_of(config: Optional[dict]) -> str:
+    """thread_id del config de LangGraph ("" si se llama fuera del grafo)."""
+    return str(((config or {}).get("configurable") or {}).get("thread_id", ""))
+
+
+class SpeculativeCurator:
+    """
+    Registro de curaciones lanzadas antes de la aprobación humana.
+
+    - start(): lanza en background la curación de cada subtema inicial.
+    - take(): devuelve la sección ya curada si el subtema sobrevivió sin cambios
+      y el tier especulado alcanza el tier requerido; si no, None.
+    - discard(): cancela / descarta lo que ya no sirve (rechazados o modificados).
+
+    Los trabajos son de un thread: dos sesiones sobre el mismo tema no se
+    cruzan resultados ni se cancelan entre sí. Lo que queda de sesiones
+    abandonadas vence a los ttl_s segundos.
+    """
+
+    def __init__(self, max_workers: int = SPECULATIVE_MAX_WORKERS, ttl_s: float = SPECULATIVE_TTL_S,
+                 clock=time.monotonic):
+        self._max_workers = max_workers
+        self._ttl_s = ttl_s
+        self._clock = clock
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # clave -> (tier, future, creado)
+        self._jobs: Dict[SpecKey, Tuple[str, Future, float]] = {}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="speculative-curator"
+            )
+        return self._executor
+
+    @staticmethod
+    def _key(thread_id: str, topic: str, sub: Subtopic) -> SpecKey:
+        return (thread_id, topic, sub["title"], sub.get("rationale", "").strip())
+
+    def _expire(self):
+        """Descarta trabajos vencidos; se llama con el lock tomado."""
+        if self._ttl_s <= 0:
+            return
+        deadline = self._clock() - self._ttl_s
+        for key in [k for k, job in self._jobs.items() if job[2] < deadline]:
+            self._jobs.pop(key)[1].cancel()
+
+    def start(
+        self,
+        thread_id: str,
+        topic: str,
+        subtopics: List[Subtopic],
+        tier: Union[str, Sequence[str]],
+        curate_fn: Callable[[str, Subtopic, str], CuratedSection],
+    ):
+        # tier: uno para todo el lote o uno por subtema (router aprendido), en el mismo orden.
+        tiers = [tier] * len(subtopics) if isinstance(tier, str) else list(tier)
+        # approval_node se re-ejecuta al reanudar, así que start() debe ser idempotente.
+        with self._lock:
+            self._expire()
+            now = self._clock()
+            for sub, tier in zip(subtopics, tiers):
+                key = self._key(thread_id, topic, sub)
+                if key in self._jobs:
+                    continue
+                future = self._pool().submit(curate_fn, topic, sub, tier)
+                self._jobs[key] = (tier, future, now)
+
+    def take(self, thread_id: str, topic: str, sub: Subtopic, tier: str) -> Optional[CuratedSection]:
+        with self._lock:
+            self._expire()
+            job = self._jobs.pop(self._key(thread_id, topic, sub), None)
+        if job is None:
+            return None
+        spec_tier, future, _ = job
+        if TIER_RANK.get(spec_tier, -1) < TIER_RANK.get(tier, 0):
+            future.cancel()
+            return None
+        try:
+            # Si sigue en vuelo, esperar es más barato que repetir la llamada.
+            return future.result()
+        except Exception:
+            return None
+
+    def discard(self, thread_id: str, topic: str, keep: List[Subtopic] = ()):
+        """Cancela los trabajos del thread que no correspondan a subtemas en keep."""
+        keep_keys = {self._key(thread_id, topic, sub) for sub in keep}
+        with self._lock:
+            stale = [k for k in self._jobs if k[0] == thread_id and k not in keep_keys]
+            for key in stale:
+                self._jobs.pop(key)[1].cancel()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def shutdown(self):
+        with self._lock:
+            for _, future, _ in self._jobs.values():
+                future.cancel()
+            self._jobs.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+SPECULATOR = SpeculativeCurator()
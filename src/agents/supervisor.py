@@ -1,10 +1,16 @@
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
 from langgraph.types import interrupt
 
 from shared.state import ResearchState, Subtopic
 from shared.parser import apply_human_commands
+from shared.dedup import SUBTOPIC_DEDUP, duplicate_hints, flag_duplicates
+from agents.curator import curate_subtopic, curator_tiers
+from agents.speculative import SPECULATIVE_CURATION, SPECULATOR, thread_id_of
 
 
-def approval_node(state: ResearchState) -> ResearchState:
+def approval_node(state: ResearchState, config: Optional[RunnableConfig] = None) -> ResearchState:
     """
     Nodo Supervisor 
     Su función es:
@@ -34,10 +40,24 @@ def approval_node(state: ResearchState) -> ResearchState:
         ),
     }
 
+    # En "merge" ya se fusionaron los duplicados claros; los dudosos se avisan igual.
+    if SUBTOPIC_DEDUP != "off":
+        hints = duplicate_hints(initial)
+        if hints:
+            payload["duplicates"] = hints
+            pairs = ", ".join(f"{a} y {b}" for a, b in (h["ids"] for h in hints))
+            payload["message"] += f"\nPosibles duplicados (podés rechazar o modificar uno): {pairs}."
+
+    # Mientras el humano revisa, curamos en background los subtemas iniciales (opt-in).
+    if SPECULATIVE_CURATION:
+        topic = state.get("topic", "")
+        SPECULATOR.start(thread_id_of(config), topic, initial, curator_tiers(topic, initial), curate_subtopic)
+
     # Pausamos el grafo
     user_command: str = interrupt(payload)
 
-    # Procesamos el comando
+    # Procesamos el comando. Lo que pidió el humano no se fusiona, aunque se parezca
+    # a otro subtema: los posibles duplicados se devuelven en duplicate_hints.
     approved = apply_human_commands(user_command, initial)
 
     if not approved:
@@ -47,6 +67,16 @@ def approval_node(state: ResearchState) -> ResearchState:
             "Revisá la instrucción ingresada."
         )
 
+    normalized = _normalize(approved)
+
+    # Descartamos lo especulado para subtemas rechazados o modificados.
+    if SPECULATIVE_CURATION:
+        SPECULATOR.discard(thread_id_of(config), state.get("topic", ""), normalized)
+
+    return {"approved_subtopics": normalized, "duplicate_hints": flag_duplicates(normalized, "approval")}
+
+
+def _normalize(approved: list) -> list[Subtopic]:
     # Normalizamos IDs para el resto del flujo.
     normalized: list[Subtopic] = []
     for i, sub in enumerate(approved, start=1):
@@ -57,5 +87,43 @@ def approval_node(state: ResearchState) -> ResearchState:
                 rationale=sub.get("rationale", ""),
             )
         )
+    return normalized
+
+
+def route_start(state: ResearchState) -> str:
+    """Un thread terminado que recibe edit_command va a revisión; si no, corrida normal."""
+    if state.get("edit_command") and state.get("final_report"):
+        return "revision"
+    return "investigator"
 
-    return {"approved_subtopics": normalized}
+
+def revision_node(state: ResearchState) -> ResearchState:
+    """
+    Nodo de revisión incremental.
+
+    Se ejecuta al reanudar un thread ya terminado con {"edit_command": "..."}.
+    Aplica el comando (mismo formato que en la aprobación, con los IDs del plan
+    aprobado) sobre approved_subtopics. El Curator después reutiliza las
+    secciones de los subtemas que no cambiaron, y el Reporter las secciones del
+    informe ya escritas.
+    """
+    command = state.get("edit_command", "")
+    current = state.get("approved_subtopics", [])
+
+    if not current:
+        raise ValueError("Supervisor: no hay un plan aprobado para editar.")
+
+    edited = apply_human_commands(command, current)
+
+    if not edited:
+        raise ValueError(
+            "Supervisor: ningún subtema queda después de la edición. "
+            "Revisá la instrucción ingresada."
+        )
+
+    normalized = _normalize(edited)
+    return {
+        "approved_subtopics": normalized,
+        "duplicate_hints": flag_duplicates(normalized, "revision"),
+        "edit_command": "",
+    }
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config.cassette import message_dicts
+
+
+@dataclass
+class TierProfile:
+    """
+    Perfil simulado de un tier.
+    - Latencia base lognormal (mediana latency_ms, dispersión sigma).
+    - Throughput en tokens/segundo para la parte de generación.
+    - Tasas de error (excepción) y de JSON malformado.
+    - Cupo de requests por minuto: al excederlo responde 429 como Azure.
+    """
+    latency_ms: float = 300.0
+    sigma: float = 0.35
+    tokens_per_s: float = 80.0
+    failure_rate: float = 0.0
+    malformed_rate: float = 0.0
+    rpm_quota: float = 0.0
+
+
+DEFAULT_PROFILES: Dict[str, TierProfile] = {
+    "cheap": TierProfile(latency_ms=250, tokens_per_s=120),
+    "standard": TierProfile(latency_ms=500, tokens_per_s=70),
+    "premium": TierProfile(latency_ms=900, tokens_per_s=40),
+}
+
+ZERO_LATENCY_PROFILES: Dict[str, TierProfile] = {
+    tier: TierProfile(latency_ms=0, sigma=0, tokens_per_s=0) for tier in DEFAULT_PROFILES
+}
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+class FakeRateLimitError(FakeLLMError):
+    """Imita el 429 del SDK (status_code + header retry-after opcional)."""
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.response = type("Response", (), {
+            "status_code": 429,
+            "headers": {"retry-after": str(retry_after)} if retry_after is not None else {},
+        })()
+
+
+@dataclass
+class FakeBackend:
+    """
+    Backend de LLM local y determinista para benchmarks y pruebas sin red.
+
+    Reconoce el agente por el system prompt y devuelve contenido con la forma
+    que ese agente espera. El azar se siembra por (seed, tier, mensajes), así
+    que el resultado no depende del orden de ejecución de los hilos.
+    """
+    profiles: Dict[str, TierProfile] = field(default_factory=lambda: dict(DEFAULT_PROFILES))
+    seed: int = 0
+    subtopics: int = 6
+    calls: Counter = field(default_factory=Counter)
+    failures: Counter = field(default_factory=Counter)
+    throttled: Counter = field(default_factory=Counter)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._windows: Dict[str, deque] = {}
+
+    def _check_quota(self, tier: str, profile: TierProfile):
+        if not profile.rpm_quota:
+            return
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(tier, deque())
+            while window and now - window[0] > 60.0:
+                window.popleft()
+            if len(window) >= profile.rpm_quota:
+                self.throttled[tier] += 1
+                raise FakeRateLimitError(f"429: cupo de {tier} excedido")
+            window.append(now)
+
+    def model(self, tier: str) -> "FakeChatModel":
+        return FakeChatModel(backend=self, tier=tier)
+
+    def _rng(self, tier: str, messages: List[dict]) -> random.Random:
+        digest = hashlib.sha256(
+            json.dumps([self.seed, tier, messages], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def respond(self, tier: str, messages: List[dict]) -> List[str]:
+        """Devuelve la respuesta partida en chunks, después de simular la latencia."""
+        chunks, delay = self._plan(tier, messages)
+        if delay:
+            time.sleep(delay)
+        return chunks
+
+    async def arespond(self, tier: str, messages: List[dict]) -> List[str]:
+        chunks, delay = self._plan(tier, messages)
+        if delay:
+            await asyncio.sleep(delay)
+        return chunks
+
+    def _plan(self, tier: str, messages: List[dict]):
+        """Arma la respuesta y la latencia simulada (o lanza el error simulado)."""
+        profile = self.profiles[tier]
+        rng = self._rng(tier, messages)
+        self._check_quota(tier, profile)
+        with self._lock:
+            self.calls[tier] += 1
+
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if messages else ""
+        text = self._content(system, user)
+
+        if profile.failure_rate and rng.random() < profile.failure_rate:
+            with self._lock:
+                self.failures[tier] += 1
+            raise FakeLLMError(f"Fallo simulado en tier {tier}")
+
+        if profile.malformed_rate and rng.random() < profile.malformed_rate:
+            text = "```json\n" + text + "\n```\nEspero que sirva."
+
+        chunks = text.split(" ")
+        chunks = [c + " " for c in chunks[:-1]] + chunks[-1:]
+
+        delay = 0.0
+        if profile.latency_ms:
+            delay += rng.lognormvariate(0, profile.sigma) * profile.latency_ms / 1000.0
+        if profile.tokens_per_s:
+            delay += len(chunks) / profile.tokens_per_s
+        return chunks, delay
+
+    def _content(self, system: str, user: str) -> str:
+        if "Agente Investigador" in system:
+            return json.dumps(
+                [
+                    {"id": i, "title": f"Subtema {i}", "rationale": f"Justificación del subtema {i}."}
+                    for i in range(1, self.subtopics + 1)
+                ],
+                ensure_ascii=False,
+            )
+        if "Agente Curador" in system:
+            return json.dumps(
+                {
+                    "key_points": ["Punto A", "Punto B", "Punto C"],
+                    "synthesis": "Síntesis simulada. " + user[:80],
+                    "recommended_sources": ["Fuente 1", "Fuente 2"],
+                },
+                ensure_ascii=False,
+            )
+        if "<<<SECCIONES>>>" in system:
+            return "# Informe simulado\n\n## Resumen ejecutivo\n\nResumen simulado.\n\n<<<SECCIONES>>>\n\n## Conclusión\n\nFin."
+        if "UNA sola sección" in system:
+            title = next(
+                (line.split(":", 1)[1].strip() for line in user.splitlines() if line.startswith("SUBTEMA:")),
+                "Sección",
+            )
+            return f"## {title}\n\nContenido simulado de la sección."
+        # Reporter u otros: Markdown proporcional al prompt.
+        sections = [
+            line.split(":", 1)[1].strip()
+            for line in user.splitlines()
+            if line.startswith("SUBTEMA:")
+        ]
+        body = "\n\n".join(f"## {title}\n\nContenido simulado de la sección." for title in sections)
+        return f"# Informe simulado\n\nResumen ejecutivo simulado.\n\n{body}\n\n## Conclusión\n\nFin."
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model de LangChain sobre el FakeBackend. Al ser un BaseChatModel
+    dispara los callbacks normales: stream_mode="messages" (consola, SSE del
+    servidor) recibe los tokens igual que con Azure.
+    """
+    backend: Any
+    tier: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-bench"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = "".join(self.backend.respond(self.tier, message_dicts(messages)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self.backend.respond(self.tier, message_dicts(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text = "".join(await self.backend.arespond(self.tier, message_dicts(messages)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in await self.backend.arespond(self.tier, message_dicts(messages)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
@@ -0,0 +1,156 @@
+"""
+Evaluación offline de políticas de ruteo de tier sobre sesiones grabadas.
+
+Cada sesión es un JSONL de telemetría (TELEMETRY=1, TELEMETRY_JSONL=...). Los
+eventos "route" del Curador son la carga a repartir; llm_call, tier_fallback y
+json_fallback dan latencia, costo y calidad por tier. El resultado es
+determinista: mismos archivos y mismos objetivos, mismo reporte.
+
+Uso (desde src/):
+    python -m bench.route_eval sesion1.jsonl sesion2.jsonl
+    python -m bench.route_eval sesiones/*.jsonl --train historico.jsonl \\
+        --quality-target 0.97 --latency-target-ms 4000 --json ruteo.json
+"""
+import argparse
+import json
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from agents.curator import fit_tier_to_prompt_tokens, semantic_tier
+from shared.router import (
+    ROUTER_LATENCY_TARGET_MS, ROUTER_QUALITY_TARGET, TIERS, TierRouter, TierStats,
+    difficulty_bucket, load_events,
+)
+from shared.telemetry import percentile
+
+DEFAULT_POLICIES = ("recorded", "static", "learned") + tuple(f"always:{tier}" for tier in TIERS)
+
+
+def _static_tiers(routes: List[dict]) -> Dict[int, str]:
+    """Heurística por lote (estimate_curator_tier) a partir de lo grabado: un tier por tema."""
+    by_topic = defaultdict(list)
+    for i, e in enumerate(routes):
+        by_topic[e.get("topic", "")].append(i)
+    tiers = {}
+    for topic, idxs in by_topic.items():
+        subs = [{"title": routes[i].get("subtopic", "")} for i in idxs]
+        largest = max(routes[i].get("prompt_tokens", 0) for i in idxs)
+        tier = fit_tier_to_prompt_tokens(semantic_tier(topic, subs), largest)
+        for i in idxs:
+            tiers[i] = tier
+    return tiers
+
+
+class Simulator:
+    """Resultado esperado (ms, costo, calidad) de curar un subtema grabado con otro tier."""
+
+    def __init__(self, stats: TierStats, events: List[dict]):
+        self.stats = stats
+        self.json_failed = {
+            (e.get("topic"), e.get("subtopic"), e.get("tier"))
+            for e in events if e.get("kind") == "json_fallback" and e.get("tier")
+        }
+        self.route_ms = defaultdict(list)
+        for e in events:
+            if e.get("kind") == "route":
+                self.route_ms[(e["tier"], difficulty_bucket(e.get("difficulty", 0.0)))].append(e.get("ms", 0.0))
+
+    def _ms(self, tier: str, bucket: str) -> float:
+        samples = self.route_ms.get((tier, bucket)) or [
+            ms for (t, _), values in self.route_ms.items() if t == tier for ms in values
+        ]
+        if samples:
+            return percentile(samples, 50)
+        return self.stats.latency_p50(tier) or 0.0
+
+    def outcome(self, route: dict, tier: str) -> dict:
+        bucket = difficulty_bucket(route.get("difficulty", 0.0))
+        prompt_tokens = route.get("prompt_tokens", 0)
+        if tier == route["tier"]:
+            # Mismo tier que en la sesión: se usa lo que pasó de verdad.
+            ok = (route.get("topic"), route.get("subtopic"), tier) not in self.json_failed
+            ms, quality = route.get("ms", 0.0), 1.0 if ok else 0.0
+        else:
+            ms, quality = self._ms(tier, bucket), self.stats.quality(tier, bucket)
+        return {"tier": tier, "ms": ms, "quality": quality, "cost_usd": self.stats.expected_cost(tier, prompt_tokens)}
+
+
+def evaluate(sessions: List[List[dict]], train: List[dict], policies=DEFAULT_POLICIES,
+             quality_target: float = ROUTER_QUALITY_TARGET,
+             latency_target_ms: float = ROUTER_LATENCY_TARGET_MS) -> Dict[str, dict]:
+    events = [e for session in sessions for e in session]
+    stats = TierStats(train)
+    router = TierRouter(stats, quality_target, latency_target_ms)
+    simulator = Simulator(TierStats(events), events)
+    routes = [e for e in events if e.get("kind") == "route"]
+    static = _static_tiers(routes)
+
+    report = {}
+    for policy in policies:
+        outcomes = []
+        for i, route in enumerate(routes):
+            if policy == "recorded":
+                tier = route["tier"]
+            elif policy == "static":
+                tier = static[i]
+            elif policy == "learned":
+                tier = router.route(route.get("difficulty", 0.0), route.get("prompt_tokens", 0))
+            elif policy.startswith("always:") and policy[len("always:"):] in TIERS:
+                tier = policy[len("always:"):]
+            else:
+                raise ValueError(f"Política desconocida: {policy}")
+            outcomes.append(simulator.outcome(route, tier))
+        latencies = [o["ms"] for o in outcomes]
+        report[policy] = {
+            "subtopics": len(outcomes),
+            "cost_usd": round(sum(o["cost_usd"] for o in outcomes), 6),
+            "p50_ms": round(percentile(latencies, 50), 1) if latencies else 0.0,
+            "p95_ms": round(percentile(latencies, 95), 1) if latencies else 0.0,
+            "quality": round(sum(o["quality"] for o in outcomes) / len(outcomes), 4) if outcomes else 0.0,
+            "tiers": dict(sorted(Counter(o["tier"] for o in outcomes).items())),
+        }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compara políticas de ruteo de tier sobre sesiones grabadas.")
+    parser.add_argument("sessions", nargs="+", help="JSONL de telemetría, uno por sesión.")
+    parser.add_argument("--train", action="append",
+                        help="JSONL con los que se entrena el router (repetible; default: las mismas sesiones).")
+    parser.add_argument("--policy", action="append",
+                        help="Política a evaluar (repetible): recorded, static, learned, always:<tier>.")
+    parser.add_argument("--quality-target", type=float, default=ROUTER_QUALITY_TARGET)
+    parser.add_argument("--latency-target-ms", type=float, default=ROUTER_LATENCY_TARGET_MS)
+    parser.add_argument("--json", help="Escribir el reporte en este archivo JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sessions = [load_events(path) for path in args.sessions]
+    train = [e for path in args.train for e in load_events(path)] if args.train else [
+        e for session in sessions for e in session
+    ]
+    if not any(e.get("kind") == "route" for session in sessions for e in session):
+        print("Las sesiones no tienen eventos 'route' (grabar con TELEMETRY=1).", file=sys.stderr)
+        return 1
+
+    report = evaluate(sessions, train, args.policy or DEFAULT_POLICIES, args.quality_target, args.latency_target_ms)
+
+    print(f"{'política':<16} {'subtemas':>8} {'costo USD':>10} {'p50 ms':>9} {'p95 ms':>9} {'calidad':>8}  tiers")
+    for policy, row in report.items():
+        mix = ", ".join(f"{tier}={n}" for tier, n in row["tiers"].items())
+        print(
+            f"{policy:<16} {row['subtopics']:>8} {row['cost_usd']:>10.4f} {row['p50_ms']:>9.1f} "
+            f"{row['p95_ms']:>9.1f} {row['quality']:>8.3f}  {mix}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Benchmark offline del grafo completo contra el backend fake.
+
+Uso (desde src/):
+    python -m bench.run_benchmark --subtopics 4,8,12 --topics 5
+    python -m bench.run_benchmark --zero-latency --budget-ms 200   # overhead puro, para CI
+"""
+import argparse
+import json
+import sys
+import time
+import traceback
+import tracemalloc
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from bench.fake_llm import DEFAULT_PROFILES, ZERO_LATENCY_PROFILES, FakeBackend, TierProfile
+from config.models import set_llm_factory, set_response_cache
+from graph.research_graph import build_graph
+from shared.structured import parse_stats, reset_parse_stats
+from shared.telemetry import percentile
+
+
+def _pct(values: List[float], pct: float) -> float:
+    return round(percentile(values, pct), 2) if values else 0.0
+
+
+def run_session(graph, topic: str, commands: List[str], node_times: Dict[str, List[float]]) -> None:
+    """Corre un tema completo, aplicando los comandos de aprobación en orden."""
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    pending = list(commands)
+    graph_input = {"topic": topic}
+
+    while True:
+        interrupted = False
+        last = time.perf_counter()
+        for update in graph.stream(graph_input, config=config, stream_mode="updates"):
+            now = time.perf_counter()
+            for node in update:
+                if node == "__interrupt__":
+                    interrupted = True
+                else:
+                    node_times[node].append((now - last) * 1000.0)
+            last = now
+        if not interrupted:
+            return
+        graph_input = Command(resume=pending.pop(0) if pending else "")
+
+
+def run_benchmark(args) -> dict:
+    profiles = dict(ZERO_LATENCY_PROFILES if args.zero_latency else DEFAULT_PROFILES)
+    for tier, profile in profiles.items():
+        profiles[tier] = TierProfile(
+            latency_ms=profile.latency_ms,
+            sigma=profile.sigma,
+            tokens_per_s=profile.tokens_per_s,
+            failure_rate=args.failure_rate,
+            malformed_rate=args.malformed_rate,
+            rpm_quota=args.rpm_quota,
+        )
+
+    backend = FakeBackend(profiles=profiles, seed=args.seed)
+    set_llm_factory(backend.model)
+    if not args.cache:
+        set_response_cache(None)
+
+    # En memoria: el benchmark no deja checkpoints en disco.
+    graph = build_graph(checkpointer=MemorySaver())
+    results = []
+
+    for n in args.subtopics:
+        backend.subtopics = n
+        backend.calls.clear()
+        backend.failures.clear()
+        backend.throttled.clear()
+        reset_parse_stats()
+        node_times: Dict[str, List[float]] = defaultdict(list)
+        run_times: List[float] = []
+        errors: Counter = Counter()
+
+        tracemalloc.start()
+        for i in range(args.topics):
+            commands = args.commands or [f"approve 1-{n}"]
+            start = time.perf_counter()
+            try:
+                run_session(graph, f"Tema de prueba {i} ({n} subtemas)", commands, node_times)
+            except Exception as exc:
+                # El primer error de cada tipo se muestra completo; el resto solo se cuenta.
+                name = type(exc).__name__
+                if name not in errors:
+                    print(f"Error en la corrida {i} ({n} subtemas): {exc!r}", file=sys.stderr)
+                    traceback.print_exc(file=sys.stderr)
+                errors[name] += 1
+            run_times.append((time.perf_counter() - start) * 1000.0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            "subtopics": n,
+            "runs": args.topics,
+            "errors": sum(errors.values()),
+            "error_types": dict(errors),
+            "wall_ms_total": round(sum(run_times), 2),
+            "run_ms_p50": _pct(run_times, 50),
+            "run_ms_p95": _pct(run_times, 95),
+            "nodes": {
+                node: {
+                    "p50_ms": _pct(times, 50),
+                    "p95_ms": _pct(times, 95),
+                    "p99_ms": _pct(times, 99),
+                }
+                for node, times in sorted(node_times.items())
+            },
+            "calls_per_tier": dict(backend.calls),
+            "failures_per_tier": dict(backend.failures),
+            "throttled_per_tier": dict(backend.throttled),
+            "json_parses": parse_stats(),
+            "peak_memory_kb": round(peak / 1024.0, 1),
+        })
+
+    set_llm_factory(None)
+    return {"results": results}
+
+
+def print_table(report: dict):
+    print(f"{'subtemas':>8} {'runs':>5} {'err':>4} {'p50 ms':>10} {'p95 ms':>10} {'mem KB':>10}  llamadas por tier")
+    for r in report["results"]:
+        print(
+            f"{r['subtopics']:>8} {r['runs']:>5} {r['errors']:>4} "
+            f"{r['run_ms_p50']:>10.1f} {r['run_ms_p95']:>10.1f} {r['peak_memory_kb']:>10.1f}  "
+            f"{r['calls_per_tier']}"
+        )
+        for node, stats in r["nodes"].items():
+            print(f"{'':>8} {node:<14} p50={stats['p50_ms']:.1f} p95={stats['p95_ms']:.1f} p99={stats['p99_ms']:.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del grafo de investigación.")
+    parser.add_argument("--subtopics", default="4,8,12", help="Cantidades de subtemas a probar, separadas por coma.")
+    parser.add_argument("--topics", type=int, default=5, help="Temas por cada cantidad de subtemas.")
+    parser.add_argument("--commands", action="append", help="Comando de aprobación (repetible, se aplican en orden).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--rpm-quota", type=float, default=0.0, help="Cupo RPM simulado por tier (responde 429 al excederlo).")
+    parser.add_argument("--zero-latency", action="store_true", help="Sin latencia simulada: mide solo el overhead.")
+    parser.add_argument("--cache", action="store_true", help="Mantener la cache de respuestas activa.")
+    parser.add_argument("--json", help="Escribir el reporte en este archivo JSON.")
+    parser.add_argument("--allow-errors", action="store_true",
+                        help="No fallar si alguna corrida termina con error (p. ej. con --failure-rate).")
+    parser.add_argument("--budget-ms", type=float, help="Falla (exit 1) si algún p95 por corrida supera este valor.")
+    args = parser.parse_args(argv)
+    args.subtopics = [int(x) for x in args.subtopics.split(",") if x.strip()]
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    print_table(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    errors = sum(r["errors"] for r in report["results"])
+    if errors and not args.allow_errors:
+        print(f"\n{errors} corrida(s) terminaron con error (ver stderr; --allow-errors para ignorarlas)")
+        return 1
+
+    if args.budget_ms is not None:
+        worst = max(r["run_ms_p95"] for r in report["results"])
+        if worst > args.budget_ms:
+            print(f"\nPresupuesto excedido: p95 {worst:.1f} ms > {args.budget_ms:.1f} ms")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Tiempo de arranque de los entry points, medido con `python -X importtime`.
+
+Uso (desde src/):
+    python -m bench.startup                         # main, batch y server
+    python -m bench.startup --module main --budget-ms 150 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ("main", "batch", "server")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Líneas 'import time: self [us] | cumulative | paquete' ->
+    [(paquete, self_us, cumulative_us, nivel)]; nivel 0 = importado directamente.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # encabezado
+        raw = parts[2].rstrip()
+        level = (len(raw) - len(raw.lstrip()) - 1) // 2
+        rows.append((raw.strip(), int(parts[0]), int(parts[1]), level))
+    return rows
+
+
+def measure(module: str, top: int = 10) -> Dict:
+    """Importa module en un proceso nuevo y devuelve tiempos de importación."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000.0
+    rows = parse_importtime(proc.stderr)
+    # Los módulos de nivel 0 suman el total importado.
+    total_us = sum(cum for _, _, cum, level in rows if level == 0)
+    slowest = sorted(rows, key=lambda r: r[2], reverse=True)[:top]
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else "",
+        "wall_ms": round(wall_ms, 2),
+        "import_ms": round(total_us / 1000.0, 2),
+        "slowest": [{"module": name, "cumulative_ms": round(cum / 1000.0, 2)} for name, _, cum, _ in slowest],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de los entry points.")
+    parser.add_argument("--module", action="append", help="Módulo a medir (repetible; default main, batch, server).")
+    parser.add_argument("--top", type=int, default=10, help="Cantidad de imports más lentos a listar.")
+    parser.add_argument("--budget-ms", type=float, help="Falla (exit 1) si algún import_ms supera este valor.")
+    parser.add_argument("--json", help="Escribir el reporte en este archivo JSON.")
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.top) for module in (args.module or DEFAULT_MODULES)]
+
+    failed = False
+    for res in results:
+        status = "ok" if res["ok"] else f"ERROR: {res['error']}"
+        print(f"{res['module']:<8} import={res['import_ms']:>8.1f} ms  proceso={res['wall_ms']:>8.1f} ms  {status}")
+        for item in res["slowest"]:
+            print(f"    {item['cumulative_ms']:>8.1f} ms  {item['module']}")
+        if not res["ok"] or (args.budget_ms is not None and res["import_ms"] > args.budget_ms):
+            failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "budget_ms": args.budget_ms}, f, ensure_ascii=False, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
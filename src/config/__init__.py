@@ -0,0 +1,5 @@
+# El .env se carga al importar el paquete: cache, rate limits y agentes leen su
+# configuración del entorno a nivel de módulo.
+from config.env import load_env
+
+load_env()
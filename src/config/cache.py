@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+LLM_CACHE_MODE = os.getenv("LLM_CACHE", "memory")  # off | memory | sqlite
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_DISK_ENTRIES = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "20000"))
+
+
+def cache_key(deployment: str, messages: List[dict], tier: Optional[str] = None) -> str:
+    """
+    Hash estable del deployment + mensajes (mismo prompt => misma clave).
+    Con tier, también del tier: sin Azure (fake, replay) el deployment es None
+    y los tiers no deben compartir respuestas.
+    """
+    payload = {"deployment": deployment, "messages": messages}
+    if tier is not None:
+        payload["tier"] = tier
+    payload = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUCache:
+    """Cache en memoria con LRU por cantidad de entradas y TTL."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MEMORY_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def close(self):
+        pass
+
+
+class SQLiteCache:
+    """
+    Cache persistente en SQLite.
+    Evicción por TTL y por tamaño (se borran las entradas usadas hace más tiempo).
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_DISK_ENTRIES, ttl: float = LLM_CACHE_TTL):
+        import sqlite3  # solo si se usa la cache en disco
+
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Cache de respuestas del LLM en dos niveles: LRU en memoria delante de un
+    backend persistente opcional. Lleva contadores de hits/misses.
+    """
+
+    def __init__(self, memory: Optional[MemoryLRUCache] = None, disk: Optional[SQLiteCache] = None):
+        self.memory = memory or MemoryLRUCache()
+        self.disk = disk
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, *names: str):
+        with self._lock:
+            for name in names:
+                self.stats[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits", "memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("hits", "disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+        self._count("writes")
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+def build_default_cache() -> Optional[ResponseCache]:
+    """Arma la cache según LLM_CACHE (off | memory | sqlite)."""
+    mode = LLM_CACHE_MODE.lower()
+    if mode in ("off", "0", "false", "none", ""):
+        return None
+    if mode == "sqlite":
+        return ResponseCache(disk=SQLiteCache())
+    return ResponseCache()
@@ -0,0 +1,287 @@
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from config.cache import cache_key
+
+# Grabación / reproducción del tráfico con el LLM; el modo (LLM_CASSETTE) lo
+# aplica config.models.start_cassette_from_env, que los entry points llaman al
+# arrancar; este módulo (y langchain_core) se importa solo si hace falta.
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", ".llm_cassette.jsonl.gz")
+# "recorded" reproduce las latencias grabadas; "zero" responde al instante.
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded")
+
+
+class CassetteMiss(KeyError):
+    """El pedido no está en el cassette (prompt distinto al grabado)."""
+
+
+# Tipos de mensaje de LangChain -> roles de los mensajes que arma config.models.
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def message_dicts(messages) -> List[dict]:
+    """Mensajes como {"role", "content"}, vengan como dicts o como mensajes de LangChain."""
+    return [
+        {"role": m["role"], "content": m["content"]} if isinstance(m, dict)
+        else {"role": _ROLES.get(m.type, m.type), "content": m.content}
+        for m in messages
+    ]
+
+
+def _request_key(tier: str, messages) -> str:
+    # Por tier y no por deployment: la reproducción no necesita las variables de Azure.
+    return cache_key(tier, message_dicts(messages))
+
+
+def _usage_of(res) -> dict:
+    meta = getattr(res, "usage_metadata", None) or {}
+    return {name: meta[name] for name in ("input_tokens", "output_tokens") if meta.get(name)}
+
+
+class CassetteRecorder:
+    """
+    Escribe cada par pedido/respuesta en un JSONL comprimido con gzip.
+
+    Cada línea: k (hash del pedido), t (tier), ms (latencia total), ttft (primer
+    chunk, solo en streaming), n (chunks), c (contenido) y u (tokens reportados).
+    El prompt no se guarda, solo su hash: el cassette es chico y no repite el material.
+
+    Cada línea se escribe como un miembro gzip completo y se hace flush: si el
+    proceso se cae, lo grabado hasta ahí queda legible (gzip admite miembros
+    concatenados, así que grabar de nuevo agrega al final).
+    """
+
+    def __init__(self, path: str = LLM_CASSETTE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        self.recorded = 0
+
+    def record(self, tier: str, messages, content: str, ms: float,
+               usage: dict, ttft: Optional[float] = None, chunks: int = 1):
+        entry = {"k": _request_key(tier, messages), "t": tier, "ms": round(ms, 1), "n": chunks, "c": content}
+        if ttft is not None:
+            entry["ttft"] = round(ttft, 1)
+        if usage:
+            entry["u"] = usage
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        member = gzip.compress((line + "\n").encode("utf-8"))
+        with self._lock:
+            self._file.write(member)
+            self._file.flush()
+            self.recorded += 1
+
+    def wrap(self, tier: str, llm):
+        return RecordingChatModel(llm, tier, self)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class RecordingChatModel:
+    """Envuelve un chat model real y graba cada respuesta con sus tiempos."""
+
+    def __init__(self, llm, tier: str, recorder: CassetteRecorder):
+        self.llm = llm
+        self.tier = tier
+        self.recorder = recorder
+
+    def bind(self, **kwargs):
+        # El modo JSON (bind(response_format=...)) se graba igual que una llamada normal.
+        return RecordingChatModel(self.llm.bind(**kwargs), self.tier, self.recorder)
+
+    def invoke(self, messages, **kwargs):
+        start = time.perf_counter()
+        res = self.llm.invoke(messages, **kwargs)
+        self.recorder.record(
+            self.tier, messages, getattr(res, "content", str(res)),
+            (time.perf_counter() - start) * 1000.0, _usage_of(res),
+        )
+        return res
+
+    def stream(self, messages, **kwargs):
+        start = time.perf_counter()
+        ttft = None
+        parts: List[str] = []
+        usage: Dict[str, int] = {}
+        for chunk in self.llm.stream(messages, **kwargs):
+            if ttft is None:
+                ttft = (time.perf_counter() - start) * 1000.0
+            for name, value in _usage_of(chunk).items():
+                usage[name] = usage.get(name, 0) + value
+            parts.append(getattr(chunk, "content", str(chunk)))
+            yield chunk
+        self.recorder.record(
+            self.tier, messages, "".join(parts), (time.perf_counter() - start) * 1000.0,
+            usage, ttft=ttft, chunks=len(parts),
+        )
+
+    async def ainvoke(self, messages, **kwargs):
+        start = time.perf_counter()
+        res = await self.llm.ainvoke(messages, **kwargs)
+        self.recorder.record(
+            self.tier, messages, getattr(res, "content", str(res)),
+            (time.perf_counter() - start) * 1000.0, _usage_of(res),
+        )
+        return res
+
+    async def astream(self, messages, **kwargs):
+        start = time.perf_counter()
+        ttft = None
+        parts: List[str] = []
+        usage: Dict[str, int] = {}
+        async for chunk in self.llm.astream(messages, **kwargs):
+            if ttft is None:
+                ttft = (time.perf_counter() - start) * 1000.0
+            for name, value in _usage_of(chunk).items():
+                usage[name] = usage.get(name, 0) + value
+            parts.append(getattr(chunk, "content", str(chunk)))
+            yield chunk
+        self.recorder.record(
+            self.tier, messages, "".join(parts), (time.perf_counter() - start) * 1000.0,
+            usage, ttft=ttft, chunks=len(parts),
+        )
+
+
+def _read_entries(path: str):
+    """Entradas del cassette en orden; corta sin error en un miembro gzip truncado."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        while True:
+            try:
+                line = f.readline()
+            except (EOFError, gzip.BadGzipFile, zlib.error):
+                return
+            if not line:
+                return
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Última línea a medias.
+                return
+
+
+class CassettePlayer:
+    """
+    Sirve las respuestas de un cassette grabado, sin red.
+
+    Un mismo pedido grabado varias veces se responde en el orden de grabación
+    (y repite la última respuesta cuando se agotan). Con latency="recorded"
+    se respetan la latencia total y el tiempo al primer chunk originales.
+    Un final truncado (grabación cortada) se ignora: se sirve lo anterior.
+    """
+
+    def __init__(self, path: str = LLM_CASSETTE_PATH, latency: str = LLM_CASSETTE_LATENCY):
+        self.path = path
+        self.real_latency = latency.lower() != "zero"
+        self._lock = threading.Lock()
+        self._entries: Dict[str, deque] = defaultdict(deque)
+        self.served = 0
+        self.misses = 0
+        for entry in _read_entries(path):
+            self._entries[entry["k"]].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def lookup(self, tier: str, messages) -> dict:
+        key = _request_key(tier, messages)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"Pedido al tier {tier} no grabado en {self.path}")
+            self.served += 1
+            # El último se conserva para pedidos repetidos de más.
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def model(self, tier: str):
+        """Factory para set_llm_factory(): un ReplayChatModel del tier."""
+        return ReplayChatModel(player=self, tier=tier)
+
+    def plan(self, entry: dict) -> List[tuple]:
+        """[(espera_en_segundos, texto)] para reproducir la respuesta en chunks."""
+        content = entry["c"]
+        chunks = max(1, min(int(entry.get("n", 1)), len(content) or 1))
+        total_s = entry.get("ms", 0.0) / 1000.0 if self.real_latency else 0.0
+        first_s = min(total_s, entry.get("ttft", entry.get("ms", 0.0)) / 1000.0) if self.real_latency else 0.0
+        step = max(1, len(content) // chunks)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)] or [""]
+        # Si el corte dejó un resto, se suma al último chunk.
+        if len(pieces) > chunks:
+            pieces[chunks - 1:] = ["".join(pieces[chunks - 1:])]
+        rest = (total_s - first_s) / max(1, len(pieces) - 1) if len(pieces) > 1 else 0.0
+        return [(first_s if i == 0 else rest, piece) for i, piece in enumerate(pieces)]
+
+
+def _usage_metadata(usage: Optional[dict]) -> Optional[dict]:
+    if not usage:
+        return None
+    input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Chat model de LangChain servido desde el cassette. Al ser un BaseChatModel
+    dispara los callbacks normales: stream_mode="messages" recibe los tokens.
+    """
+    player: Any
+    tier: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def _result(self, entry: dict) -> ChatResult:
+        message = AIMessage(content=entry["c"], usage_metadata=_usage_metadata(entry.get("u")))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunk(self, entry: dict, piece: str, last: bool) -> ChatGenerationChunk:
+        # La usage va en el último chunk, como la reporta el proveedor.
+        usage = _usage_metadata(entry.get("u")) if last else None
+        return ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        entry = self.player.lookup(self.tier, messages)
+        if self.player.real_latency:
+            time.sleep(entry.get("ms", 0.0) / 1000.0)
+        return self._result(entry)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.player.lookup(self.tier, messages)
+        plan = self.player.plan(entry)
+        for i, (wait, piece) in enumerate(plan):
+            if wait:
+                time.sleep(wait)
+            yield self._chunk(entry, piece, i == len(plan) - 1)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        entry = self.player.lookup(self.tier, messages)
+        if self.player.real_latency:
+            await asyncio.sleep(entry.get("ms", 0.0) / 1000.0)
+        return self._result(entry)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.player.lookup(self.tier, messages)
+        plan = self.player.plan(entry)
+        for i, (wait, piece) in enumerate(plan):
+            if wait:
+                await asyncio.sleep(wait)
+            yield self._chunk(entry, piece, i == len(plan) - 1)
@@ -0,0 +1,10 @@
+_ENV_LOADED = False
+
+
+def load_env():
+    """Carga el .env una sola vez por proceso."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _ENV_LOADED = True
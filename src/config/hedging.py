@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config.rate_limit import TIERS, is_throttle_error, tier_env
+from shared.telemetry import percentile
+
+# Timeout por llamada, por tier (0 = sin timeout). Se pasa al cliente HTTP y,
+# en llamadas con hedging y en streaming, también acota la espera total.
+LLM_TIMEOUTS = {
+    tier: tier_env("LLM_TIMEOUT_S", tier, default)
+    for tier, default in (("cheap", "60"), ("standard", "90"), ("premium", "180"))
+}
+
+# Hedging: si una llamada no-streaming tarda más que el percentil LLM_HEDGE_PERCENTILE
+# de las últimas latencias del tier, se lanza un duplicado y gana la primera respuesta.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "0.5"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+# Degradación a un tier más barato cuando el pedido falla (timeout, 429 agotado,
+# error del servidor) o el tier está saturado / con el circuito abierto.
+LLM_FALLBACK = os.getenv("LLM_FALLBACK", "0").lower() in ("1", "true", "yes")
+LLM_FALLBACK_FAILURES = int(os.getenv("LLM_FALLBACK_FAILURES", "3"))
+LLM_FALLBACK_COOLDOWN_S = float(os.getenv("LLM_FALLBACK_COOLDOWN_S", "30"))
+
+
+def fallback_chain(tier: str) -> List[str]:
+    """premium -> [premium, standard, cheap]; cheap -> [cheap]."""
+    if tier not in TIERS:
+        return [tier]
+    return list(reversed(TIERS[:TIERS.index(tier) + 1]))
+
+
+def is_degradable_error(exc: BaseException) -> bool:
+    """Errores transitorios del proveedor; los de configuración o de código se propagan."""
+    if isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__:
+        return True
+    if is_throttle_error(exc):
+        return True
+    if "Connection" in type(exc).__name__:
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class LatencyTracker:
+    """Ventana de latencias recientes de un tier (segundos) para calcular percentiles."""
+
+    def __init__(self, window: int = LLM_HEDGE_WINDOW):
+        self._samples: deque = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = list(self._samples)
+        return percentile(samples, pct) if samples else None
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class TierHealth:
+    """
+    Circuito por tier: tras LLM_FALLBACK_FAILURES fallas degradables seguidas
+    queda abierto LLM_FALLBACK_COOLDOWN_S segundos y los pedidos van al tier
+    siguiente. Pasado el cooldown se vuelve a probar (un éxito lo cierra).
+    """
+
+    def __init__(self, failures: int = LLM_FALLBACK_FAILURES, cooldown_s: float = LLM_FALLBACK_COOLDOWN_S,
+                 clock=time.monotonic):
+        self.failures = max(1, failures)
+        self.cooldown_s = cooldown_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._consecutive: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+
+    def available(self, tier: str) -> bool:
+        with self._lock:
+            return self._clock() >= self._open_until.get(tier, 0.0)
+
+    def success(self, tier: str):
+        with self._lock:
+            self._consecutive[tier] = 0
+            self._open_until.pop(tier, None)
+
+    def failure(self, tier: str) -> bool:
+        """Registra una falla; devuelve True si el circuito se abrió."""
+        with self._lock:
+            count = self._consecutive.get(tier, 0) + 1
+            self._consecutive[tier] = count
+            if count >= self.failures:
+                self._consecutive[tier] = 0
+                self._open_until[tier] = self._clock() + self.cooldown_s
+                return True
+            return False
+
+
+LATENCIES: Dict[str, LatencyTracker] = {tier: LatencyTracker() for tier in TIERS}
+HEALTH = TierHealth()
+
+
+def hedge_delay(tier: str) -> Optional[float]:
+    """Espera antes del duplicado, o None si no hay suficientes muestras todavía."""
+    tracker = LATENCIES.get(tier)
+    if tracker is None or len(tracker) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_S, tracker.percentile(LLM_HEDGE_PERCENTILE))
+
+
+def timeout_for(tier: str) -> Optional[float]:
+    timeout = LLM_TIMEOUTS.get(tier, 0.0)
+    return timeout if timeout > 0 else None
@@ -1,15 +1,190 @@
-from langchain.chat_models import init_chat_model
-from dotenv import load_dotenv
-import os 
-load_dotenv()
-
-MODEL_CONFIG = {
-    "cheap": os.getenv("AZURE_OPENAI_CHEAP_DEPLOYMENT"),
-    "standard": os.getenv("AZURE_OPENAI_STANDARD_DEPLOYMENT"),
-    "premium": os.getenv("AZURE_OPENAI_PREMIUM_DEPLOYMENT")
+import atexit
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+from config.cache import build_default_cache, cache_key
+from config.hedging import (
+    HEALTH, LATENCIES, LLM_FALLBACK, LLM_HEDGE, fallback_chain, hedge_delay,
+    is_degradable_error, timeout_for,
+)
+from config.rate_limit import build_tier_limiters
+from shared.telemetry import TELEMETRY, cost_usd
+from shared.tokens import estimate_tokens, fit_prompt
+
+# langchain y httpx se importan recién cuando hacen falta: importar este módulo
+# no debe costar arranque (scripts cortos, procesos forkeados del batch).
+DEPLOYMENT_ENV_VARS = {
+    "cheap": "AZURE_OPENAI_CHEAP_DEPLOYMENT",
+    "standard": "AZURE_OPENAI_STANDARD_DEPLOYMENT",
+    "premium": "AZURE_OPENAI_PREMIUM_DEPLOYMENT",
 }
 
-def get_llm(tier:str):
+# Se completa en el primer pedido de cliente (ver ClientRegistry.get).
+MODEL_CONFIG = {tier: None for tier in DEPLOYMENT_ENV_VARS}
+
+
+def deployment(tier: str):
+    return os.getenv(DEPLOYMENT_ENV_VARS[tier])
+
+
+# Variables que definen un cliente; si cambian, el registro se reconstruye.
+CLIENT_ENV_VARS = (
+    "AZURE_OPENAI_API_KEY",
+    "AZURE_OPENAI_ENDPOINT",
+    "AZURE_OPENAI_API_VERSION",
+    "AZURE_OPENAI_CHEAP_DEPLOYMENT",
+    "AZURE_OPENAI_STANDARD_DEPLOYMENT",
+    "AZURE_OPENAI_PREMIUM_DEPLOYMENT",
+)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+
+
+class ClientRegistry:
+    """
+    Registro de clientes de chat compartido por todo el proceso.
+
+    - Un cliente por (tier, deployment), creado una sola vez.
+    - Un único pool HTTP (sync y async) con keep-alive para todos los tiers.
+    - Si cambian las variables de entorno de Azure, se descartan los clientes
+      y se vuelven a crear en el próximo pedido.
+    - Thread-safe: un lock por (tier, deployment) evita construir dos veces el
+      mismo cliente; el lock del registro no se retiene mientras se construye.
+    - Los pools async descartados se cierran en aclose(): solo se pueden
+      cerrar desde un loop y pueden tener conexiones abiertas todavía.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._building = {}
+        self._generation = 0
+        self._http_client = None
+        self._http_async_client = None
+        self._retired_async_clients = []
+        self._env_fingerprint = None
+        self._factory = None
+        self._wrapper = None
+
+    def set_factory(self, factory):
+        """
+        Reemplaza la construcción de clientes: factory(tier) -> chat model.
+        Se usa para backends locales (fake, replay); None vuelve a Azure.
+        """
+        with self._lock:
+            self._drop_clients()
+            self._env_fingerprint = None
+            self._factory = factory
+
+    def set_wrapper(self, wrapper):
+        """
+        wrapper(tier, client) -> client envuelve cada cliente creado (p. ej. para
+        grabar el tráfico); None lo quita.
+        """
+        with self._lock:
+            self._clients.clear()
+            self._generation += 1
+            self._wrapper = wrapper
+
+    def _current_fingerprint(self) -> tuple:
+        return tuple(os.getenv(name) for name in CLIENT_ENV_VARS)
+
+    def _limits(self):
+        import httpx
+
+        return httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def _ensure_http(self):
+        import httpx
+
+        if self._http_client is None:
+            self._http_client = httpx.Client(limits=self._limits())
+        if self._http_async_client is None:
+            self._http_async_client = httpx.AsyncClient(limits=self._limits())
+
+    def _drop_clients(self):
+        self._clients.clear()
+        self._generation += 1
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+        # El cliente async se cierra desde un loop: queda pendiente para aclose().
+        if self._http_async_client is not None:
+            self._retired_async_clients.append(self._http_async_client)
+            self._http_async_client = None
+
+    def get(self, tier: str):
+        with self._lock:
+            fingerprint = self._current_fingerprint()
+            if fingerprint != self._env_fingerprint:
+                self._drop_clients()
+                MODEL_CONFIG.update({tier: deployment(tier) for tier in DEPLOYMENT_ENV_VARS})
+                self._env_fingerprint = fingerprint
+            key = (tier, MODEL_CONFIG[tier])
+            client = self._clients.get(key)
+            if client is not None:
+                return client
+            building = self._building.setdefault(key, threading.Lock())
+
+        with building:
+            with self._lock:
+                # Otro hilo pudo construirlo mientras esperábamos.
+                client = self._clients.get(key)
+                if client is not None:
+                    return client
+                generation, factory, wrapper = self._generation, self._factory, self._wrapper
+                if factory is None:
+                    self._ensure_http()
+                    http_client, http_async_client = self._http_client, self._http_async_client
+
+            # init_chat_model (imports de langchain, cliente del proveedor) sin el
+            # lock del registro: los demás tiers siguen atendiendo pedidos.
+            if factory is not None:
+                client = factory(tier)
+            else:
+                client = _build_llm(tier, http_client=http_client, http_async_client=http_async_client)
+            if wrapper is not None:
+                client = wrapper(tier, client)
+
+            with self._lock:
+                # Si el registro se reinició mientras tanto, este cliente sirve
+                # para este pedido pero no se guarda.
+                if generation == self._generation:
+                    self._clients[key] = client
+            return client
+
+    def refresh(self):
+        """Fuerza la reconstrucción de todos los clientes en el próximo pedido."""
+        with self._lock:
+            self._drop_clients()
+            self._env_fingerprint = None
+
+    def close(self):
+        """Cierra el pool HTTP sync y libera los clientes (los pools async quedan para aclose)."""
+        with self._lock:
+            self._drop_clients()
+            self._env_fingerprint = None
+
+    async def aclose(self):
+        """Cierra los pools HTTP, incluidos los async descartados por cambios de entorno."""
+        with self._lock:
+            self._drop_clients()
+            self._env_fingerprint = None
+            async_clients, self._retired_async_clients = self._retired_async_clients, []
+        for async_client in async_clients:
+            await async_client.aclose()
+
+
+def _build_llm(tier: str, http_client=None, http_async_client=None):
     model_name = MODEL_CONFIG[tier]
 
     if not model_name:
@@ -17,23 +192,638 @@ def get_llm(tier:str):
 
     if not (os.getenv("AZURE_OPENAI_ENDPOINT") and os.getenv("AZURE_OPENAI_API_KEY")):
         raise RuntimeError("Faltan variables de entorno de Azure OpenAI")
-    
+
+    # Import pesado (langchain + proveedor): solo al crear el primer cliente real.
+    from langchain.chat_models import init_chat_model
+
     return init_chat_model(
         model=model_name,
         model_provider="azure_openai",
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        temperature=0.0
+        temperature=0.0,
+        # Los reintentos los maneja config.rate_limit (backoff con jitter por tier).
+        max_retries=0,
+        timeout=timeout_for(tier),
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
 
-def llm_invoke(tier: str, system_prompt: str, user_prompt: str) -> str:
-    llm = get_llm(tier)
-    messages = [
+
+CLIENTS = ClientRegistry()
+
+
+def get_llm(tier: str):
+    return CLIENTS.get(tier)
+
+
+def close_clients():
+    CLIENTS.close()
+
+
+async def aclose_clients():
+    await CLIENTS.aclose()
+
+
+def refresh_clients():
+    CLIENTS.refresh()
+
+
+def set_llm_factory(factory):
+    CLIENTS.set_factory(factory)
+
+
+# Record / replay del tráfico (config/cassette.py): off | record | replay.
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "off").lower()
+CASSETTE = None
+
+
+def start_recording(path: str = None):
+    """Graba cada respuesta real del LLM (con tiempos) en el cassette."""
+    global CASSETTE
+    from config.cassette import LLM_CASSETTE_PATH, CassetteRecorder
+
+    stop_cassette()
+    CASSETTE = CassetteRecorder(path or LLM_CASSETTE_PATH)
+    CLIENTS.set_wrapper(CASSETTE.wrap)
+    return CASSETTE
+
+
+def start_replay(path: str = None, latency: str = None):
+    """Sirve las respuestas desde el cassette; latency: "recorded" o "zero"."""
+    global CASSETTE
+    from config.cassette import LLM_CASSETTE_LATENCY, LLM_CASSETTE_PATH, CassettePlayer
+
+    stop_cassette()
+    CASSETTE = CassettePlayer(path or LLM_CASSETTE_PATH, latency or LLM_CASSETTE_LATENCY)
+    set_llm_factory(CASSETTE.model)
+    return CASSETTE
+
+
+def stop_cassette():
+    """Cierra el cassette activo y vuelve a los clientes normales."""
+    global CASSETTE
+    if CASSETTE is None:
+        return
+    if hasattr(CASSETTE, "close"):
+        CASSETTE.close()
+        CLIENTS.set_wrapper(None)
+    else:
+        set_llm_factory(None)
+    CASSETTE = None
+
+
+def start_cassette_from_env():
+    """
+    Activa el cassette según LLM_CASSETTE. Lo llaman los entry points (consola,
+    batch, servidor): importar este módulo no cambia los clientes.
+    """
+    if LLM_CASSETTE == "record":
+        start_recording()
+        atexit.register(stop_cassette)
+    elif LLM_CASSETTE == "replay":
+        start_replay()
+    return CASSETTE
+
+
+# Cache de respuestas (temperature=0.0 => mismo prompt, misma respuesta).
+# Se puede reemplazar con set_response_cache(); None la desactiva.
+RESPONSE_CACHE = build_default_cache()
+
+
+def set_response_cache(cache):
+    global RESPONSE_CACHE
+    RESPONSE_CACHE = cache
+
+
+def _build_messages(system_prompt: str, user_prompt: str) -> list:
+    return [
         {"role": "system", "content": system_prompt.strip()},
         {"role": "user", "content": user_prompt.strip()},
     ]
+
+
+# Rate limiting + concurrencia adaptativa por tier (ver config/rate_limit.py).
+RATE_LIMITERS = build_tier_limiters()
+
+
+def _prepare_call(tier: str, system_prompt: str, user_prompt: str):
+    """
+    Parte común previa a la llamada: presupuesto de tokens y mensajes.
+    Devuelve (messages, prompt_estimate, cache_key, start).
+    """
+    # Se recorta antes de calcular la clave de cache: mismo input => mismo recorte.
+    user_prompt, prompt_estimate, truncated = fit_prompt(tier, system_prompt, user_prompt)
+    if truncated:
+        TELEMETRY.record("prompt_truncated", agent=tier, estimated_tokens=prompt_estimate)
+    messages = _build_messages(system_prompt, user_prompt)
+    start = time.perf_counter()
+    key = cache_key(deployment(tier), messages, tier) if RESPONSE_CACHE is not None else None
+    return messages, prompt_estimate, key, start
+
+
+def _cached(tier, prompt_estimate, key, start, cacheable=None):
+    cache = RESPONSE_CACHE
+    if cache is None or key is None:
+        return None
+    cached = cache.get(key)
+    if cached is not None and cacheable is not None and not cacheable(cached):
+        # Grabada antes de validar al guardar: se ignora y se pide de nuevo.
+        return None
+    if cached is not None and TELEMETRY.enabled:
+        _record_call(tier, prompt_estimate, cached, {}, start, cache_hit=True)
+    return cached
+
+
+def _store(key, content, cacheable=None):
+    cache = RESPONSE_CACHE
+    if cache is None or key is None or not content:
+        return
+    if cacheable is not None and not cacheable(content):
+        # Una respuesta que el agente no puede usar no se repite desde la cache.
+        return
+    cache.set(key, content)
+
+
+async def _cache_io(fn, *args):
+    """En el camino async, la cache en disco (SQLite) se consulta fuera del loop."""
+    cache = RESPONSE_CACHE
+    if cache is None or getattr(cache, "disk", None) is None:
+        return fn(*args)
+    import asyncio
+
+    return await asyncio.to_thread(fn, *args)
+
+
+def _finish_call(tier, prompt_estimate, content, usage, start, retries):
+    if TELEMETRY.enabled:
+        _record_call(tier, prompt_estimate, content, usage, start, retries=retries)
+    return content
+
+
+def _call_llm(tier: str, system_prompt: str, user_prompt: str, call, hedge: bool = False,
+              cacheable=None) -> str:
+    """
+    Camino común de llm_invoke / llm_stream: cache -> rate limit -> modelo.
+    call(tier, llm, messages, usage) hace la llamada concreta, devuelve el texto y
+    completa usage con los tokens reportados por el proveedor (si los hay).
+
+    Con LLM_FALLBACK, si el tier falla por un error transitorio (o está
+    saturado / con el circuito abierto) se degrada al tier siguiente; con
+    LLM_HEDGE y hedge=True se lanza un duplicado cuando la llamada se demora.
+    cacheable(texto) decide si la respuesta se guarda en la cache (p. ej. solo
+    si el JSON es parseable).
+    """
+    messages, prompt_estimate, key, start = _prepare_call(tier, system_prompt, user_prompt)
+    cached = _cached(tier, prompt_estimate, key, start, cacheable)
+    if cached is not None:
+        return cached
+
+    usage: dict = {}
+    retries = []
+    chain = _tier_chain(tier)
+    for i, current in enumerate(chain):
+        if current != tier:
+            messages, prompt_estimate = _refit(current, system_prompt, user_prompt)
+        try:
+            content = _run_tier(current, messages, prompt_estimate, call, usage, retries, hedge)
+        except Exception as exc:
+            if TELEMETRY.enabled:
+                _record_call(current, prompt_estimate, "", usage, start, retries=len(retries), error=type(exc).__name__)
+            if not _degrade(chain, i, exc):
+                raise
+            continue
+        HEALTH.success(current)
+        # Una respuesta degradada no se cachea como si fuera del tier pedido.
+        if current == tier:
+            _store(key, content, cacheable)
+        return _finish_call(current, prompt_estimate, content, usage, start, len(retries))
+
+
+async def _acall_llm(tier: str, system_prompt: str, user_prompt: str, call, hedge: bool = False,
+                     cacheable=None) -> str:
+    """Versión async de _call_llm: call(tier, llm, messages, usage) es una corutina."""
+    messages, prompt_estimate, key, start = _prepare_call(tier, system_prompt, user_prompt)
+    cached = await _cache_io(_cached, tier, prompt_estimate, key, start, cacheable)
+    if cached is not None:
+        return cached
+
+    usage: dict = {}
+    retries = []
+    chain = _tier_chain(tier)
+    for i, current in enumerate(chain):
+        if current != tier:
+            messages, prompt_estimate = _refit(current, system_prompt, user_prompt)
+        try:
+            content = await _arun_tier(current, messages, prompt_estimate, call, usage, retries, hedge)
+        except Exception as exc:
+            if TELEMETRY.enabled:
+                _record_call(current, prompt_estimate, "", usage, start, retries=len(retries), error=type(exc).__name__)
+            if not _degrade(chain, i, exc):
+                raise
+            continue
+        HEALTH.success(current)
+        if current == tier:
+            await _cache_io(_store, key, content, cacheable)
+        return _finish_call(current, prompt_estimate, content, usage, start, len(retries))
+
+
+# --- timeouts, hedging y degradación de tier (config/hedging.py) ----------
+
+def _refit(tier: str, system_prompt: str, user_prompt: str):
+    # El tier de respaldo puede tener un presupuesto de tokens menor.
+    user_prompt, prompt_estimate, _ = fit_prompt(tier, system_prompt, user_prompt)
+    return _build_messages(system_prompt, user_prompt), prompt_estimate
+
+
+def _unavailable(tier: str):
+    if not HEALTH.available(tier):
+        return "circuit_open"
+    limiter = RATE_LIMITERS.get(tier)
+    if limiter is not None and limiter.saturated():
+        return "saturated"
+    return None
+
+
+def _tier_chain(tier: str) -> list:
+    """Tiers a intentar en orden; salta de entrada los que no conviene usar ahora."""
+    if not LLM_FALLBACK:
+        return [tier]
+    chain = fallback_chain(tier)
+    for i, current in enumerate(chain[:-1]):
+        reason = _unavailable(current)
+        if reason is None:
+            return chain[i:]
+        TELEMETRY.record("tier_fallback", agent=current, to_tier=chain[i + 1], reason=reason)
+    return chain[-1:]
+
+
+def _degrade(chain: list, i: int, exc: Exception) -> bool:
+    """Registra la falla de chain[i]; devuelve True si hay que seguir con el tier siguiente."""
+    if not is_degradable_error(exc):
+        return False
+    if HEALTH.failure(chain[i]):
+        TELEMETRY.record("circuit_open", agent=chain[i])
+    if not LLM_FALLBACK or i + 1 >= len(chain):
+        return False
+    TELEMETRY.record("tier_fallback", agent=chain[i], to_tier=chain[i + 1], reason=type(exc).__name__)
+    return True
+
+
+_HEDGE_POOL = None
+_HEDGE_POOL_LOCK = threading.Lock()
+LLM_HEDGE_THREADS = int(os.getenv("LLM_HEDGE_THREADS", "32"))
+
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _HEDGE_POOL
+    with _HEDGE_POOL_LOCK:
+        if _HEDGE_POOL is None:
+            _HEDGE_POOL = ThreadPoolExecutor(max_workers=LLM_HEDGE_THREADS, thread_name_prefix="llm-hedge")
+        return _HEDGE_POOL
+
+
+def _attempt(tier, messages, prompt_estimate, call, retries, run):
+    """Un intento completo (rate limit + modelo); devuelve (texto, usage)."""
+    llm = get_llm(tier)
+    limiter = RATE_LIMITERS.get(tier)
+
+    def once():
+        local: dict = {}
+        started = time.perf_counter()
+        if limiter is not None:
+            content = run(limiter, lambda: call(tier, llm, messages, local), prompt_estimate, retries.append)
+        else:
+            content = call(tier, llm, messages, local)
+        return content, local, started
+
+    return once
+
+
+# Intento sync abandonado (perdió el hedge o se pasó del timeout). El hilo no
+# se puede interrumpir: una llamada bloqueante termina sola (el cliente HTTP la
+# acota con el mismo timeout) y recién ahí libera su lugar en el limiter; un
+# stream lo mira entre chunks y corta la conexión.
+_ABANDONED: contextvars.ContextVar = contextvars.ContextVar("llm_abandoned", default=None)
+
+
+def _run_tier(tier, messages, prompt_estimate, call, usage, retries, hedge) -> str:
+    once = _attempt(tier, messages, prompt_estimate, call, retries,
+                    lambda limiter, fn, est, on_retry: limiter.run(fn, est, on_retry=on_retry))
+
+    def attempt():
+        content, local, started = once()
+        if tier in LATENCIES:
+            LATENCIES[tier].add(time.perf_counter() - started)
+        return content, local
+
+    if hedge and LLM_HEDGE:
+        content, local = _hedged(tier, attempt)
+    elif hedge:
+        # Llamada bloqueante sin hedging: el timeout lo aplica el cliente HTTP.
+        content, local = attempt()
+    else:
+        # Streaming: el cliente HTTP solo acota cada lectura, así que el timeout
+        # total (y con él la degradación de tier) se aplica acá, sin duplicado.
+        content, local = _hedged(tier, attempt, duplicate=False)
+    usage.update(local)
+    return content
+
+
+def _first_wait(delay, timeout):
+    # Hasta el hedge o hasta el timeout, lo que llegue antes.
+    waits = [w for w in (delay, timeout) if w is not None]
+    return min(waits) if waits else None
+
+
+def _hedged(tier: str, attempt, duplicate: bool = True):
+    """
+    Corre attempt en el pool con el timeout del tier y, si duplicate, lanza un
+    duplicado pasado hedge_delay. Los intentos que no ganan quedan marcados
+    como abandonados (_ABANDONED).
+    """
+    delay = hedge_delay(tier) if duplicate else None
+    timeout = timeout_for(tier)
+    if delay is None and timeout is None:
+        return attempt()
+
+    pool = _hedge_pool()
+    flags = []
+
+    def submit():
+        # copy_context: los callbacks de LangGraph (tags, stream) viajan en contextvars.
+        context = contextvars.copy_context()
+        flags.append(threading.Event())
+        context.run(_ABANDONED.set, flags[-1])
+        return pool.submit(context.run, attempt)
+
+    try:
+        return _first_result(tier, submit, delay, timeout)
+    finally:
+        for flag in flags:
+            flag.set()
+
+
+def _first_result(tier: str, submit, delay, timeout):
+    start = time.perf_counter()
+    futures = [submit()]
+    done, _ = wait(futures, timeout=_first_wait(delay, timeout))
+    limiter = RATE_LIMITERS.get(tier)
+    if (not done and delay is not None and (timeout is None or delay < timeout)
+            and not (limiter is not None and limiter.saturated())):
+        TELEMETRY.record("hedge", agent=tier, delay_ms=round(delay * 1000.0, 1))
+        futures.append(submit())
+
+    pending = set(futures)
+    error = None
+    while pending:
+        remaining = None if timeout is None else max(0.0, start + timeout - time.perf_counter())
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            TELEMETRY.record("llm_timeout", agent=tier, timeout_s=timeout)
+            raise TimeoutError(f"LLM {tier}: sin respuesta en {timeout}s")
+        for future in done:
+            if future.exception() is None:
+                if len(futures) > 1:
+                    TELEMETRY.record("hedge_win", agent=tier, winner="hedge" if future is futures[1] else "primary")
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def _arun_tier(tier, messages, prompt_estimate, call, usage, retries, hedge) -> str:
+    import asyncio
+
+    once = _attempt(tier, messages, prompt_estimate, call, retries,
+                    lambda limiter, fn, est, on_retry: limiter.arun(fn, est, on_retry=on_retry))
+
+    async def attempt():
+        content, local, started = once()
+        content = await content
+        if tier in LATENCIES:
+            LATENCIES[tier].add(time.perf_counter() - started)
+        return content, local
+
+    if hedge and LLM_HEDGE:
+        content, local = await _ahedged(tier, attempt)
+    else:
+        timeout = timeout_for(tier)
+        try:
+            content, local = await (asyncio.wait_for(attempt(), timeout) if timeout else attempt())
+        except asyncio.TimeoutError:
+            TELEMETRY.record("llm_timeout", agent=tier, timeout_s=timeout)
+            raise
+    usage.update(local)
+    return content
+
+
+async def _ahedged(tier: str, attempt):
+    import asyncio
+
+    delay = hedge_delay(tier)
+    timeout = timeout_for(tier)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = [asyncio.ensure_future(attempt())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=_first_wait(delay, timeout))
+        limiter = RATE_LIMITERS.get(tier)
+        if (not done and delay is not None and (timeout is None or delay < timeout)
+                and not (limiter is not None and limiter.saturated())):
+            TELEMETRY.record("hedge", agent=tier, delay_ms=round(delay * 1000.0, 1))
+            tasks.append(asyncio.ensure_future(attempt()))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            remaining = None if timeout is None else max(0.0, start + timeout - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                TELEMETRY.record("llm_timeout", agent=tier, timeout_s=timeout)
+                raise asyncio.TimeoutError(f"LLM {tier}: sin respuesta en {timeout}s")
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1:
+                        TELEMETRY.record("hedge_win", agent=tier, winner="hedge" if task is tasks[1] else "primary")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # El perdedor se cancela: en async sí se puede cortar la llamada en vuelo.
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _record_call(tier, prompt_estimate, content, usage, start, cache_hit=False, retries=0, error=None):
+    prompt_tokens = usage.get("input_tokens") or prompt_estimate
+    completion_tokens = usage.get("output_tokens") or estimate_tokens(content)
+    TELEMETRY.record(
+        "llm_call",
+        tier=tier,
+        deployment=deployment(tier),
+        ms=(time.perf_counter() - start) * 1000.0,
+        prompt_tokens=prompt_tokens,
+        estimated_prompt_tokens=prompt_estimate,
+        completion_tokens=completion_tokens,
+        tokens_estimated=not usage,
+        cost_usd=0.0 if cache_hit else cost_usd(tier, prompt_tokens, completion_tokens),
+        cache_hit=cache_hit,
+        retries=retries,
+        error=error,
+    )
+
+
+def _add_usage(usage: dict, res):
+    meta = getattr(res, "usage_metadata", None) or {}
+    for name in ("input_tokens", "output_tokens"):
+        if meta.get(name):
+            usage[name] = usage.get(name, 0) + meta[name]
+
+
+# Tags que LangGraph respeta para no reenviar los tokens de una llamada
+# en stream_mode="messages" (según versión usa uno u otro nombre).
+NOSTREAM_TAGS = ["nostream", "langsmith:nostream"]
+
+
+# Modo JSON del proveedor (response_format json_object). Si un deployment lo
+# rechaza (400) se recuerda por (tier, deployment) y se sigue sin él; el parseo
+# tolerante de shared/structured.py cubre igual la respuesta.
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1").lower() in ("1", "true", "yes")
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+_JSON_MODE_UNSUPPORTED = set()
+
+
+def _json_bound(tier, llm):
+    bind = getattr(llm, "bind", None)
+    if not LLM_JSON_MODE or bind is None or (tier, deployment(tier)) in _JSON_MODE_UNSUPPORTED:
+        return None
+    return bind(response_format=JSON_RESPONSE_FORMAT)
+
+
+def _json_rejected(tier, exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status == 400 and "response_format" in str(exc):
+        _JSON_MODE_UNSUPPORTED.add((tier, deployment(tier)))
+        TELEMETRY.record("json_mode_unsupported", agent=tier, deployment=deployment(tier))
+        return True
+    return False
+
+
+def _invoke_json(tier, llm, messages, usage) -> str:
+    bound = _json_bound(tier, llm)
+    if bound is not None:
+        try:
+            res = bound.invoke(messages, config={"tags": NOSTREAM_TAGS})
+            _add_usage(usage, res)
+            return getattr(res, "content", str(res))
+        except Exception as exc:
+            if not _json_rejected(tier, exc):
+                raise
+    return _invoke_nostream(tier, llm, messages, usage)
+
+
+async def _ainvoke_json(tier, llm, messages, usage) -> str:
+    bound = _json_bound(tier, llm)
+    if bound is not None:
+        try:
+            res = await bound.ainvoke(messages, config={"tags": NOSTREAM_TAGS})
+            _add_usage(usage, res)
+            return getattr(res, "content", str(res))
+        except Exception as exc:
+            if not _json_rejected(tier, exc):
+                raise
+    return await _ainvoke_nostream(tier, llm, messages, usage)
+
+
+def _invoke(tier, llm, messages, usage) -> str:
     res = llm.invoke(messages)
-    
-    # print(f"[models] invocando {tier.upper()} -> {model_name}")
+    _add_usage(usage, res)
+    return getattr(res, "content", str(res))
+
+
+def _invoke_nostream(tier, llm, messages, usage) -> str:
+    res = llm.invoke(messages, config={"tags": NOSTREAM_TAGS})
+    _add_usage(usage, res)
+    return getattr(res, "content", str(res))
+
+
+def _stream(tier, llm, messages, usage) -> str:
+    parts = []
+    abandoned = _ABANDONED.get()
+    for chunk in llm.stream(messages):
+        if abandoned is not None and abandoned.is_set():
+            # Cortar el stream cierra la conexión; el error libera el limiter sin sumar.
+            raise TimeoutError(f"Stream de {tier} abandonado")
+        _add_usage(usage, chunk)
+        text = getattr(chunk, "content", str(chunk))
+        if text:
+            parts.append(text)
+    return "".join(parts)
+
+
+async def _ainvoke(tier, llm, messages, usage) -> str:
+    res = await llm.ainvoke(messages)
+    _add_usage(usage, res)
     return getattr(res, "content", str(res))
+
+
+async def _ainvoke_nostream(tier, llm, messages, usage) -> str:
+    res = await llm.ainvoke(messages, config={"tags": NOSTREAM_TAGS})
+    _add_usage(usage, res)
+    return getattr(res, "content", str(res))
+
+
+async def _astream(tier, llm, messages, usage) -> str:
+    parts = []
+    async for chunk in llm.astream(messages):
+        _add_usage(usage, chunk)
+        text = getattr(chunk, "content", str(chunk))
+        if text:
+            parts.append(text)
+    return "".join(parts)
+
+
+def llm_invoke(tier: str, system_prompt: str, user_prompt: str, nostream: bool = False,
+               json_mode: bool = False, cacheable: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Llamada bloqueante al modelo del tier.
+    nostream=True evita que los tokens aparezcan en el stream "messages" del grafo
+    (útil para llamadas internas cuyo texto no debe mostrarse tal cual).
+    json_mode=True pide un objeto JSON con el modo estructurado del proveedor
+    (implica nostream).
+    cacheable(texto): si devuelve False la respuesta no se guarda en la cache
+    (y una ya guardada que no lo cumple se ignora).
+    """
+    if json_mode:
+        call = _invoke_json
+    else:
+        call = _invoke_nostream if nostream else _invoke
+    return _call_llm(tier, system_prompt, user_prompt, call, hedge=True, cacheable=cacheable)
+
+
+def llm_stream(tier: str, system_prompt: str, user_prompt: str) -> str:
+    """
+    Igual que llm_invoke, pero pide la respuesta en modo streaming.
+
+    Los tokens viajan por los callbacks de LangChain, así que un grafo ejecutado
+    con stream_mode="messages" los recibe a medida que llegan. El valor devuelto
+    es la concatenación de los chunks, idéntica a la respuesta no streameada.
+    """
+    return _call_llm(tier, system_prompt, user_prompt, _stream)
+
+
+async def allm_invoke(tier: str, system_prompt: str, user_prompt: str, nostream: bool = False,
+                     json_mode: bool = False, cacheable: Optional[Callable[[str], bool]] = None) -> str:
+    """Versión async de llm_invoke (usa ainvoke sobre el cliente async compartido)."""
+    if json_mode:
+        call = _ainvoke_json
+    else:
+        call = _ainvoke_nostream if nostream else _ainvoke
+    return await _acall_llm(tier, system_prompt, user_prompt, call, hedge=True, cacheable=cacheable)
+
+
+async def allm_stream(tier: str, system_prompt: str, user_prompt: str) -> str:
+    """Versión async de llm_stream."""
+    return await _acall_llm(tier, system_prompt, user_prompt, _astream)
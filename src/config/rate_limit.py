@@ -0,0 +1,298 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+TIERS = ("cheap", "standard", "premium")
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(os.getenv("LLM_BACKOFF_MAX_S", "30"))
+
+
+async def _async_sleep(seconds: float):
+    # asyncio se importa solo en el camino async: el sync no paga su arranque.
+    import asyncio
+
+    await asyncio.sleep(seconds)
+
+
+def tier_env(name: str, tier: str, default: str) -> float:
+    """Valor numérico de NAME_<TIER>, o de NAME para todos los tiers, o default."""
+    return float(os.getenv(f"{name}_{tier.upper()}", os.getenv(name, default)))
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """Detecta un 429 / rate limit sin depender de la clase concreta del SDK."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket con recarga continua. capacity = cupo por minuto.
+    acquire(n) bloquea hasta que haya n unidades disponibles.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """Toma amount si hay; si no, devuelve cuántos segundos esperar (0 = tomado)."""
+        # Un pedido más grande que el bucket entero espera a tenerlo lleno.
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.available >= amount:
+                self.available -= amount
+                return 0.0
+            return (amount - self.available) / self.rate
+
+    def acquire(self, amount: float = 1.0):
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1.0):
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return
+            await _async_sleep(wait)
+
+    def drain(self):
+        """Tras un 429 el servidor ya considera agotado el cupo."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.available = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    Límite de concurrencia AIMD: +1/limit por éxito, x0.5 por throttling.
+    Otros errores (5xx, timeouts) liberan el lugar sin tocar el límite.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        # Corutinas esperando lugar: (loop, future). release() las despierta
+        # desde cualquier hilo, sin sondeo.
+        self._waiters = deque()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._cond:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, throttled: bool = False, success: bool = True):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.min_limit), self.limit * 0.5)
+            elif success:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+            waiters, self._waiters = list(self._waiters), deque()
+        # Como notify_all: cada corutina despierta vuelve a mirar el límite.
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass  # loop ya cerrado
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Resultado de una llamada para _release: terminó bien, o se cortó con una
+# BaseException (KeyboardInterrupt, CancelledError) antes de devolver nada.
+_OK = object()
+_INTERRUPTED = object()
+
+
+class TierLimiter:
+    """
+    Limita las llamadas de un tier: RPM + TPM (token buckets), concurrencia
+    adaptativa y reintentos con backoff exponencial con jitter ante 429.
+    """
+
+    def __init__(
+        self,
+        rpm: float,
+        tpm: float,
+        max_concurrency: int,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE_S,
+        backoff_max: float = LLM_BACKOFF_MAX_S,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def saturated(self) -> bool:
+        """Concurrencia recortada por 429 y sin lugares libres: no conviene sumar carga."""
+        c = self.concurrency
+        return c.limit < c.max_limit and c.in_flight >= int(c.limit)
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = retry_after_seconds(exc)
+        if hinted is not None:
+            return hinted
+        # "full jitter": uniforme entre 0 y el techo exponencial
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _release(self, outcome):
+        """Libera el lugar según cómo terminó la llamada (ver _OK / _INTERRUPTED)."""
+        throttled = isinstance(outcome, Exception) and is_throttle_error(outcome)
+        self.concurrency.release(throttled=throttled, success=outcome is _OK)
+
+    def _on_error(self, attempt: int, exc: Exception, on_retry) -> float:
+        """Registra el error (el lugar ya se liberó); devuelve la espera antes de reintentar o relanza."""
+        if not is_throttle_error(exc):
+            raise exc
+        self._count("throttled")
+        self.requests.drain()
+        if attempt >= self.max_retries:
+            raise exc
+        self._count("retries")
+        if on_retry is not None:
+            on_retry(attempt)
+        return self.backoff(attempt, exc)
+
+    def run(
+        self,
+        call: Callable[[], T],
+        estimated_tokens: int = 0,
+        on_retry: Optional[Callable[[int], None]] = None,
+    ) -> T:
+        attempt = 0
+        while True:
+            self.requests.acquire(1)
+            self.tokens.acquire(max(1, estimated_tokens))
+            self.concurrency.acquire()
+            self._count("calls")
+            outcome = _INTERRUPTED
+            try:
+                result = call()
+                outcome = _OK
+            except Exception as exc:
+                outcome = exc
+            finally:
+                # También ante KeyboardInterrupt o cancelación: el lugar no se pierde.
+                self._release(outcome)
+            if outcome is _OK:
+                return result
+            self._sleep(self._on_error(attempt, outcome, on_retry))
+            attempt += 1
+
+    async def arun(
+        self,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        on_retry: Optional[Callable[[int], None]] = None,
+    ) -> T:
+        """Igual que run(), para corutinas; comparte cupos con las llamadas sync."""
+        attempt = 0
+        while True:
+            await self.requests.aacquire(1)
+            await self.tokens.aacquire(max(1, estimated_tokens))
+            await self.concurrency.aacquire()
+            self._count("calls")
+            outcome = _INTERRUPTED
+            try:
+                result = await call()
+                outcome = _OK
+            except Exception as exc:
+                outcome = exc
+            finally:
+                # Cancelada (p. ej. el duplicado perdedor de un hedge): se libera el lugar.
+                self._release(outcome)
+            if outcome is _OK:
+                return result
+            await _async_sleep(self._on_error(attempt, outcome, on_retry))
+            attempt += 1
+
+
+def build_tier_limiters() -> Dict[str, TierLimiter]:
+    """
+    Límites por tier desde el entorno, p. ej. LLM_RPM_PREMIUM, LLM_TPM_CHEAP,
+    LLM_MAX_CONCURRENCY_STANDARD (o sin sufijo para todos los tiers).
+    """
+    return {
+        tier: TierLimiter(
+            rpm=tier_env("LLM_RPM", tier, "600"),
+            tpm=tier_env("LLM_TPM", tier, "150000"),
+            max_concurrency=int(tier_env("LLM_MAX_CONCURRENCY", tier, "8")),
+        )
+        for tier in TIERS
+    }
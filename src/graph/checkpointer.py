@@ -0,0 +1,370 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+# Directorio de estado del proceso (no el cwd): así un build_graph() de un
+# script o benchmark no deja archivos en el repo.
+STATE_DIR = os.path.expanduser(os.getenv(
+    "STATE_DIR",
+    os.path.join(os.getenv("XDG_STATE_HOME", os.path.join("~", ".local", "state")), "smart-research-assistant"),
+))
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(STATE_DIR, "checkpoints.sqlite"))
+# Checkpoints que se conservan por thread (el último alcanza para reanudar).
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "2"))
+# Threads sin actividad por más de este tiempo se borran (0 = nunca).
+CHECKPOINT_MAX_AGE_S = float(os.getenv("CHECKPOINT_MAX_AGE_S", str(7 * 24 * 3600)))
+# Máximo de threads guardados; se borran los más viejos (0 = sin límite).
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "10000"))
+CHECKPOINT_COMPRESSION_LEVEL = int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "6"))
+# Cada cuántas escrituras se corre la poda global por edad / cantidad.
+_PRUNE_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threads_updated ON threads(updated_at);
+"""
+
+
+class CompactSqliteSaver(BaseCheckpointSaver):
+    """
+    Checkpointer persistente en SQLite, pensado para procesos de larga vida.
+
+    - Checkpoints y writes se serializan con el serde de LangGraph y se
+      comprimen con zlib (curated_sections y final_report son strings grandes).
+    - Por thread se guardan solo los últimos CHECKPOINT_KEEP_PER_THREAD.
+    - Periódicamente se borran threads viejos o que exceden CHECKPOINT_MAX_THREADS.
+    - Nada queda en memoria: el footprint no crece con la cantidad de sesiones.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_PATH,
+        keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD,
+        max_age_s: float = CHECKPOINT_MAX_AGE_S,
+        max_threads: int = CHECKPOINT_MAX_THREADS,
+        compression_level: int = CHECKPOINT_COMPRESSION_LEVEL,
+    ):
+        super().__init__()
+        self.path = path
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.max_age_s = max_age_s
+        self.max_threads = max_threads
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._puts = 0
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    @contextmanager
+    def _cursor(self, commit: bool = False):
+        with self._lock:
+            cur = self.conn.cursor()
+            try:
+                yield cur
+                if commit:
+                    self.conn.commit()
+            finally:
+                cur.close()
+
+    # --- serialización -------------------------------------------------
+
+    def _dump(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        return type_, zlib.compress(data, self.compression_level)
+
+    def _load(self, type_: str, blob: bytes) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(blob)))
+
+    # --- API sync ------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self._cursor() as cur:
+            if checkpoint_id:
+                cur.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            else:
+                cur.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                )
+            row = cur.fetchone()
+            if row is None:
+                return None
+            cp_id, parent_id, type_, cp_blob, meta_type, meta_blob = row
+            cur.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+                "ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, cp_id),
+            )
+            write_rows = cur.fetchall()
+
+        return self._to_tuple(thread_id, checkpoint_ns, cp_id, parent_id, type_, cp_blob, meta_type, meta_blob, write_rows)
+
+    def _to_tuple(self, thread_id, checkpoint_ns, cp_id, parent_id, type_, cp_blob, meta_type, meta_blob, write_rows):
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": cp_id,
+                }
+            },
+            checkpoint=self._load(type_, cp_blob),
+            metadata=self._load(meta_type, meta_blob),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self._load(w_type, w_blob))
+                for task_id, channel, w_type, w_blob in write_rows
+            ],
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+        if before is not None:
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._cursor() as cur:
+            rows = cur.execute(query, params).fetchall()
+
+        yielded = 0
+        for thread_id, checkpoint_ns, cp_id, parent_id, type_, cp_blob, meta_type, meta_blob in rows:
+            with self._cursor() as cur:
+                write_rows = cur.execute(
+                    "SELECT task_id, channel, type, value FROM writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+                    "ORDER BY task_id, idx",
+                    (thread_id, checkpoint_ns, cp_id),
+                ).fetchall()
+            item = self._to_tuple(thread_id, checkpoint_ns, cp_id, parent_id, type_, cp_blob, meta_type, meta_blob, write_rows)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            yield item
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        type_, cp_blob = self._dump(checkpoint)
+        meta_type, meta_blob = self._dump(metadata)
+        now = time.time()
+
+        with self._cursor(commit=True) as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                "parent_checkpoint_id, type, checkpoint, metadata_type, metadata, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, cp_blob, meta_type, meta_blob, now),
+            )
+            cur.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, now),
+            )
+            self._trim_thread(cur, thread_id, checkpoint_ns)
+            self._puts += 1
+            if self._puts % _PRUNE_EVERY == 0:
+                self._prune(cur, now)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Los canales especiales (interrupt, error) reemplazan; el resto no se pisa.
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self._dump(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, type_, blob,
+            ))
+        with self._cursor(commit=True) as cur:
+            cur.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._cursor(commit=True) as cur:
+            self._delete_threads(cur, [thread_id])
+
+    # --- retención -----------------------------------------------------
+
+    def _trim_thread(self, cur, thread_id: str, checkpoint_ns: str):
+        cur.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_per_thread),
+        )
+        stale = [(thread_id, checkpoint_ns, r[0]) for r in cur.fetchall()]
+        if not stale:
+            return
+        cur.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale
+        )
+        cur.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale
+        )
+
+    def _delete_threads(self, cur, thread_ids):
+        params = [(t,) for t in thread_ids]
+        cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", params)
+        cur.executemany("DELETE FROM writes WHERE thread_id = ?", params)
+        cur.executemany("DELETE FROM threads WHERE thread_id = ?", params)
+
+    def _prune(self, cur, now: float):
+        expired = []
+        if self.max_age_s:
+            cur.execute("SELECT thread_id FROM threads WHERE updated_at < ?", (now - self.max_age_s,))
+            expired.extend(r[0] for r in cur.fetchall())
+        if self.max_threads:
+            cur.execute(
+                "SELECT thread_id FROM threads ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (self.max_threads,),
+            )
+            expired.extend(r[0] for r in cur.fetchall())
+        if expired:
+            self._delete_threads(cur, set(expired))
+
+    def prune(self):
+        """Aplica las políticas de retención por edad y cantidad de threads."""
+        with self._cursor(commit=True) as cur:
+            self._prune(cur, time.time())
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    # --- API async (delegan en la versión sync en un hilo) -------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
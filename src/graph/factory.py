@@ -0,0 +1,62 @@
+import threading
+from typing import Dict
+
+TIERS = ("cheap", "standard", "premium")
+
+
+class GraphFactory:
+    """
+    Grafos compilados compartidos por proceso, uno por variante (sync / async).
+
+    Compilar el grafo importa langgraph, langchain y todos los agentes: get()
+    lo hace una sola vez y prewarm() lo adelanta en un hilo de fondo (p. ej.
+    mientras la consola espera el tema), junto con los clientes del LLM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graphs: Dict[bool, object] = {}
+        self._warming: Dict[bool, threading.Thread] = {}
+
+    def get(self, async_nodes: bool = False):
+        with self._lock:
+            graph = self._graphs.get(async_nodes)
+            if graph is None:
+                from graph.research_graph import build_graph
+
+                graph = build_graph(async_nodes=async_nodes)
+                self._graphs[async_nodes] = graph
+            return graph
+
+    def prewarm(self, async_nodes: bool = False, clients: bool = True) -> threading.Thread:
+        """Construye el grafo (y opcionalmente los clientes) en background."""
+        with self._lock:
+            thread = self._warming.get(async_nodes)
+            if thread is not None:
+                return thread
+            thread = threading.Thread(
+                target=self._warm, args=(async_nodes, clients), name="graph-prewarm", daemon=True
+            )
+            self._warming[async_nodes] = thread
+        thread.start()
+        return thread
+
+    def _warm(self, async_nodes: bool, clients: bool):
+        try:
+            self.get(async_nodes)
+            if clients:
+                from config.models import CLIENTS
+
+                for tier in TIERS:
+                    CLIENTS.get(tier)
+        except Exception:
+            # Sin credenciales o sin deployment: el error real aparece en el primer uso.
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+            self._warming.clear()
+
+
+GRAPHS = GraphFactory()
@@ -1,20 +1,45 @@
+import os
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import MemorySaver
 from shared.state import ResearchState
-from agents.investigator import investigator_node
-from agents.curator import curator_node
-from agents.reporter import reporter_node
-from agents.supervisor import approval_node
+from agents.investigator import ainvestigator_node, investigator_node
+from agents.curator import acurator_node, curator_node
+from agents.reporter import areporter_node, reporter_node
+from agents.supervisor import approval_node, revision_node, route_start
+from graph.checkpointer import CompactSqliteSaver
+from shared.telemetry import instrument_node
+
+# "sqlite" (persistente, default) o "memory" (MemorySaver, se pierde al reiniciar)
+CHECKPOINTER = os.getenv("CHECKPOINTER", "sqlite")
+
+
+def build_checkpointer():
+    if CHECKPOINTER.lower() == "memory":
+        return MemorySaver()
+    return CompactSqliteSaver()
+
+
+def build_graph(checkpointer=None, async_nodes: bool = False):
+    """
+    Arma y compila el grafo. Con async_nodes=True los nodos que llaman al LLM
+    son corutinas: el grafo debe correrse con ainvoke/astream (ver async_runner).
+    """
+    if async_nodes:
+        investigator, curator, reporter = ainvestigator_node, acurator_node, areporter_node
+    else:
+        investigator, curator, reporter = investigator_node, curator_node, reporter_node
 
-def build_graph():
     builder = StateGraph(ResearchState)
-    builder.add_node("investigator", investigator_node)
-    builder.add_node("approval", approval_node)
-    builder.add_node("curator", curator_node)
-    builder.add_node("reporter", reporter_node)
-    builder.add_edge(START, "investigator")
+    builder.add_node("investigator", instrument_node("investigator", investigator))
+    builder.add_node("approval", instrument_node("approval", approval_node))
+    builder.add_node("curator", instrument_node("curator", curator))
+    builder.add_node("reporter", instrument_node("reporter", reporter))
+    builder.add_node("revision", instrument_node("revision", revision_node))
+    # Corrida nueva -> investigator; thread terminado + edit_command -> revision.
+    builder.add_conditional_edges(START, route_start, {"investigator": "investigator", "revision": "revision"})
+    builder.add_edge("revision", "curator")
     builder.add_edge("investigator", "approval")
     builder.add_edge("approval", "curator")
     builder.add_edge("curator", "reporter")
     builder.add_edge("reporter", END)
-    return builder.compile(checkpointer=MemorySaver())
\ No newline at end of file
+    return builder.compile(checkpointer=checkpointer or build_checkpointer())
@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+
+from config.models import aclose_clients, set_llm_factory, start_cassette_from_env
+from utils.http_server import serve
+
+
+async def _main(args):
+    try:
+        await serve(args.host, args.port)
+    finally:
+        await aclose_clients()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/SSE del asistente de investigación.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fake", action="store_true", help="Usar el backend de LLM fake (sin Azure).")
+    parser.add_argument("--zero-latency", action="store_true", help="Con --fake: sin latencia simulada.")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        from bench.fake_llm import DEFAULT_PROFILES, ZERO_LATENCY_PROFILES, FakeBackend
+
+        profiles = ZERO_LATENCY_PROFILES if args.zero_latency else DEFAULT_PROFILES
+        set_llm_factory(FakeBackend(profiles=dict(profiles)).model)
+    else:
+        start_cassette_from_env()
+
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
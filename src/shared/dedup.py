@@ -0,0 +1,192 @@
+import math
+import os
+from collections import Counter
+from typing import List, Tuple
+
+from shared.keywords import normalize
+from shared.parser import MANUAL_RATIONALE
+from shared.state import Subtopic
+from shared.telemetry import TELEMETRY
+
+# off | flag | merge. Por defecto ("flag") nada se fusiona: los posibles
+# duplicados se avisan en el payload de aprobación y decide el humano. Con
+# "merge" se fusiona sola la salida del Investigador, y solo si el título y la
+# justificación coinciden los dos (DEDUP_MERGE_THRESHOLD). Lo que el humano
+# agregó o modificó nunca se fusiona.
+SUBTOPIC_DEDUP = os.getenv("SUBTOPIC_DEDUP", "flag").lower()
+# Similitud combinada a partir de la cual se marca un par como posible duplicado.
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.72"))
+# Similitud mínima del título y de la justificación (cada una) para fusionar.
+DEDUP_MERGE_THRESHOLD = float(os.getenv("DEDUP_MERGE_THRESHOLD", "0.9"))
+DEDUP_NGRAM = int(os.getenv("DEDUP_NGRAM", "3"))
+# Peso del título frente a la justificación en la similitud combinada.
+DEDUP_TITLE_WEIGHT = float(os.getenv("DEDUP_TITLE_WEIGHT", "0.7"))
+
+
+def char_ngrams(text: str, n: int = DEDUP_NGRAM) -> Counter:
+    """n-gramas de caracteres sobre el texto normalizado (sin acentos, espacios colapsados)."""
+    text = " ".join(normalize(text).split())
+    if not text:
+        return Counter()
+    padded = f" {text} "
+    if len(padded) <= n:
+        return Counter([padded])
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _tfidf_cosine(texts: List[str]) -> List[List[float]]:
+    """Matriz de similitud coseno TF-IDF (n-gramas de caracteres) entre todos los textos."""
+    grams = [char_ngrams(t) for t in texts]
+    n_docs = len(texts)
+    df = Counter(g for doc in grams for g in doc)
+    # idf suavizado: los n-gramas del tema, presentes en todos los subtemas, pesan poco.
+    idf = {g: math.log((1 + n_docs) / (1 + count)) + 1.0 for g, count in df.items()}
+
+    vectors = []
+    for doc in grams:
+        vec = {g: tf * idf[g] for g, tf in doc.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        vectors.append({g: v / norm for g, v in vec.items()})
+    sims = [[0.0] * n_docs for _ in range(n_docs)]
+    for i in range(n_docs):
+        for j in range(i, n_docs):
+            a, b = vectors[i], vectors[j]
+            if len(a) > len(b):
+                a, b = b, a
+            sims[i][j] = sims[j][i] = sum(v * b.get(g, 0.0) for g, v in a.items())
+    return sims
+
+
+def _informative(rationale: str) -> bool:
+    return bool(rationale.strip()) and rationale.strip() != MANUAL_RATIONALE
+
+
+def _similarities(subtopics: List[Subtopic]):
+    titles = _tfidf_cosine([s["title"] for s in subtopics])
+    rationales = _tfidf_cosine([s.get("rationale", "") for s in subtopics])
+    informative = [_informative(s.get("rationale", "")) for s in subtopics]
+    return titles, rationales, informative
+
+
+def similarity_matrix(subtopics: List[Subtopic]) -> List[List[float]]:
+    """Similitud combinada título / justificación entre cada par de subtemas."""
+    titles, rationales, informative = _similarities(subtopics)
+    w = DEDUP_TITLE_WEIGHT
+    n = len(subtopics)
+    # Si alguno no tiene justificación propia (p. ej. agregado con 'add') se compara solo el título.
+    return [
+        [
+            w * titles[i][j] + (1 - w) * rationales[i][j] if informative[i] and informative[j] else titles[i][j]
+            for j in range(n)
+        ]
+        for i in range(n)
+    ]
+
+
+def find_duplicates(subtopics: List[Subtopic], threshold: float = DEDUP_THRESHOLD) -> List[Tuple[int, int, float]]:
+    """Pares (i, j, similitud) con i < j por encima del umbral (índices en la lista)."""
+    if len(subtopics) < 2:
+        return []
+    sims = similarity_matrix(subtopics)
+    return [
+        (i, j, round(sims[i][j], 3))
+        for i in range(len(subtopics))
+        for j in range(i + 1, len(subtopics))
+        if sims[i][j] >= threshold
+    ]
+
+
+def find_mergeable(subtopics: List[Subtopic], threshold: float = DEDUP_MERGE_THRESHOLD) -> List[Tuple[int, int, float]]:
+    """
+    Pares (i, j, similitud) que se pueden fusionar sin perder nada: título y
+    justificación (propia en los dos) por encima del umbral, cada uno por separado.
+    """
+    if len(subtopics) < 2:
+        return []
+    titles, rationales, informative = _similarities(subtopics)
+    return [
+        (i, j, round(min(titles[i][j], rationales[i][j]), 3))
+        for i in range(len(subtopics))
+        for j in range(i + 1, len(subtopics))
+        if informative[i] and informative[j]
+        and titles[i][j] >= threshold and rationales[i][j] >= threshold
+    ]
+
+
+def merge_duplicates(subtopics: List[Subtopic], threshold: float = DEDUP_MERGE_THRESHOLD):
+    """
+    Fusiona los casi-duplicados en el primero de cada grupo (el que apareció
+    antes se conserva; su justificación suma la del duplicado si aporta algo).
+    Los IDs se renumeran de forma consecutiva.
+    Devuelve (subtemas, [(título_conservado, título_descartado, similitud)]).
+    """
+    pairs = find_mergeable(subtopics, threshold)
+    if not pairs:
+        return list(subtopics), []
+
+    # Cada duplicado se une al representante de su grupo (el índice más bajo).
+    parent = list(range(len(subtopics)))
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    merged = []
+    for i, j, score in pairs:
+        ri, rj = root(i), root(j)
+        if ri == rj:
+            continue
+        keep, drop = min(ri, rj), max(ri, rj)
+        parent[drop] = keep
+        merged.append((subtopics[keep]["title"], subtopics[drop]["title"], score))
+
+    result: List[Subtopic] = []
+    by_root = {}
+    for idx, sub in enumerate(subtopics):
+        r = root(idx)
+        if r == idx:
+            by_root[idx] = Subtopic(id=sub["id"], title=sub["title"], rationale=sub.get("rationale", ""))
+            result.append(by_root[idx])
+        else:
+            kept = by_root[r]
+            extra = sub.get("rationale", "").strip()
+            if _informative(extra) and normalize(extra) not in normalize(kept["rationale"]):
+                kept["rationale"] = f"{kept['rationale']} {extra}".strip()
+    for i, sub in enumerate(result, start=1):
+        sub["id"] = i
+    return result, merged
+
+
+def dedup_subtopics(subtopics: List[Subtopic], stage: str) -> List[Subtopic]:
+    """
+    Fusiona los duplicados claros de la salida del Investigador (SUBTOPIC_DEDUP=merge).
+    Cualquier otra etapa, o los modos "flag" (default) / "off", devuelven la lista intacta.
+    """
+    if SUBTOPIC_DEDUP != "merge" or stage != "investigator":
+        return subtopics
+    result, merged = merge_duplicates(subtopics)
+    for kept, dropped, score in merged:
+        TELEMETRY.record("subtopic_dedup", agent=stage, kept=kept, dropped=dropped, similarity=score)
+    return result
+
+
+def duplicate_hints(subtopics: List[Subtopic]) -> List[dict]:
+    """Pares sospechosos (por ID) para mostrar al humano."""
+    return [
+        {"ids": [subtopics[i]["id"], subtopics[j]["id"]], "similarity": score}
+        for i, j, score in find_duplicates(subtopics)
+    ]
+
+
+def flag_duplicates(subtopics: List[Subtopic], stage: str) -> List[dict]:
+    """
+    Después de un comando humano ("approval", "revision") los duplicados no se
+    fusionan: se devuelven como hints (IDs del plan) y quedan en la telemetría.
+    """
+    if SUBTOPIC_DEDUP == "off":
+        return []
+    hints = duplicate_hints(subtopics)
+    for hint in hints:
+        TELEMETRY.record("subtopic_duplicate", agent=stage, ids=hint["ids"], similarity=hint["similarity"])
+    return hints
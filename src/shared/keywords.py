@@ -0,0 +1,104 @@
+import json
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin acentos: "Teoría" -> "teoria"."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+class KeywordMatcher:
+    """
+    Matcher multi-patrón (Aho-Corasick) sobre texto normalizado.
+
+    El autómata se construye una sola vez; scan() recorre el texto en una
+    pasada, con costo independiente del tamaño del vocabulario. Igual que el
+    `kw in text` original, los términos matchean como substrings (sirven raíces
+    como "cuántic"), y cada término cuenta una sola vez.
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, float]]):
+        # weights[i] corresponde a terms[i]; varios términos pueden normalizar igual.
+        self.terms: List[str] = []
+        self.weights: List[float] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        for term, weight in terms:
+            key = normalize(term).strip()
+            if not key:
+                continue
+            self._add(key, len(self.terms))
+            self.terms.append(term)
+            self.weights.append(float(weight))
+        self._build_links()
+
+    def _add(self, key: str, term_id: int):
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(term_id)
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text: str) -> Dict[str, float]:
+        """Devuelve {término: peso} de los términos presentes en text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in normalize(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return {self.terms[i]: self.weights[i] for i in sorted(found)}
+
+    def score(self, text: str) -> float:
+        """Suma de pesos de los términos distintos encontrados."""
+        return sum(self.scan(text).values())
+
+
+def load_terms(path: str) -> List[Tuple[str, float]]:
+    """
+    Carga un vocabulario desde archivo:
+    - .json: {"término": peso, ...} o lista de términos (peso 1).
+    - otro: una entrada por línea, "término" o "término<TAB>peso"; '#' comenta.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+            if isinstance(data, dict):
+                return [(str(k), float(v)) for k, v in data.items()]
+            return [(str(k), 1.0) for k in data]
+
+        terms = []
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            term, _, weight = line.partition("\t")
+            terms.append((term.strip(), float(weight) if weight.strip() else 1.0))
+        return terms
@@ -2,6 +2,8 @@ import re
 from typing import List, Dict
 from .state import Subtopic
 
+MANUAL_RATIONALE = "Añadido manualmente."
+
 def parse_ids(segment: str) -> List[int]:
     ids = []
     for part in segment.split(","):
@@ -52,7 +54,7 @@ def apply_human_commands(commands: str, current: List[Subtopic]) -> List[Subtopi
         result.append({"id": len(result) + 1, "title": title, "rationale": s["rationale"]})
 
     for label in additions:
-        result.append({"id": len(result) + 1, "title": label, "rationale": "Añadido manualmente."})
+        result.append({"id": len(result) + 1, "title": label, "rationale": MANUAL_RATIONALE})
 
     #print(f"[supervisor] subtemas finales:\n{result}")
 
@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from shared.telemetry import TELEMETRY, cost_usd, percentile
+from shared.tokens import token_budget
+
+# "static": heurística por lote (estimate_curator_tier, REPORTER_SECTION_TIER).
+# "learned": un tier por subtema / sección, elegido con la telemetría registrada.
+TIER_ROUTER = os.getenv("TIER_ROUTER", "static").lower()
+# Calidad mínima esperada (probabilidad de una respuesta útil: sin error, sin
+# fallback de tier y con JSON parseable) y latencia p95 máxima por llamada (0 = sin tope).
+ROUTER_QUALITY_TARGET = float(os.getenv("ROUTER_QUALITY_TARGET", "0.95"))
+ROUTER_LATENCY_TARGET_MS = float(os.getenv("ROUTER_LATENCY_TARGET_MS", "0"))
+# Peso (en llamadas) de la calidad a priori frente a la observada.
+ROUTER_PRIOR_WEIGHT = float(os.getenv("ROUTER_PRIOR_WEIGHT", "20"))
+# Eventos de telemetría grabados (JSONL de TELEMETRY_JSONL) para arrancar ya entrenado.
+ROUTER_STATS_PATH = os.getenv("ROUTER_STATS_PATH", "")
+ROUTER_REFRESH_S = float(os.getenv("ROUTER_REFRESH_S", "30"))
+
+TIERS = ("cheap", "standard", "premium")
+BUCKETS = ("low", "mid", "high")
+
+# Calidad a priori por tier y dificultad, antes de tener datos propios.
+PRIOR_QUALITY = {
+    "cheap": {"low": 0.97, "mid": 0.90, "high": 0.80},
+    "standard": {"low": 0.98, "mid": 0.96, "high": 0.92},
+    "premium": {"low": 0.99, "mid": 0.98, "high": 0.97},
+}
+
+
+def difficulty_bucket(difficulty: float) -> str:
+    if difficulty < 1.0 / 3.0:
+        return "low"
+    if difficulty < 2.0 / 3.0:
+        return "mid"
+    return "high"
+
+
+def load_events(path: str) -> List[dict]:
+    """Eventos de un JSONL de telemetría (líneas inválidas se ignoran)."""
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+class TierStats:
+    """
+    Agregados por tier a partir de eventos de telemetría:
+    - llm_call: latencia, tokens de salida, errores.
+    - tier_fallback: el tier falló y el pedido pasó a otro (timeout, 429, 5xx).
+    - route + json_fallback: resultado por subtema y dificultad (el JSON no sirvió).
+    """
+
+    def __init__(self, events: Iterable[dict] = ()):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.completion_tokens: Dict[str, List[int]] = defaultdict(list)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+        # (tier, bucket) -> [intentos, fallidos]
+        self.routed: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+        self.add(events)
+
+    def add(self, events: Iterable[dict]):
+        routes = []
+        json_failed = set()
+        for e in events:
+            kind = e.get("kind")
+            if kind == "llm_call" and not e.get("cache_hit"):
+                tier = e.get("tier")
+                self.calls[tier] += 1
+                if e.get("error"):
+                    self.failures[tier] += 1
+                else:
+                    self.latencies[tier].append(float(e.get("ms", 0.0)))
+                    self.completion_tokens[tier].append(int(e.get("completion_tokens", 0)))
+            elif kind == "tier_fallback" and e.get("reason") not in ("circuit_open", "saturated"):
+                # Los saltos preventivos no son fallas del tier.
+                self.failures[e.get("agent")] += 1
+            elif kind == "route":
+                routes.append(e)
+            elif kind == "json_fallback" and e.get("tier"):
+                json_failed.add((e.get("topic"), e.get("subtopic"), e.get("tier")))
+        for e in routes:
+            slot = self.routed[(e["tier"], difficulty_bucket(e.get("difficulty", 0.0)))]
+            slot[0] += 1
+            if (e.get("topic"), e.get("subtopic"), e["tier"]) in json_failed:
+                slot[1] += 1
+
+    def quality(self, tier: str, bucket: str, prior_weight: float = ROUTER_PRIOR_WEIGHT) -> float:
+        """Probabilidad estimada de una respuesta útil (a priori suavizado con lo observado)."""
+        prior = PRIOR_QUALITY.get(tier, PRIOR_QUALITY["premium"])[bucket]
+        attempts, failed = self.routed.get((tier, bucket), (0, 0))
+        content = ((attempts - failed) + prior * prior_weight) / (attempts + prior_weight)
+        calls = self.calls.get(tier, 0)
+        reliability = 1.0 - self.failures.get(tier, 0) / (calls + prior_weight) if calls else 1.0
+        return max(0.0, content * reliability)
+
+    def latency_p95(self, tier: str) -> Optional[float]:
+        samples = self.latencies.get(tier)
+        return percentile(samples, 95) if samples else None
+
+    def latency_p50(self, tier: str) -> Optional[float]:
+        samples = self.latencies.get(tier)
+        return percentile(samples, 50) if samples else None
+
+    def expected_cost(self, tier: str, prompt_tokens: int) -> float:
+        samples = self.completion_tokens.get(tier)
+        completion = sum(samples) / len(samples) if samples else 0
+        return cost_usd(tier, prompt_tokens, int(completion))
+
+
+class TierRouter:
+    """
+    Elige, por subtema, el tier más barato que cumple la calidad y la latencia
+    objetivo; si ninguno las cumple, el de mayor calidad estimada. Determinista:
+    mismos eventos y mismas entradas dan el mismo tier.
+    """
+
+    def __init__(self, stats: Optional[TierStats] = None, quality_target: float = ROUTER_QUALITY_TARGET,
+                 latency_target_ms: float = ROUTER_LATENCY_TARGET_MS):
+        self.stats = stats or TierStats()
+        self.quality_target = quality_target
+        self.latency_target_ms = latency_target_ms
+
+    def candidates(self, difficulty: float, prompt_tokens: int = 0) -> List[dict]:
+        bucket = difficulty_bucket(difficulty)
+        rows = []
+        for rank, tier in enumerate(TIERS):
+            p95 = self.stats.latency_p95(tier)
+            rows.append({
+                "tier": tier,
+                "rank": rank,
+                "quality": round(self.stats.quality(tier, bucket), 4),
+                "latency_p95_ms": p95,
+                "cost_usd": self.stats.expected_cost(tier, prompt_tokens),
+                "fits": prompt_tokens <= token_budget(tier),
+                "fast": not self.latency_target_ms or p95 is None or p95 <= self.latency_target_ms,
+            })
+        return rows
+
+    def route(self, difficulty: float, prompt_tokens: int = 0) -> str:
+        rows = self.candidates(difficulty, prompt_tokens)
+        ok = [r for r in rows if r["fits"] and r["fast"] and r["quality"] >= self.quality_target]
+        if ok:
+            return min(ok, key=lambda r: (r["cost_usd"], r["rank"]))["tier"]
+        fitting = [r for r in rows if r["fits"]] or rows[-1:]
+        return max(fitting, key=lambda r: (r["quality"], -r["rank"]))["tier"]
+
+
+class LiveRouter:
+    """
+    Router del proceso: parte de los eventos grabados en ROUTER_STATS_PATH y
+    suma los de TELEMETRY (si está activa), recalculando cada ROUTER_REFRESH_S.
+    """
+
+    def __init__(self, stats_path: str = ROUTER_STATS_PATH, refresh_s: float = ROUTER_REFRESH_S):
+        self.stats_path = stats_path
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._router: Optional[TierRouter] = None
+        self._recorded: Optional[List[dict]] = None
+        self._built_at = 0.0
+
+    def _current(self) -> TierRouter:
+        with self._lock:
+            now = time.monotonic()
+            if self._router is None or now - self._built_at >= self.refresh_s:
+                if self._recorded is None:
+                    exists = self.stats_path and os.path.exists(self.stats_path)
+                    self._recorded = load_events(self.stats_path) if exists else []
+                # La ventana de TELEMETRY está acotada (TELEMETRY_MAX_EVENTS).
+                events = self._recorded + TELEMETRY.recent()
+                self._router = TierRouter(TierStats(events))
+                self._built_at = now
+            return self._router
+
+    def route(self, difficulty: float, prompt_tokens: int = 0) -> str:
+        return self._current().route(difficulty, prompt_tokens)
+
+
+ROUTER = LiveRouter()
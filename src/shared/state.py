@@ -1,4 +1,8 @@
-from typing import TypedDict, List
+from typing import TypedDict, List, Dict
+
+# Clave de los fragmentos del informe que el reporter emite en el stream
+# "custom" del grafo (modo map-reduce); la consola y el SSE los muestran.
+REPORT_TOKEN = "report_token"
 
 class Subtopic(TypedDict):
     id: int
@@ -15,5 +19,12 @@ class ResearchState(TypedDict, total=False):
     topic: str
     initial_subtopics: List[Subtopic]
     approved_subtopics: List[Subtopic]
+    # Posibles duplicados en el plan aprobado ({"ids": [a, b], "similarity": x}).
+    duplicate_hints: List[dict]
     curated_sections: List[CuratedSection]
-    final_report: str
\ No newline at end of file
+    final_report: str
+    # Edición posterior al informe (thread ya terminado) y caches para recalcular
+    # solo lo que cambió: subtema -> sección curada, sección curada -> texto del informe.
+    edit_command: str
+    curated_by_key: Dict[str, CuratedSection]
+    written_sections: Dict[str, str]
\ No newline at end of file
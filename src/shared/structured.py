@@ -0,0 +1,191 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from shared.state import Subtopic
+from shared.telemetry import TELEMETRY
+
+# Resultados de parseo por agente: "ok" (JSON limpio), "recovered" (extraído
+# de texto con ruido) y "failed" (se usó el contenido genérico).
+_STATS: Dict[str, Counter] = {}
+_STATS_LOCK = threading.Lock()
+
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _count(agent: str, outcome: str):
+    with _STATS_LOCK:
+        _STATS.setdefault(agent, Counter())[outcome] += 1
+
+
+def parse_stats() -> Dict[str, Dict[str, int]]:
+    with _STATS_LOCK:
+        return {agent: dict(counts) for agent, counts in _STATS.items()}
+
+
+def reset_parse_stats():
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Cierra strings, arrays y objetos que quedaron abiertos (respuesta cortada
+    por max_tokens). Recorre el texto una vez llevando la pila de aperturas.
+    """
+    stack = []
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "[{":
+            stack.append("]" if ch == "[" else "}")
+        elif ch in "]}" and stack:
+            stack.pop()
+    tail = '"' if in_string else ""
+    return _TRAILING_COMMA_RE.sub(r"\1", (text + tail).rstrip().rstrip(",") + "".join(reversed(stack)))
+
+
+def _candidates(text: str, opener: str):
+    """Valores JSON que empiezan en cada aparición de opener, en orden."""
+    decoder = json.JSONDecoder()
+    idx = text.find(opener)
+    while idx != -1:
+        try:
+            yield decoder.raw_decode(text, idx)[0]
+        except ValueError:
+            fragment = text[idx:]
+            for repaired in (_TRAILING_COMMA_RE.sub(r"\1", fragment), _close_truncated(fragment)):
+                try:
+                    yield decoder.raw_decode(repaired)[0]
+                    break
+                except ValueError:
+                    continue
+        idx = text.find(opener, idx + 1)
+
+
+def _records(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(i, dict) for i in value)
+
+
+def extract_json(raw: str, expected: type) -> Tuple[Any, bool]:
+    """
+    Devuelve (valor, recuperado). Primero intenta json.loads directo; si no,
+    busca el valor del tipo esperado dentro del texto (fences de markdown,
+    texto antes o después, comas finales, JSON cortado). Para listas prefiere
+    una lista de objetos, aunque aparezca después de otra lista (p. ej. una de
+    strings anidada o citada antes), y también acepta un objeto que envuelve
+    la lista, p. ej. {"subtopics": [...]}; si no hay, la primera lista.
+    """
+    text = (raw or "").strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, expected):
+            return value, False
+    except ValueError:
+        pass
+
+    if expected is not list:
+        for value in _candidates(text, "{"):
+            if isinstance(value, expected):
+                return value, True
+        raise ValueError(f"No se encontró un {expected.__name__} JSON en la respuesta.")
+
+    first = None
+    for value in _candidates(text, "["):
+        if _records(value):
+            return value, True
+        if first is None and isinstance(value, list):
+            first = value
+    for value in _candidates(text, "{"):
+        if isinstance(value, dict):
+            for inner in value.values():
+                if _records(inner):
+                    return inner, True
+    if first is not None:
+        return first, True
+    raise ValueError("No se encontró un list JSON en la respuesta.")
+
+
+def _str_list(value) -> List[str]:
+    if isinstance(value, str):
+        # Algunos modelos devuelven la lista como texto con viñetas.
+        value = [line.lstrip("-*• ").strip() for line in value.splitlines()]
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def validate_subtopics(data: list) -> List[Subtopic]:
+    """Subtemas con título, IDs consecutivos desde 1; falla si no queda ninguno."""
+    subs: List[Subtopic] = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        title = str(item.get("title", "")).strip()
+        if not title:
+            continue
+        rationale = str(item.get("rationale", "")).strip()
+        subs.append(
+            Subtopic(
+                id=len(subs) + 1,
+                title=title,
+                rationale=rationale or "Subtema relevante para el análisis del tema.",
+            )
+        )
+    if not subs:
+        raise ValueError("Lista de subtemas vacía.")
+    return subs
+
+
+def validate_curated(data: dict) -> dict:
+    """
+    Normaliza la salida del Curador a {key_points, synthesis, recommended_sources}.
+    Los campos faltantes quedan vacíos; falla si no vino ninguno.
+    """
+    result = {
+        "key_points": _str_list(data.get("key_points", [])),
+        "synthesis": str(data.get("synthesis", "") or "").strip(),
+        "recommended_sources": _str_list(data.get("recommended_sources", [])),
+    }
+    if not any(result.values()):
+        raise ValueError("El objeto JSON no tiene ningún campo del Curador.")
+    return result
+
+
+def is_parseable(raw: str, expected: type, validate: Callable[[Any], Any]) -> bool:
+    """Si la respuesta daría un resultado válido (sin contar estadísticas)."""
+    try:
+        validate(extract_json(raw, expected)[0])
+    except ValueError:
+        return False
+    return True
+
+
+def parse_structured(raw: str, agent: str, expected: type, validate: Callable[[Any], Any]):
+    """
+    Extrae y valida la respuesta estructurada de un agente, contando el
+    resultado. Lanza ValueError si no hay nada utilizable (el agente decide
+    el fallback).
+    """
+    try:
+        value, recovered = extract_json(raw, expected)
+        result = validate(value)
+    except ValueError:
+        _count(agent, "failed")
+        raise
+    if recovered:
+        _count(agent, "recovered")
+        TELEMETRY.record("json_recovered", agent=agent)
+    else:
+        _count(agent, "ok")
+    return result
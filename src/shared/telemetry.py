@@ -0,0 +1,208 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional
+
+# Instrumentación de nodos y llamadas al LLM. Apagada por defecto: cuando
+# TELEMETRY no está activo, los nodos no se envuelven y record() no hace nada.
+TELEMETRY_ENABLED = os.getenv("TELEMETRY", "0").lower() in ("1", "true", "yes")
+TELEMETRY_JSONL = os.getenv("TELEMETRY_JSONL", "")
+TELEMETRY_PROM = os.getenv("TELEMETRY_PROM", "")
+# Eventos recientes que se guardan en memoria (los usa el router aprendido);
+# los totales se acumulan aparte y no dependen de esta ventana.
+TELEMETRY_MAX_EVENTS = int(os.getenv("TELEMETRY_MAX_EVENTS", "5000"))
+
+TIERS = ("cheap", "standard", "premium")
+
+
+def _price(kind: str, tier: str) -> float:
+    # USD por 1K tokens, p. ej. LLM_PRICE_IN_PREMIUM=0.03
+    return float(os.getenv(f"LLM_PRICE_{kind}_{tier.upper()}", "0"))
+
+
+PRICES = {tier: (_price("IN", tier), _price("OUT", tier)) for tier in TIERS}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano (values no vacío)."""
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class Telemetry:
+    """
+    Colector de eventos en memoria del proceso, con export opcional a JSONL
+    (un evento por línea, a medida que ocurren) y a texto Prometheus.
+    Guarda solo los últimos max_events eventos; los agregados son acumulados.
+    """
+
+    def __init__(self, enabled: bool = TELEMETRY_ENABLED, jsonl_path: str = TELEMETRY_JSONL,
+                 max_events: int = TELEMETRY_MAX_EVENTS):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=max_events)
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self._llm = defaultdict(lambda: defaultdict(float))
+        self._nodes = defaultdict(lambda: defaultdict(float))
+        self._counters = defaultdict(float)
+
+    def record(self, kind: str, **fields):
+        if not self.enabled:
+            return
+        event = {"kind": kind, "ts": time.time(), **fields}
+        with self._lock:
+            self.events.append(event)
+            self._accumulate(event)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self._reset_totals()
+
+    def recent(self) -> List[dict]:
+        """Copia de los eventos que siguen en la ventana."""
+        with self._lock:
+            return list(self.events)
+
+    # --- agregados -----------------------------------------------------
+
+    def _accumulate(self, e: dict):
+        if e["kind"] == "llm_call":
+            agg = self._llm[e["tier"]]
+            agg["calls"] += 1
+            agg["ms"] += e["ms"]
+            agg["prompt_tokens"] += e.get("prompt_tokens", 0)
+            agg["completion_tokens"] += e.get("completion_tokens", 0)
+            agg["cost_usd"] += e.get("cost_usd", 0.0)
+            agg["cache_hits"] += 1 if e.get("cache_hit") else 0
+            agg["retries"] += e.get("retries", 0)
+            agg["errors"] += 1 if e.get("error") else 0
+        elif e["kind"] == "node":
+            agg = self._nodes[e["node"]]
+            agg["runs"] += 1
+            agg["ms"] += e["ms"]
+        else:
+            self._counters[e["kind"] + ":" + str(e.get("agent", ""))] += 1
+
+    def aggregate(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                "llm": {tier: dict(a) for tier, a in self._llm.items()},
+                "nodes": {node: dict(a) for node, a in self._nodes.items()},
+                "counters": dict(self._counters),
+            }
+
+    def summary_table(self) -> str:
+        agg = self.aggregate()
+        lines = ["", "=== Resumen de ejecución ===", ""]
+        lines.append(f"{'nodo':<14} {'corridas':>8} {'total ms':>10}")
+        for node, a in sorted(agg["nodes"].items()):
+            lines.append(f"{node:<14} {int(a['runs']):>8} {a['ms']:>10.0f}")
+        lines.append("")
+        lines.append(
+            f"{'tier':<10} {'llamadas':>8} {'cache':>6} {'reint.':>6} {'errores':>7} "
+            f"{'ms':>9} {'tok in':>8} {'tok out':>8} {'USD':>8}"
+        )
+        for tier, a in sorted(agg["llm"].items()):
+            lines.append(
+                f"{tier:<10} {int(a['calls']):>8} {int(a['cache_hits']):>6} {int(a['retries']):>6} "
+                f"{int(a['errors']):>7} {a['ms']:>9.0f} {int(a['prompt_tokens']):>8} "
+                f"{int(a['completion_tokens']):>8} {a['cost_usd']:>8.4f}"
+            )
+        if agg["counters"]:
+            lines.append("")
+            for name, value in sorted(agg["counters"].items()):
+                lines.append(f"{name:<30} {int(value):>6}")
+        return "\n".join(lines)
+
+    def prometheus_text(self) -> str:
+        agg = self.aggregate()
+        out = []
+        metrics = (
+            ("llm_calls_total", "calls"),
+            ("llm_latency_ms_sum", "ms"),
+            ("llm_prompt_tokens_total", "prompt_tokens"),
+            ("llm_completion_tokens_total", "completion_tokens"),
+            ("llm_cost_usd_total", "cost_usd"),
+            ("llm_cache_hits_total", "cache_hits"),
+            ("llm_retries_total", "retries"),
+            ("llm_errors_total", "errors"),
+        )
+        for metric, field in metrics:
+            out.append(f"# TYPE {metric} counter")
+            for tier, a in sorted(agg["llm"].items()):
+                out.append(f'{metric}{{tier="{tier}"}} {a[field]:g}')
+        out.append("# TYPE node_latency_ms_sum counter")
+        for node, a in sorted(agg["nodes"].items()):
+            out.append(f'node_latency_ms_sum{{node="{node}"}} {a["ms"]:g}')
+        out.append("# TYPE node_runs_total counter")
+        for node, a in sorted(agg["nodes"].items()):
+            out.append(f'node_runs_total{{node="{node}"}} {a["runs"]:g}')
+        out.append("# TYPE events_total counter")
+        for name, value in sorted(agg["counters"].items()):
+            kind, agent = name.split(":", 1)
+            out.append(f'events_total{{kind="{kind}",agent="{agent}"}} {value:g}')
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: Optional[str] = None):
+        path = path or TELEMETRY_PROM
+        if not (self.enabled and path):
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+TELEMETRY = Telemetry()
+
+
+def cost_usd(tier: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = PRICES.get(tier, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1000.0
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Envuelve un nodo del grafo para medir su latencia (no-op si está apagado)."""
+    if not TELEMETRY.enabled:
+        return fn
+
+    import inspect
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(state, *args, **kwargs):
+            start = time.perf_counter()
+            status = "ok"
+            try:
+                return await fn(state, *args, **kwargs)
+            except BaseException as exc:
+                status = type(exc).__name__
+                raise
+            finally:
+                TELEMETRY.record("node", node=name, ms=(time.perf_counter() - start) * 1000.0, status=status)
+
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return fn(state, *args, **kwargs)
+        except BaseException as exc:
+            # GraphInterrupt (pausa de aprobación) también pasa por acá.
+            status = type(exc).__name__
+            raise
+        finally:
+            TELEMETRY.record("node", node=name, ms=(time.perf_counter() - start) * 1000.0, status=status)
+
+    return wrapper
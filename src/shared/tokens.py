@@ -0,0 +1,97 @@
+import functools
+import os
+import re
+from typing import List
+
+TIERS = ("cheap", "standard", "premium")
+
+# Presupuesto de tokens de entrada por llamada (system + user), por tier.
+TOKEN_BUDGETS = {
+    tier: int(os.getenv(f"TOKEN_BUDGET_{tier.upper()}", default))
+    for tier, default in (("cheap", "8000"), ("standard", "16000"), ("premium", "32000"))
+}
+
+TRUNCATION_MARKER = "\n[... contenido recortado por presupuesto de tokens ...]\n"
+
+# Heurística calibrada para texto en español con los tokenizers de OpenAI:
+# ~1.3 tokens por palabra y 1 por signo de puntuación / símbolo.
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SYMBOL_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    # tiktoken (y su tabla BPE) se carga en el primer conteo, no al importar.
+    try:  # tokenizer local exacto, si está instalado
+        import tiktoken
+        return tiktoken.get_encoding(os.getenv("TOKEN_ENCODING", "cl100k_base"))
+    except Exception:  # ImportError o encoding no disponible offline
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    words = len(_WORD_RE.findall(text))
+    symbols = len(_SYMBOL_RE.findall(text))
+    return int(words * 1.3 + symbols) + 1
+
+
+def estimate_messages_tokens(messages: List[dict]) -> int:
+    # ~4 tokens de overhead por mensaje en el formato chat
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+def token_budget(tier: str) -> int:
+    return TOKEN_BUDGETS.get(tier, TOKEN_BUDGETS["premium"])
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Recorta text de forma determinista para que entre en max_tokens.
+    Conserva el comienzo (instrucciones, tema) y el final (pedido de salida).
+    """
+    current = estimate_tokens(text)
+    if current <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    ratio = max_tokens / current
+    keep = max(0, int(len(text) * ratio * 0.95) - len(TRUNCATION_MARKER))
+    head = int(keep * 0.7)
+    tail = keep - head
+    truncated = text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else "")
+
+    # La estimación es proporcional, así que suele bastar un paso; si no, se achica.
+    while estimate_tokens(truncated) > max_tokens and keep > 0:
+        keep = int(keep * 0.9)
+        head = int(keep * 0.7)
+        tail = keep - head
+        truncated = text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else "")
+    if estimate_tokens(truncated) > max_tokens:
+        # Ni el marcador entra en el presupuesto: queda solo el comienzo.
+        cut = int(len(text) * ratio)
+        while cut > 0 and estimate_tokens(text[:cut]) > max_tokens:
+            cut = int(cut * 0.9)
+        truncated = text[:cut]
+    return truncated
+
+
+def fit_prompt(tier: str, system_prompt: str, user_prompt: str):
+    """
+    Ajusta el user_prompt al presupuesto del tier (el system prompt no se toca).
+    Devuelve (user_prompt, tokens_estimados, recortado).
+    """
+    budget = token_budget(tier)
+    system_tokens = estimate_tokens(system_prompt) + 4
+    user_tokens = estimate_tokens(user_prompt) + 4
+    total = system_tokens + user_tokens
+    if total <= budget:
+        return user_prompt, total, False
+
+    fitted = truncate_to_tokens(user_prompt, budget - system_tokens - 4)
+    return fitted, system_tokens + estimate_tokens(fitted) + 4, True
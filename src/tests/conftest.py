@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos se importan como en los entry points (desde src/).
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture
+def fake_backend():
+    """Backend fake sin latencia, sin cache de respuestas; se restaura al terminar."""
+    from bench.fake_llm import ZERO_LATENCY_PROFILES, FakeBackend
+    from config import models
+
+    backend = FakeBackend(profiles=dict(ZERO_LATENCY_PROFILES))
+    previous_cache = models.RESPONSE_CACHE
+    models.set_llm_factory(backend.model)
+    models.set_response_cache(None)
+    yield backend
+    models.set_llm_factory(None)
+    models.set_response_cache(previous_cache)
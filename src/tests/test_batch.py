@@ -0,0 +1,21 @@
+import pytest
+
+from utils.batch_runner import load_jobs
+
+
+def test_repeated_topics_get_distinct_stable_ids(tmp_path):
+    path = tmp_path / "temas.jsonl"
+    path.write_text(
+        '{"topic": "Energía solar"}\n\n{"topic": "Energía solar", "command": "approve 1"}\n',
+        encoding="utf-8",
+    )
+    first = [job["id"] for job in load_jobs(str(path))]
+    assert len(set(first)) == 2
+    assert first == [job["id"] for job in load_jobs(str(path))]
+
+
+def test_repeated_explicit_ids_are_rejected(tmp_path):
+    path = tmp_path / "temas.jsonl"
+    path.write_text('{"id": "a", "topic": "Uno"}\n{"id": "a", "topic": "Dos"}\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_jobs(str(path))
@@ -0,0 +1,31 @@
+import asyncio
+
+from config import models
+from config.cache import ResponseCache
+
+
+def test_tiers_do_not_share_cached_responses(fake_backend):
+    # Sin Azure el deployment es None en todos los tiers.
+    models.set_response_cache(ResponseCache())
+    models.llm_invoke("cheap", "Sistema", "Mismo prompt")
+    models.llm_invoke("premium", "Sistema", "Mismo prompt")
+    models.llm_invoke("premium", "Sistema", "Mismo prompt")
+    assert fake_backend.calls == {"cheap": 1, "premium": 1}
+
+
+def test_unusable_responses_are_not_cached(fake_backend):
+    cache = ResponseCache()
+    models.set_response_cache(cache)
+
+    def never(raw):
+        return False
+
+    models.llm_invoke("cheap", "Sistema", "Prompt", cacheable=never)
+    asyncio.run(models.allm_invoke("cheap", "Sistema", "Prompt", cacheable=never))
+    assert fake_backend.calls["cheap"] == 2
+    assert cache.stats["writes"] == 0
+
+    # Una entrada ya guardada que no sirve se ignora.
+    models.llm_invoke("cheap", "Sistema", "Prompt")
+    models.llm_invoke("cheap", "Sistema", "Prompt", cacheable=never)
+    assert fake_backend.calls["cheap"] == 4
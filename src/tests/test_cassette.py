@@ -0,0 +1,52 @@
+import gzip
+import os
+import subprocess
+import sys
+
+from config import cassette, models
+from config.cassette import CassettePlayer, CassetteRecorder
+
+MESSAGES = [{"role": "system", "content": "s"}, {"role": "user", "content": "u"}]
+
+
+def test_entries_survive_crash_and_truncated_tail(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    recorder = CassetteRecorder(path)
+    recorder.record("cheap", MESSAGES, "primera", 10.0, {})
+    recorder.record("premium", MESSAGES, "segunda", 20.0, {})
+    # Sin close(): lo grabado ya está en disco.
+    assert os.path.getsize(path) > 0
+
+    # Una sesión posterior cortada a mitad de un miembro gzip.
+    partial = gzip.compress(b'{"k":"x","t":"cheap","ms":1,"n":1,"c":"tercera"}\n')
+    with open(path, "ab") as f:
+        f.write(partial[: len(partial) // 2])
+
+    player = CassettePlayer(path, latency="zero")
+    assert len(player) == 2
+    assert player.lookup("cheap", MESSAGES)["c"] == "primera"
+    assert player.lookup("premium", MESSAGES)["c"] == "segunda"
+    recorder.close()
+
+
+def test_import_does_not_start_the_cassette(tmp_path):
+    env = dict(os.environ, LLM_CASSETTE="replay", LLM_CASSETTE_PATH=str(tmp_path / "missing.jsonl.gz"))
+    code = "import config.models as m; print(m.CASSETTE is None)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                         env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "True"
+
+
+def test_entry_points_start_the_cassette_from_env(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    recorder = CassetteRecorder(path)
+    recorder.record("cheap", MESSAGES, "grabada", 10.0, {})
+    recorder.close()
+    monkeypatch.setattr(models, "LLM_CASSETTE", "replay")
+    monkeypatch.setattr(cassette, "LLM_CASSETTE_PATH", path)
+    try:
+        player = models.start_cassette_from_env()
+        assert isinstance(player, CassettePlayer) and len(player) == 1
+    finally:
+        models.stop_cassette()
+    assert models.CASSETTE is None
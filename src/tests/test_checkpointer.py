@@ -0,0 +1,59 @@
+import sqlite3
+import zlib
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from graph.checkpointer import _PRUNE_EVERY, CompactSqliteSaver
+
+
+def _put(saver, thread_id, n, report="", parent=None):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = f"{n:06d}"
+    checkpoint["channel_values"] = {"final_report": report}
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": parent}}
+    return saver.put(config, checkpoint, {"step": n}, {})
+
+
+def test_round_trip_is_compressed(tmp_path):
+    saver = CompactSqliteSaver(path=str(tmp_path / "cp.sqlite"))
+    report = "## Sección\n\n" + "Texto repetido del informe. " * 500
+    config = _put(saver, "t", 1, report)
+    saver.put_writes(config, [("final_report", report)], task_id="reporter")
+
+    item = saver.get_tuple({"configurable": {"thread_id": "t"}})
+    assert item.checkpoint["channel_values"]["final_report"] == report
+    assert item.metadata == {"step": 1}
+    assert item.pending_writes == [("reporter", "final_report", report)]
+
+    (blob,) = sqlite3.connect(saver.path).execute("SELECT checkpoint FROM checkpoints").fetchone()
+    assert len(blob) < len(report) / 10
+    assert zlib.decompress(blob)
+    saver.close()
+
+
+def test_keeps_only_the_last_checkpoints_per_thread(tmp_path):
+    saver = CompactSqliteSaver(path=str(tmp_path / "cp.sqlite"), keep_per_thread=2)
+    parent = None
+    for n in range(1, 6):
+        parent = _put(saver, "t", n, parent=parent)["configurable"]["checkpoint_id"]
+    ids = [item.config["configurable"]["checkpoint_id"] for item in saver.list({"configurable": {"thread_id": "t"}})]
+    assert ids == ["000005", "000004"]
+    assert saver.get_tuple({"configurable": {"thread_id": "t"}}).parent_config["configurable"]["checkpoint_id"] == "000004"
+    saver.close()
+
+
+def test_old_threads_are_pruned_every_n_puts(tmp_path):
+    saver = CompactSqliteSaver(path=str(tmp_path / "cp.sqlite"), max_threads=3, max_age_s=0)
+    for n in range(1, _PRUNE_EVERY):
+        _put(saver, f"thread-{n}", n)
+    threads = sqlite3.connect(saver.path).execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+    assert threads == _PRUNE_EVERY - 1
+
+    _put(saver, "thread-last", _PRUNE_EVERY)
+    conn = sqlite3.connect(saver.path)
+    assert conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0] == 3
+    assert saver.get_tuple({"configurable": {"thread_id": "thread-last"}}) is not None
+    assert saver.get_tuple({"configurable": {"thread_id": "thread-1"}}) is None
+    saver.close()
+
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+from config import models
+from config.models import ClientRegistry
+
+
+def test_env_refresh_keeps_the_async_pool_until_aclose(monkeypatch):
+    monkeypatch.setattr(models, "_build_llm", lambda tier, http_client=None, http_async_client=None: object())
+    monkeypatch.setenv("AZURE_OPENAI_PREMIUM_DEPLOYMENT", "gpt-a")
+    registry = ClientRegistry()
+    first = registry.get("premium")
+    old_pool = registry._http_async_client
+
+    monkeypatch.setenv("AZURE_OPENAI_PREMIUM_DEPLOYMENT", "gpt-b")
+    assert registry.get("premium") is not first
+    assert registry._http_async_client is not old_pool
+    assert not old_pool.is_closed
+
+    current_pool = registry._http_async_client
+    asyncio.run(registry.aclose())
+    assert old_pool.is_closed and current_pool.is_closed
+
+
+def test_slow_build_does_not_block_other_tiers():
+    started, release = threading.Event(), threading.Event()
+    built = []
+
+    def factory(tier):
+        if tier == "premium":
+            started.set()
+            release.wait(2.0)
+        built.append(tier)
+        return tier
+
+    registry = ClientRegistry()
+    registry.set_factory(factory)
+    slow = threading.Thread(target=registry.get, args=("premium",))
+    slow.start()
+    started.wait(2.0)
+    try:
+        assert registry.get("cheap") == "cheap"
+        assert built == ["cheap"]
+    finally:
+        release.set()
+        slow.join()
+    assert registry.get("premium") == "premium"
+    assert built == ["cheap", "premium"]
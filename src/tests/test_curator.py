@@ -0,0 +1,96 @@
+import asyncio
+import re
+
+import pytest
+
+from agents import curator
+from bench.fake_llm import ZERO_LATENCY_PROFILES, FakeBackend
+from config import models
+
+SUBTOPICS = 6
+
+
+class _ReversedBackend(FakeBackend):
+    """El curador tarda más en los primeros subtemas: terminan en orden inverso."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.finished = []
+
+    def _plan(self, tier, messages):
+        chunks, delay = super()._plan(tier, messages)
+        match = re.search(r'Subtema: "Subtema (\d+)"', messages[-1]["content"])
+        if match:
+            delay += max(0, SUBTOPICS - int(match.group(1))) * 0.03
+        return chunks, delay
+
+    def respond(self, tier, messages):
+        chunks = super().respond(tier, messages)
+        self._finished(messages)
+        return chunks
+
+    async def arespond(self, tier, messages):
+        chunks = await super().arespond(tier, messages)
+        self._finished(messages)
+        return chunks
+
+    def _finished(self, messages):
+        match = re.search(r'Subtema: "(Subtema \d+)"', messages[-1]["content"])
+        with self._lock:
+            self.finished.append(match.group(1))
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = _ReversedBackend(profiles=dict(ZERO_LATENCY_PROFILES))
+    previous_cache = models.RESPONSE_CACHE
+    models.set_llm_factory(backend.model)
+    models.set_response_cache(None)
+    monkeypatch.setattr(curator, "CURATOR_MAX_WORKERS", SUBTOPICS)
+    monkeypatch.setattr(curator, "SPECULATIVE_CURATION", False)
+    yield backend
+    models.set_llm_factory(None)
+    models.set_response_cache(previous_cache)
+
+
+def _state():
+    approved = [
+        {"id": i, "title": f"Subtema {i}", "rationale": f"Justificación {i}."}
+        for i in range(1, SUBTOPICS + 1)
+    ]
+    return {"topic": "Historia del cine", "approved_subtopics": approved}
+
+
+def _titles(result):
+    return [section["subtopic_title"] for section in result["curated_sections"]]
+
+
+def test_concurrent_curation_keeps_the_approved_order(backend):
+    result = curator.curator_node(_state())
+
+    expected = [f"Subtema {i}" for i in range(1, SUBTOPICS + 1)]
+    assert backend.finished == expected[::-1]
+    assert _titles(result) == expected
+    assert list(result["curated_by_key"]) == [curator.subtopic_key("Historia del cine", s)
+                                              for s in _state()["approved_subtopics"]]
+
+
+def test_async_curation_keeps_the_approved_order(backend):
+    result = asyncio.run(curator.acurator_node(_state()))
+
+    expected = [f"Subtema {i}" for i in range(1, SUBTOPICS + 1)]
+    assert backend.finished == expected[::-1]
+    assert _titles(result) == expected
+
+
+def test_edit_recurates_only_new_subtopics_in_place(backend):
+    first = curator.curator_node(_state())
+    state = _state()
+    state["approved_subtopics"].insert(2, {"id": 99, "title": "Subtema 99", "rationale": "Nuevo."})
+    state["curated_by_key"] = first["curated_by_key"]
+    backend.finished.clear()
+
+    result = curator.curator_node(state)
+
+    assert backend.finished == ["Subtema 99"]
+    assert _titles(result)[:4] == ["Subtema 1", "Subtema 2", "Subtema 99", "Subtema 3"]
@@ -0,0 +1,45 @@
+from shared.dedup import dedup_subtopics, flag_duplicates
+from shared.parser import apply_human_commands
+
+INITIAL = [
+    {"id": 1, "title": "Aprendizaje supervisado", "rationale": "Modelos entrenados con etiquetas."},
+    {"id": 2, "title": "Ética de la IA", "rationale": "Sesgos y responsabilidad."},
+]
+
+
+def test_human_additions_are_flagged_not_merged():
+    edited = apply_human_commands('add "Aprendizaje no supervisado"', INITIAL)
+    assert dedup_subtopics(edited, "approval") == edited
+    hints = flag_duplicates(edited, "approval")
+    assert [h["ids"] for h in hints] == [[1, 3]]
+
+
+def test_investigator_output_is_only_flagged_by_default():
+    proposed = INITIAL + [
+        {"id": 3, "title": "Aprendizaje Supervisado", "rationale": "Modelos entrenados con etiquetas."},
+    ]
+    assert dedup_subtopics(proposed, "investigator") == proposed
+    assert [h["ids"] for h in flag_duplicates(proposed, "investigator")] == [[1, 3]]
+
+
+def test_investigator_output_is_merged_when_title_and_rationale_match(monkeypatch):
+    monkeypatch.setattr("shared.dedup.SUBTOPIC_DEDUP", "merge")
+    proposed = INITIAL + [
+        {"id": 3, "title": "Aprendizaje Supervisado", "rationale": "Modelos entrenados con etiquetas."},
+    ]
+    merged = dedup_subtopics(proposed, "investigator")
+    assert [s["title"] for s in merged] == ["Aprendizaje supervisado", "Ética de la IA"]
+
+
+def test_shared_prefix_is_not_merged(monkeypatch):
+    monkeypatch.setattr("shared.dedup.SUBTOPIC_DEDUP", "merge")
+    proposed = [
+        {"id": 1, "title": "Impacto de la IA en la salud mental",
+         "rationale": "Cómo la inteligencia artificial cambia la atención de la salud mental."},
+        {"id": 2, "title": "Impacto de la IA en la salud pública",
+         "rationale": "Cómo la inteligencia artificial cambia la atención de la salud pública."},
+        {"id": 3, "title": "Costos", "rationale": "Inversión y retorno."},
+    ]
+    assert dedup_subtopics(proposed, "investigator") == proposed
+    # Supera el umbral de aviso: se marca para que decida el humano.
+    assert [h["ids"] for h in flag_duplicates(proposed, "investigator")] == [[1, 2]]
@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import pytest
+
+from bench.fake_llm import FakeBackend, FakeLLMError, TierProfile
+from config import hedging, models
+from config.rate_limit import build_tier_limiters
+from shared.telemetry import Telemetry
+
+
+class _Unavailable(FakeLLMError):
+    """Imita un 503 del proveedor (error degradable)."""
+    status_code = 503
+
+
+class _Backend(FakeBackend):
+    """FakeBackend con tiers caídos y una demora extra solo para el primer pedido."""
+
+    def __init__(self, *args, down=(), first_delay=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.down = set(down)
+        self.first_delay = first_delay
+        self.attempts = []
+
+    def _plan(self, tier, messages):
+        with self._lock:
+            self.attempts.append(tier)
+            first = len(self.attempts) == 1
+        if tier in self.down:
+            raise _Unavailable(f"503: {tier} no disponible")
+        chunks, delay = super()._plan(tier, messages)
+        return chunks, delay + (self.first_delay if first else 0.0)
+
+
+def _profiles(**latencies):
+    return {
+        tier: TierProfile(latency_ms=latencies.get(tier, 0), sigma=0, tokens_per_s=0)
+        for tier in ("cheap", "standard", "premium")
+    }
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Instala un _Backend y aísla timeouts, hedging, circuito, limiters y telemetría."""
+    telemetry = Telemetry(enabled=True, jsonl_path="")
+    latencies = {tier: hedging.LatencyTracker() for tier in hedging.TIERS}
+    monkeypatch.setattr(models, "TELEMETRY", telemetry)
+    monkeypatch.setattr(models, "RATE_LIMITERS", build_tier_limiters())
+    monkeypatch.setattr(models, "HEALTH", hedging.TierHealth())
+    monkeypatch.setattr(models, "LATENCIES", latencies)
+    monkeypatch.setattr(hedging, "LATENCIES", latencies)
+    monkeypatch.setattr(models, "LLM_FALLBACK", False)
+    monkeypatch.setattr(models, "LLM_HEDGE", False)
+    previous_cache = models.RESPONSE_CACHE
+    models.set_response_cache(None)
+
+    def install(**kwargs):
+        backend = _Backend(**kwargs)
+        models.set_llm_factory(backend.model)
+        return backend, telemetry
+
+    yield install
+    models.set_llm_factory(None)
+    models.set_response_cache(previous_cache)
+
+
+def _kinds(telemetry, kind):
+    return [e for e in telemetry.recent() if e["kind"] == kind]
+
+
+def test_stream_times_out_and_falls_back(llm, monkeypatch):
+    backend, telemetry = llm(profiles=_profiles(premium=1000))
+    monkeypatch.setitem(hedging.LLM_TIMEOUTS, "premium", 0.3)
+    monkeypatch.setattr(models, "LLM_FALLBACK", True)
+
+    start = time.perf_counter()
+    text = models.llm_stream("premium", "sys", "SUBTEMA: A")
+    elapsed = time.perf_counter() - start
+
+    assert "## A" in text
+    assert elapsed < 0.8
+    assert backend.attempts == ["premium", "standard"]
+    assert _kinds(telemetry, "llm_timeout")[0]["agent"] == "premium"
+    fallback = _kinds(telemetry, "tier_fallback")[0]
+    assert (fallback["agent"], fallback["to_tier"], fallback["reason"]) == ("premium", "standard", "TimeoutError")
+
+
+def test_abandoned_stream_frees_its_slot_without_growing_the_limit(llm, monkeypatch):
+    llm(profiles=_profiles(premium=300))
+    monkeypatch.setitem(hedging.LLM_TIMEOUTS, "premium", 0.05)
+    concurrency = models.RATE_LIMITERS["premium"].concurrency
+    concurrency.limit = 2.0
+
+    with pytest.raises(TimeoutError):
+        models.llm_stream("premium", "sys", "user")
+    assert concurrency.in_flight == 1  # el hilo abandonado sigue esperando al modelo
+
+    deadline = time.monotonic() + 2.0
+    while concurrency.in_flight and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert concurrency.in_flight == 0
+    assert concurrency.limit == 2.0
+
+
+def test_invoke_hedge_beats_a_slow_first_attempt(llm, monkeypatch):
+    backend, telemetry = llm(profiles=_profiles(), first_delay=1.0)
+    monkeypatch.setattr(models, "LLM_HEDGE", True)
+    monkeypatch.setattr(models, "hedge_delay", lambda tier: 0.05)
+
+    start = time.perf_counter()
+    text = models.llm_invoke("premium", "sys", "SUBTEMA: A")
+    elapsed = time.perf_counter() - start
+
+    assert "## A" in text
+    assert elapsed < 0.6
+    assert backend.attempts == ["premium", "premium"]
+    assert _kinds(telemetry, "hedge")[0]["agent"] == "premium"
+    assert _kinds(telemetry, "hedge_win")[0]["winner"] == "hedge"
+
+
+def test_hedge_delay_waits_for_enough_samples(llm, monkeypatch):
+    monkeypatch.setattr(hedging, "LLM_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(hedging, "LLM_HEDGE_MIN_DELAY_S", 0.0)
+    tracker = hedging.LATENCIES["cheap"]
+    for seconds in (0.1, 0.2):
+        tracker.add(seconds)
+    assert hedging.hedge_delay("cheap") is None
+    tracker.add(0.9)
+    assert hedging.hedge_delay("cheap") == 0.9
+
+
+def test_failures_open_the_circuit_and_later_calls_skip_the_tier(llm, monkeypatch):
+    backend, telemetry = llm(profiles=_profiles(), down=("premium",))
+    monkeypatch.setattr(models, "HEALTH", hedging.TierHealth(failures=2, cooldown_s=60))
+    monkeypatch.setattr(models, "LLM_FALLBACK", True)
+
+    for _ in range(3):
+        assert models.llm_invoke("premium", "sys", "user")
+
+    assert backend.attempts == ["premium", "standard", "premium", "standard", "standard"]
+    assert [e["agent"] for e in _kinds(telemetry, "circuit_open")] == ["premium"]
+    assert [e["reason"] for e in _kinds(telemetry, "tier_fallback")] == [
+        "_Unavailable", "_Unavailable", "circuit_open",
+    ]
+
+
+def test_non_degradable_errors_are_not_masked_by_fallback(llm, monkeypatch):
+    profiles = _profiles()
+    profiles["premium"].failure_rate = 1.0
+    backend, _ = llm(profiles=profiles)
+    monkeypatch.setattr(models, "LLM_FALLBACK", True)
+
+    with pytest.raises(FakeLLMError):
+        models.llm_invoke("premium", "sys", "user")
+    assert backend.attempts == ["premium"]
+
+
+def test_async_stream_times_out_and_falls_back(llm, monkeypatch):
+    backend, telemetry = llm(profiles=_profiles(premium=1000))
+    monkeypatch.setitem(hedging.LLM_TIMEOUTS, "premium", 0.3)
+    monkeypatch.setattr(models, "LLM_FALLBACK", True)
+
+    start = time.perf_counter()
+    text = asyncio.run(models.allm_stream("premium", "sys", "SUBTEMA: A"))
+    elapsed = time.perf_counter() - start
+
+    assert "## A" in text
+    assert elapsed < 0.8
+    assert backend.attempts == ["premium", "standard"]
+    assert _kinds(telemetry, "llm_timeout")[0]["agent"] == "premium"
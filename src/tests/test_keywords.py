@@ -0,0 +1,61 @@
+import json
+import random
+
+from agents.curator import ADVANCED_KEYWORDS, KEYWORD_MATCHER
+from shared.keywords import KeywordMatcher, load_terms, normalize
+
+
+def _naive(terms, text):
+    """Lo que hacía el curador antes: `kw in text` sobre texto normalizado."""
+    text = normalize(text)
+    return {term: weight for term, weight in terms if normalize(term).strip() in text}
+
+
+def test_overlapping_and_nested_terms_are_all_found():
+    matcher = KeywordMatcher([("he", 1), ("she", 1), ("his", 1), ("hers", 1)])
+    assert matcher.scan("ushers") == {"he": 1.0, "she": 1.0, "hers": 1.0}
+
+
+def test_matches_ignore_case_and_accents_and_count_once():
+    matcher = KeywordMatcher([("teoría", 1), ("cuántic", 2)])
+    text = "TEORIA de campos cuánticos y otra teoría cuántica"
+    assert matcher.scan(text) == {"teoría": 1.0, "cuántic": 2.0}
+    assert matcher.score(text) == 3.0
+    assert matcher.score("historia del cine") == 0.0
+
+
+def test_empty_terms_are_skipped():
+    matcher = KeywordMatcher([("", 1), ("  ", 1), ("bayes", 1)])
+    assert matcher.terms == ["bayes"]
+    assert matcher.score("") == 0.0
+
+
+def test_agrees_with_substring_search_on_random_text():
+    rng = random.Random(0)
+    terms = [(kw, 1.0) for kw in ADVANCED_KEYWORDS] + [("ab", 1.0), ("bab", 2.0), ("abab", 0.5)]
+    matcher = KeywordMatcher(terms)
+    alphabet = "ab " + "".join(sorted(set("".join(ADVANCED_KEYWORDS))))
+    for _ in range(300):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        if rng.random() < 0.5:
+            text += " " + rng.choice(ADVANCED_KEYWORDS).upper()
+        assert matcher.scan(text) == _naive(terms, text), text
+
+
+def test_curator_vocabulary():
+    assert KEYWORD_MATCHER.score("Inferencia causal con modelos bayesianos") == 3.0  # bayes + bayesiano + inferencia causal
+    assert KEYWORD_MATCHER.score("Historia del cine argentino") == 0.0
+
+
+def test_load_terms_formats(tmp_path):
+    weighted = tmp_path / "terms.json"
+    weighted.write_text(json.dumps({"topología": 2, "bayes": 0.5}), encoding="utf-8")
+    assert load_terms(str(weighted)) == [("topología", 2.0), ("bayes", 0.5)]
+
+    plain = tmp_path / "terms.txt"
+    plain.write_text("# comentario\ntopología\t2\n\nbayes\n", encoding="utf-8")
+    assert load_terms(str(plain)) == [("topología", 2.0), ("bayes", 1.0)]
+
+    listed = tmp_path / "list.json"
+    listed.write_text(json.dumps(["a", "b"]), encoding="utf-8")
+    assert load_terms(str(listed)) == [("a", 1.0), ("b", 1.0)]
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import pytest
+
+from bench.fake_llm import FakeBackend, FakeLLMError, FakeRateLimitError, TierProfile
+from config.rate_limit import AdaptiveConcurrency, TierLimiter
+
+
+def test_async_waiter_is_woken_by_release_from_another_thread():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    concurrency.acquire()
+
+    async def main():
+        waiter = asyncio.ensure_future(concurrency.aacquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        threading.Timer(0.05, concurrency.release).start()
+        await asyncio.wait_for(waiter, 1.0)
+
+    asyncio.run(main())
+    assert concurrency.in_flight == 1
+    assert not concurrency._waiters
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    concurrency.acquire()
+
+    async def main():
+        waiter = asyncio.ensure_future(concurrency.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        concurrency.release()
+        await asyncio.wait_for(concurrency.aacquire(), 1.0)
+
+    asyncio.run(main())
+    assert concurrency.in_flight == 1
+
+
+def _limiter(sleeps, max_concurrency=4, max_retries=2):
+    return TierLimiter(rpm=600, tpm=1_000_000, max_concurrency=max_concurrency,
+                       max_retries=max_retries, sleep=sleeps.append)
+
+
+def _quota_backend(**profile):
+    backend = FakeBackend(profiles={"cheap": TierProfile(latency_ms=0, sigma=0, tokens_per_s=0, **profile)})
+    messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "u"}]
+    return backend, lambda: backend.respond("cheap", messages)
+
+
+def test_429s_halve_concurrency_retry_and_drain_the_bucket():
+    sleeps = []
+    limiter = _limiter(sleeps)
+    backend, call = _quota_backend(rpm_quota=2)
+    limiter.run(call)
+    limiter.run(call)
+    limit_before = limiter.concurrency.limit
+
+    # El cupo del fake está agotado: cada intento vuelve con 429.
+    with pytest.raises(FakeRateLimitError):
+        limiter.run(call)
+
+    assert limit_before == 4
+    assert limiter.concurrency.limit == 1  # 4 -> 2 -> 1 (mínimo)
+    assert limiter.stats == {"calls": 5, "throttled": 3, "retries": 2}
+    assert len(sleeps) == 2 and backend.throttled["cheap"] == 3
+    assert limiter.requests.available < 1
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_other_errors_release_without_growing_the_limit():
+    limiter = _limiter([])
+    limiter.concurrency.limit = 2.0
+    _, call = _quota_backend(failure_rate=1.0)
+    with pytest.raises(FakeLLMError):
+        limiter.run(call)
+    assert limiter.concurrency.limit == 2.0
+    assert limiter.concurrency.in_flight == 0
+    assert limiter.stats["retries"] == 0
+
+
+def test_interrupted_call_frees_its_slot():
+    limiter = _limiter([], max_concurrency=1)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        limiter.run(interrupted)
+    assert limiter.concurrency.in_flight == 0
+    assert limiter.concurrency.try_acquire()
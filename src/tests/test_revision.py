@@ -0,0 +1,57 @@
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command
+
+from agents.reporter import section_key, split_sections
+from graph.research_graph import build_graph
+from utils.console_runner import run_streaming
+
+
+def _run_first_report(graph, config):
+    state = graph.invoke({"topic": "Energía solar"}, config=config)
+    assert "__interrupt__" in state
+    state = graph.invoke(Command(resume=""), config=config)
+    assert state["final_report"]
+    return state
+
+
+def test_first_modify_reuses_single_pass_sections(fake_backend):
+    graph = build_graph(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "revision-single-pass"}}
+    state = _run_first_report(graph, config)
+    # El informe de pase único guarda una sección por subtema.
+    assert len(state["written_sections"]) == len(state["curated_sections"]) == 6
+
+    before = sum(fake_backend.calls.values())
+    state = graph.invoke({"edit_command": 'modify 2 to "Almacenamiento en baterías"'}, config=config)
+    calls = sum(fake_backend.calls.values()) - before
+
+    # 1 curación (el subtema modificado) + 1 sección + 1 marco del informe.
+    assert calls == 3
+    assert "## Almacenamiento en baterías" in state["final_report"]
+    assert "## Subtema 1" in state["final_report"]
+
+
+def test_split_sections_matches_headings_by_title():
+    sections = [
+        {"subtopic_title": "Teoría de juegos", "key_points": "", "synthesis": "", "recommended_sources": []},
+        {"subtopic_title": "Casos", "key_points": "", "synthesis": "", "recommended_sources": []},
+    ]
+    report = (
+        "# Informe\n\n## Resumen ejecutivo\n\nResumen.\n\n"
+        "## Casos\n\nTexto de casos.\n\n### Detalle\n\nMás.\n\n"
+        "## Teoria de juegos:\n\nTexto de juegos.\n\n## Conclusión\n\nFin."
+    )
+    written = split_sections("Tema", sections, report)
+    assert written[section_key("Tema", sections[0])] == "## Teoria de juegos:\n\nTexto de juegos."
+    assert written[section_key("Tema", sections[1])].endswith("### Detalle\n\nMás.")
+
+
+def test_console_streams_map_reduce_report(fake_backend, monkeypatch):
+    monkeypatch.setattr("agents.reporter.REPORTER_MODE", "map_reduce")
+    graph = build_graph(checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": "revision-console-stream"}}
+    run_streaming(graph, {"topic": "Energía solar"}, config)
+    tokens = []
+    state = run_streaming(graph, Command(resume=""), config, on_token=tokens.append)
+    assert len(tokens) > 2
+    assert "".join(tokens) == state["final_report"]
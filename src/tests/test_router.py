@@ -0,0 +1,49 @@
+from agents.curator import fit_tier_to_prompt_tokens
+from shared.router import TierRouter, TierStats
+from shared.tokens import token_budget
+
+
+def _routes(tier, difficulty, count, json_failed=0):
+    """Subtemas grabados con tier; los primeros json_failed no dieron JSON parseable."""
+    events = []
+    for i in range(count):
+        route = {"kind": "route", "topic": "t", "subtopic": f"{tier}-{difficulty}-{i}", "tier": tier,
+                 "difficulty": difficulty}
+        events.append(route)
+        if i < json_failed:
+            events.append({"kind": "json_fallback", "topic": "t", "subtopic": route["subtopic"], "tier": tier})
+    return events
+
+
+def test_priors_only_pick_the_cheapest_tier_that_meets_the_target():
+    router = TierRouter(TierStats(), quality_target=0.95)
+    assert router.route(0.1) == "cheap"
+    assert router.route(0.5) == "standard"
+    assert router.route(0.9) == "premium"
+
+
+def test_prompt_that_does_not_fit_moves_up_a_tier():
+    router = TierRouter(TierStats(), quality_target=0.95)
+    too_big = token_budget("cheap") + 1
+    assert router.route(0.1, prompt_tokens=too_big) == "standard"
+    # La heurística estática (curador, route_eval) sube igual.
+    assert fit_tier_to_prompt_tokens("cheap", too_big) == "standard"
+    assert fit_tier_to_prompt_tokens("cheap", token_budget("premium") + 1) == "premium"
+
+
+def test_recorded_json_failures_override_the_prior():
+    # A priori cheap alcanza para dificultad baja; lo grabado dice que no.
+    router = TierRouter(TierStats(_routes("cheap", 0.1, 30, json_failed=30)), quality_target=0.95)
+    assert router.route(0.1) == "standard"
+
+
+def test_recorded_successes_let_a_cheaper_tier_take_over():
+    # A priori cheap no llega en dificultad media (0.90); 100 aciertos lo habilitan.
+    router = TierRouter(TierStats(_routes("cheap", 0.5, 100)), quality_target=0.95)
+    assert router.route(0.5) == "cheap"
+
+
+def test_latency_target_skips_a_slow_tier():
+    slow = [{"kind": "llm_call", "tier": "cheap", "ms": 5000.0} for _ in range(10)]
+    router = TierRouter(TierStats(slow), quality_target=0.95, latency_target_ms=1000)
+    assert router.route(0.1) == "standard"
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from graph.research_graph import build_graph
+from utils.http_server import ResearchServer
+
+
+async def _request(port: int, method: str, path: str, body: dict = None, raw_head: bytes = None):
+    """Un pedido HTTP/1.1 con Connection: close; devuelve (status, texto del body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body or {}).encode("utf-8")
+    head = raw_head or (
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+    ).encode("latin-1")
+    writer.write(head + (b"" if raw_head else payload))
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, text = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), text.decode("utf-8")
+
+
+def _sse_events(text: str):
+    events = []
+    for block in text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def _with_server(fn):
+    app = ResearchServer(build_graph(checkpointer=MemorySaver(), async_nodes=True))
+    server = await asyncio.start_server(app.handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await fn(app, port)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_start_interrupt_resume_streams_tokens(fake_backend):
+    async def scenario(app, port):
+        status, text = await _request(port, "POST", "/threads", {"topic": "Energía solar"})
+        assert status == 200
+        started = json.loads(text)
+        assert started["status"] == "awaiting_approval"
+        assert started["interrupt"]["subtopics"]
+
+        thread_id = started["thread_id"]
+        status, text = await _request(port, "POST", f"/threads/{thread_id}/resume",
+                                      {"command": "approve 1,2", "stream": True})
+        assert status == 200
+        events = _sse_events(text)
+        assert events[0] == ("thread", {"thread_id": thread_id})
+        tokens = [data["text"] for kind, data in events if kind == "token"]
+        kind, result = events[-1]
+        assert kind == "result" and result["status"] == "done"
+        assert len(tokens) > 1
+        assert "".join(tokens).strip() == result["final_report"]
+        assert app.health()["active"] == 0
+
+    asyncio.run(_with_server(scenario))
+
+
+def test_malformed_headers_get_400(fake_backend):
+    async def scenario(app, port):
+        bad_length = b"POST /threads HTTP/1.1\r\nContent-Length: abc\r\n\r\n"
+        status, _ = await _request(port, "POST", "/threads", raw_head=bad_length)
+        assert status == 400
+        long_line = b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * (2 ** 17) + b"\r\n\r\n"
+        status, _ = await _request(port, "GET", "/health", raw_head=long_line)
+        assert status == 400
+
+    asyncio.run(_with_server(scenario))
+
+
+def test_map_reduce_report_streams_sections_in_order(fake_backend, monkeypatch):
+    monkeypatch.setattr("agents.reporter.REPORTER_MODE", "map_reduce")
+
+    async def scenario(app, port):
+        status, text = await _request(port, "POST", "/threads", {"topic": "Energía solar"})
+        thread_id = json.loads(text)["thread_id"]
+        status, text = await _request(port, "POST", f"/threads/{thread_id}/resume",
+                                      {"command": "", "stream": True})
+        assert status == 200
+        events = _sse_events(text)
+        tokens = [data["text"] for kind, data in events if kind == "token"]
+        kind, result = events[-1]
+        assert kind == "result" and result["status"] == "done"
+        # Marco, una entrega por sección y cierre, en el orden del informe final.
+        assert len(tokens) > 2
+        assert "".join(tokens) == result["final_report"]
+
+    asyncio.run(_with_server(scenario))
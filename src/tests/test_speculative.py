@@ -0,0 +1,30 @@
+from agents.speculative import SpeculativeCurator
+
+SUB = {"id": 1, "title": "Subtema 1", "rationale": "r"}
+
+
+def _curate(topic, sub, tier):
+    return {"subtopic_title": sub["title"], "key_points": tier, "synthesis": "", "recommended_sources": []}
+
+
+def test_jobs_are_scoped_by_thread():
+    spec = SpeculativeCurator(max_workers=1)
+    spec.start("a", "Tema", [SUB], "premium", _curate)
+    spec.start("b", "Tema", [SUB], "premium", _curate)
+    # El cierre de la sesión "a" no cancela ni consume lo de "b".
+    spec.discard("a", "Tema")
+    assert spec.take("a", "Tema", SUB, "premium") is None
+    assert spec.take("b", "Tema", SUB, "premium")["subtopic_title"] == "Subtema 1"
+    spec.shutdown()
+
+
+def test_abandoned_jobs_expire():
+    now = [0.0]
+    spec = SpeculativeCurator(max_workers=1, ttl_s=60, clock=lambda: now[0])
+    spec.start("abandonada", "Tema", [SUB], "cheap", _curate)
+    assert len(spec) == 1
+    now[0] = 61.0
+    spec.start("nueva", "Otro tema", [SUB], "cheap", _curate)
+    assert len(spec) == 1
+    assert spec.take("abandonada", "Tema", SUB, "cheap") is None
+    spec.shutdown()
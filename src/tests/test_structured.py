@@ -0,0 +1,40 @@
+from config import models
+from shared.structured import extract_json
+
+
+def test_list_of_objects_wins_over_earlier_string_list():
+    raw = 'Palabras clave: ["solar", "eólica"]\n\n[{"title": "Costos", "rationale": "r", "tags": ["a"]}]'
+    value, recovered = extract_json(raw, list)
+    assert recovered
+    assert value == [{"title": "Costos", "rationale": "r", "tags": ["a"]}]
+
+
+def test_wrapped_list_of_objects_wins_over_nested_string_list():
+    raw = 'Respuesta: {"keywords": ["x"], "subtopics": [{"title": "Costos"}]}'
+    assert extract_json(raw, list) == ([{"title": "Costos"}], True)
+
+
+def test_falls_back_to_first_list():
+    assert extract_json('Lista: ["a", "b"] y nada más', list) == (["a", "b"], True)
+
+
+class _Rejected(Exception):
+    status_code = 400
+
+    def __str__(self):
+        return "Invalid parameter: 'response_format' is not supported"
+
+
+def test_json_mode_opt_out_is_per_deployment(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_CHEAP_DEPLOYMENT", "gpt-mini")
+    monkeypatch.setenv("AZURE_OPENAI_PREMIUM_DEPLOYMENT", "gpt-large")
+    monkeypatch.setattr(models, "_JSON_MODE_UNSUPPORTED", set())
+
+    class Model:
+        def bind(self, **kwargs):
+            return kwargs
+
+    assert models._json_rejected("cheap", _Rejected())
+    # Otro cliente del mismo deployment tampoco lo intenta; otro deployment sí.
+    assert models._json_bound("cheap", Model()) is None
+    assert models._json_bound("premium", Model()) == {"response_format": models.JSON_RESPONSE_FORMAT}
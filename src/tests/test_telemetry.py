@@ -0,0 +1,17 @@
+from shared.telemetry import Telemetry
+
+
+def test_events_are_bounded_but_totals_are_not():
+    telemetry = Telemetry(enabled=True, jsonl_path="", max_events=3)
+    for _ in range(10):
+        telemetry.record("llm_call", tier="cheap", ms=2.0, prompt_tokens=5)
+    telemetry.record("tier_fallback", agent="cheap")
+
+    assert len(telemetry.recent()) == 3
+    agg = telemetry.aggregate()
+    assert agg["llm"]["cheap"]["calls"] == 10
+    assert agg["llm"]["cheap"]["prompt_tokens"] == 50
+    assert agg["counters"]["tier_fallback:cheap"] == 1
+
+    telemetry.reset()
+    assert telemetry.recent() == [] and telemetry.aggregate()["llm"] == {}
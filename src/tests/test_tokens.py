@@ -0,0 +1,46 @@
+from shared import tokens
+from shared.tokens import TRUNCATION_MARKER, estimate_tokens, fit_prompt, truncate_to_tokens
+
+SYSTEM = "Eres el Agente Curador. Responde solo con JSON."
+LONG_USER = (
+    "Tema principal: \"Historia del cine\"\n"
+    + "Contexto de la sección, con bastante detalle y algo de puntuación; " * 200
+    + "\nGenera SOLO el JSON indicado."
+)
+
+
+def test_prompt_within_budget_is_left_alone(monkeypatch):
+    monkeypatch.setitem(tokens.TOKEN_BUDGETS, "cheap", 10_000)
+    user, estimate, truncated = fit_prompt("cheap", SYSTEM, "Tema: cine")
+    assert user == "Tema: cine" and not truncated
+    assert estimate == estimate_tokens(SYSTEM) + estimate_tokens("Tema: cine") + 8
+
+
+def test_long_prompt_is_cut_to_the_tier_budget(monkeypatch):
+    monkeypatch.setitem(tokens.TOKEN_BUDGETS, "cheap", 300)
+    user, estimate, truncated = fit_prompt("cheap", SYSTEM, LONG_USER)
+
+    assert truncated
+    assert estimate <= 300
+    assert estimate == estimate_tokens(SYSTEM) + estimate_tokens(user) + 8
+    # Se conservan el comienzo (tema) y el final (pedido de salida).
+    assert user.startswith("Tema principal: \"Historia del cine\"")
+    assert user.endswith("Genera SOLO el JSON indicado.")
+    assert TRUNCATION_MARKER in user
+
+
+def test_budget_depends_on_the_tier(monkeypatch):
+    monkeypatch.setitem(tokens.TOKEN_BUDGETS, "cheap", 300)
+    monkeypatch.setitem(tokens.TOKEN_BUDGETS, "premium", 100_000)
+    assert fit_prompt("cheap", SYSTEM, LONG_USER)[2]
+    user, _, truncated = fit_prompt("premium", SYSTEM, LONG_USER)
+    assert user == LONG_USER and not truncated
+
+
+def test_truncation_is_deterministic_and_bounded():
+    for budget in (5, 50, 400, 2000):
+        once = truncate_to_tokens(LONG_USER, budget)
+        assert once == truncate_to_tokens(LONG_USER, budget)
+        assert estimate_tokens(once) <= budget
+    assert truncate_to_tokens(LONG_USER, 0) == ""
+    assert truncate_to_tokens("corto", 100) == "corto"
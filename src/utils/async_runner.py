@@ -0,0 +1,89 @@
+import asyncio
+import os
+import uuid
+from typing import Callable, List, Optional
+
+from graph.factory import GRAPHS
+from config.models import aclose_clients
+from shared.telemetry import TELEMETRY
+from utils.console_runner import report_token
+
+# Sesiones de investigación en vuelo a la vez dentro del mismo event loop.
+ASYNC_MAX_SESSIONS = int(os.getenv("ASYNC_MAX_SESSIONS", "256"))
+
+
+async def astream_events(graph, graph_input, config):
+    """
+    Recorre graph.astream y produce eventos de alto nivel:
+    ("token", texto) con el informe a medida que se escribe y, al final, un único
+    ("state", estado) con "__interrupt__" si el grafo quedó pausado.
+    Quien consume marca el ritmo: el grafo no avanza mientras no se pide el siguiente.
+    """
+    state: dict = {}
+    interrupts = []
+
+    async for mode, chunk in graph.astream(
+        graph_input, config=config, stream_mode=["messages", "custom", "updates", "values"]
+    ):
+        if mode in ("messages", "custom"):
+            text = report_token(mode, chunk)
+            if text:
+                yield "token", text
+        elif mode == "updates":
+            if "__interrupt__" in chunk:
+                interrupts.extend(chunk["__interrupt__"])
+        elif mode == "values":
+            state = dict(chunk)
+
+    if interrupts:
+        state["__interrupt__"] = interrupts
+    yield "state", state
+
+
+async def arun_streaming(graph, graph_input, config, on_token: Optional[Callable[[str], None]] = None) -> dict:
+    """Versión async de run_streaming (usa graph.astream)."""
+    state: dict = {}
+    async for kind, value in astream_events(graph, graph_input, config):
+        if kind == "token":
+            if on_token:
+                on_token(value)
+        else:
+            state = value
+    return state
+
+
+async def arun_session(graph, topic: str, commands: List[str], thread_id: Optional[str] = None) -> str:
+    """
+    Corre un tema completo sin interacción: cada pausa de aprobación se
+    resuelve con el siguiente comando de la lista (o "" para aprobar todo).
+    """
+    config = {"configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+    pending = list(commands)
+
+    state = await graph.ainvoke({"topic": topic}, config=config)
+    while "__interrupt__" in state:
+        from langgraph.types import Command
+
+        cmd = pending.pop(0) if pending else ""
+        state = await graph.ainvoke(Command(resume=cmd), config=config)
+    return state["final_report"]
+
+
+async def arun_sessions(jobs: List[dict], max_sessions: int = ASYNC_MAX_SESSIONS, graph=None) -> List:
+    """
+    Corre muchas sesiones en un solo event loop. jobs: [{"topic": ..., "commands": [...]}].
+    Devuelve, en el mismo orden, el informe de cada sesión o la excepción que la cortó.
+    """
+    graph = graph or GRAPHS.get(async_nodes=True)
+    semaphore = asyncio.Semaphore(max(1, max_sessions))
+
+    async def one(job: dict):
+        async with semaphore:
+            return await arun_session(graph, job["topic"], job.get("commands", []), job.get("thread_id"))
+
+    try:
+        return await asyncio.gather(*(one(job) for job in jobs), return_exceptions=True)
+    finally:
+        await aclose_clients()
+        if TELEMETRY.enabled:
+            TELEMETRY.write_prometheus()
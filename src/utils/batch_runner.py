@@ -0,0 +1,138 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
+
+from graph.factory import GRAPHS
+from config.models import close_clients, start_cassette_from_env
+from shared.telemetry import TELEMETRY
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+def load_jobs(path: str) -> List[dict]:
+    """
+    Lee el archivo JSONL de entrada. Cada línea:
+        {"id": "opcional", "topic": "...", "commands": ["approve 1,3", ...]}
+    También se acepta "command" con un único string. Si no hay comandos,
+    se aprueba todo (comando vacío). Sin "id", se deriva del tema y del número
+    de línea: estable al relanzar y distinto para temas repetidos.
+    """
+    jobs = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            topic = str(item.get("topic", "")).strip()
+            if not topic:
+                raise ValueError(f"Batch: línea {lineno} sin 'topic'.")
+            commands = item.get("commands")
+            if commands is None:
+                commands = [item["command"]] if "command" in item else []
+            job_id = str(item.get("id") or f"{hashlib.sha1(topic.encode('utf-8')).hexdigest()[:12]}-{lineno}")
+            if job_id in seen:
+                raise ValueError(f"Batch: línea {lineno} repite el id {job_id!r}.")
+            seen.add(job_id)
+            jobs.append({"id": job_id, "topic": topic, "commands": list(commands)})
+    return jobs
+
+
+def run_job(graph, job: dict) -> str:
+    """Ejecuta un tema completo aplicando los comandos pre-escritos en orden."""
+    from langgraph.types import Command
+
+    config = {"configurable": {"thread_id": f"batch-{job['id']}-{uuid.uuid4()}"}}
+    pending = list(job["commands"])
+
+    state = graph.invoke({"topic": job["topic"]}, config=config)
+    while "__interrupt__" in state:
+        cmd = pending.pop(0) if pending else ""
+        state = graph.invoke(Command(resume=cmd), config=config)
+    return state["final_report"]
+
+
+def _write_atomic(path: str, content: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def run_batch(input_path: str, output_dir: str, max_concurrency: int = BATCH_MAX_CONCURRENCY) -> dict:
+    """
+    Procesa todos los temas del archivo con hasta max_concurrency grafos en paralelo.
+
+    Cada informe se escribe en output_dir/<id>.md apenas termina (escritura
+    atómica), y se registra en output_dir/manifest.jsonl. Al relanzar después de
+    una caída, los temas con informe ya escrito se saltean.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, "manifest.jsonl")
+    manifest_lock = threading.Lock()
+
+    jobs = load_jobs(input_path)
+    pending = [
+        job for job in jobs
+        if not os.path.exists(os.path.join(output_dir, f"{job['id']}.md"))
+    ]
+    summary = {"total": len(jobs), "skipped": len(jobs) - len(pending), "done": 0, "failed": 0}
+
+    graph = GRAPHS.get()
+
+    def record(entry: dict):
+        with manifest_lock:
+            with open(manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def work(job: dict):
+        start = time.perf_counter()
+        report = run_job(graph, job)
+        _write_atomic(os.path.join(output_dir, f"{job['id']}.md"), report)
+        return time.perf_counter() - start
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {pool.submit(work, job): job for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    elapsed = future.result()
+                except Exception as exc:
+                    summary["failed"] += 1
+                    record({"id": job["id"], "topic": job["topic"], "status": "error", "error": repr(exc)})
+                    print(f"[batch] {job['id']} falló: {exc!r}")
+                    continue
+                summary["done"] += 1
+                record({"id": job["id"], "topic": job["topic"], "status": "done", "seconds": round(elapsed, 2)})
+                print(f"[batch] {job['id']} listo ({elapsed:.1f}s)")
+    finally:
+        close_clients()
+
+    if TELEMETRY.enabled:
+        print(TELEMETRY.summary_table())
+        TELEMETRY.write_prometheus()
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Investiga muchos temas en modo batch (sin interacción).")
+    parser.add_argument("input", help="Archivo JSONL con temas y comandos de aprobación.")
+    parser.add_argument("output_dir", help="Directorio donde se escriben los informes.")
+    parser.add_argument("--max-concurrency", type=int, default=BATCH_MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    start_cassette_from_env()
+    summary = run_batch(args.input, args.output_dir, args.max_concurrency)
+    print(
+        f"[batch] total={summary['total']} hechos={summary['done']} "
+        f"salteados={summary['skipped']} fallidos={summary['failed']}"
+    )
@@ -1,22 +1,112 @@
+import sys
 import uuid
-from langgraph.types import Command
-from graph.research_graph import build_graph
+from graph.factory import GRAPHS
+from config.models import close_clients, start_cassette_from_env
+from shared.state import REPORT_TOKEN
+from shared.telemetry import TELEMETRY
+
+# Nodos cuyos tokens se muestran en vivo por consola.
+STREAMED_NODES = ("reporter",)
+
+
+def report_token(mode: str, chunk) -> str:
+    """Texto a mostrar de un evento del stream (vacío si no corresponde)."""
+    if mode == "messages":
+        message, metadata = chunk
+        if metadata.get("langgraph_node") in STREAMED_NODES:
+            return getattr(message, "content", "") or ""
+    elif mode == "custom" and isinstance(chunk, dict):
+        return chunk.get(REPORT_TOKEN) or ""
+    return ""
+
+
+def run_streaming(graph, graph_input, config, on_token=None) -> dict:
+    """
+    Ejecuta el grafo hasta terminar o pausar, igual que graph.invoke, pero
+    usando graph.stream para reenviar los tokens del reporter a on_token.
+
+    Devuelve el último estado; si el grafo quedó pausado, incluye
+    "__interrupt__" como lo haría graph.invoke.
+    """
+    state: dict = {}
+    interrupts = []
+
+    for mode, chunk in graph.stream(
+        graph_input, config=config, stream_mode=["messages", "custom", "updates", "values"]
+    ):
+        if mode in ("messages", "custom"):
+            text = report_token(mode, chunk)
+            if on_token and text:
+                on_token(text)
+        elif mode == "updates":
+            if "__interrupt__" in chunk:
+                interrupts.extend(chunk["__interrupt__"])
+        elif mode == "values":
+            state = dict(chunk)
+
+    if interrupts:
+        state["__interrupt__"] = interrupts
+    return state
+
 
 def run_console():
-    graph = build_graph()
+    start_cassette_from_env()
+    # langgraph, langchain y los agentes se cargan mientras el usuario escribe el tema.
+    GRAPHS.prewarm()
     topic = input("Ingresá el tema: ").strip()
+    graph = GRAPHS.get()
+    from langgraph.types import Command
+
     thread_id = str(uuid.uuid4())
     config = {"configurable": {"thread_id": thread_id}}
 
-    state = graph.invoke({"topic": topic}, config=config)
-    while "__interrupt__" in state:
-        payload = state["__interrupt__"][0].value
-        print("\n--- Subtemas ---")
-        for s in payload["subtopics"]:
-            print(f"{s['id']}. {s['title']} — {s['rationale']}")
-        print(payload["message"])
-        cmd = input("\nComandos: ").strip()
-        state = graph.invoke(Command(resume=cmd), config=config)
-
-    print("\n\n=== INFORME FINAL ===\n")
-    print(state["final_report"])
+    streamed = []
+
+    def print_token(text: str):
+        if not streamed:
+            print("\n\n=== INFORME FINAL ===\n")
+        streamed.append(text)
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def show_report(state: dict):
+        if streamed:
+            # El informe ya se mostró mientras se generaba.
+            print()
+        else:
+            # Sin streaming (p. ej. respuesta servida desde la cache)
+            print("\n\n=== INFORME FINAL ===\n")
+            print(state["final_report"])
+        streamed.clear()
+
+    try:
+        state = run_streaming(graph, {"topic": topic}, config)
+        while "__interrupt__" in state:
+            payload = state["__interrupt__"][0].value
+            print("\n--- Subtemas ---")
+            for s in payload["subtopics"]:
+                print(f"{s['id']}. {s['title']} — {s['rationale']}")
+            print(payload["message"])
+            cmd = input("\nComandos: ").strip()
+            state = run_streaming(graph, Command(resume=cmd), config, on_token=print_token)
+        show_report(state)
+
+        # Ediciones sobre el informe terminado: solo se recalcula lo que cambió.
+        while True:
+            print("\n--- Plan actual ---")
+            for s in state.get("approved_subtopics", []):
+                print(f"{s['id']}. {s['title']}")
+            for hint in state.get("duplicate_hints", []):
+                a, b = hint["ids"]
+                print(f"Posible duplicado: {a} y {b} (similitud {hint['similarity']})")
+            cmd = input("\nEditar (mismos comandos; Enter para terminar): ").strip()
+            if not cmd:
+                break
+            state = run_streaming(graph, {"edit_command": cmd}, config, on_token=print_token)
+            show_report(state)
+    finally:
+        close_clients()
+
+    if TELEMETRY.enabled:
+        print(TELEMETRY.summary_table())
+        TELEMETRY.write_prometheus()
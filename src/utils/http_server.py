@@ -0,0 +1,362 @@
+"""
+Servidor HTTP/SSE liviano (solo stdlib asyncio) para usar el asistente en equipo.
+
+Endpoints (JSON salvo indicación):
+    GET  /health                     -> estado del servidor y carga actual
+    POST /threads                    {"topic": "...", "thread_id": opcional}
+    GET  /threads/<id>               -> estado del thread (pausado / terminado)
+    POST /threads/<id>/resume        {"command": "approve 1,3"}
+    POST /threads/<id>/edit          {"command": "reject 2"} (thread terminado)
+
+Con "stream": true en el body, o "Accept: text/event-stream", la respuesta es
+SSE: eventos "token" con el informe mientras se genera y un evento "result"
+final con la misma forma que la respuesta JSON.
+"""
+import asyncio
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from graph.factory import GRAPHS
+from utils.async_runner import astream_events
+
+# Grafos ejecutándose a la vez; los demás pedidos esperan en cola.
+SERVER_MAX_ACTIVE = int(os.getenv("SERVER_MAX_ACTIVE", "64"))
+# Pedidos esperando un lugar; por encima se responde 503 con Retry-After.
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "256"))
+# Conexiones abiertas (keep-alive incluidas); por encima se responde 503 y se cierra.
+SERVER_MAX_CONNECTIONS = int(os.getenv("SERVER_MAX_CONNECTIONS", "512"))
+# Hilos para el trabajo sync (nodos sync, checkpointer, curación especulativa).
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))
+SERVER_MAX_BODY = int(os.getenv("SERVER_MAX_BODY", "65536"))
+SERVER_KEEPALIVE_S = float(os.getenv("SERVER_KEEPALIVE_S", "15"))
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HttpError(400, "El body no es JSON válido.")
+        if not isinstance(data, dict):
+            raise HttpError(400, "El body debe ser un objeto JSON.")
+        return data
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    def wants_stream(self, data: dict) -> bool:
+        return bool(data.get("stream")) or "text/event-stream" in self.headers.get("accept", "")
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # readline() convierte LimitOverrunError en ValueError: línea más larga que el límite.
+        raise HttpError(400, "Línea de pedido o header demasiado larga.")
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    line = await _readline(reader)
+    if not line:
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Línea de pedido inválida.")
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await _readline(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(400, "Content-Length inválido.")
+    if length < 0:
+        raise HttpError(400, "Content-Length inválido.")
+    if length > SERVER_MAX_BODY:
+        raise HttpError(413, f"Body de más de {SERVER_MAX_BODY} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target.split("?", 1)[0], headers, body)
+
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload: dict,
+                    keep_alive: bool = True, extra: Optional[Dict[str, str]] = None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+    }
+    headers.update(extra or {})
+    writer.write(_head(status, headers) + body)
+    await writer.drain()
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def session_result(thread_id: str, state: dict) -> dict:
+    """Forma común de respuesta: pausado con el payload de aprobación, o terminado."""
+    if "__interrupt__" in state:
+        return {
+            "thread_id": thread_id,
+            "status": "awaiting_approval",
+            "interrupt": state["__interrupt__"][0].value,
+        }
+    return {
+        "thread_id": thread_id,
+        "status": "done",
+        "approved_subtopics": state.get("approved_subtopics", []),
+        "duplicate_hints": state.get("duplicate_hints", []),
+        "final_report": state.get("final_report", ""),
+    }
+
+
+class ResearchServer:
+    """
+    Sesiones de investigación sobre un único grafo async compartido.
+
+    Backpressure en tres niveles: conexiones abiertas, pedidos en cola y grafos
+    activos. En SSE cada token se escribe con drain(), así que un cliente
+    lento frena su propio grafo sin acumular el informe en memoria.
+    """
+
+    def __init__(self, graph=None):
+        self.graph = graph or GRAPHS.get(async_nodes=True)
+        self._active = asyncio.Semaphore(max(1, SERVER_MAX_ACTIVE))
+        self._running = 0
+        self._waiting = 0
+        self._connections = 0
+        # Un solo pedido a la vez por thread_id (resume/edit concurrentes chocan).
+        self._busy: set = set()
+
+    # --- ciclo de vida de conexiones ---------------------------------------
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections += 1
+        try:
+            if self._connections > SERVER_MAX_CONNECTIONS:
+                await send_json(writer, 503, {"error": "Demasiadas conexiones."},
+                                keep_alive=False, extra={"Retry-After": "1"})
+                return
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), SERVER_KEEPALIVE_S)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HttpError as exc:
+                    await send_json(writer, exc.status, {"error": exc.message}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                keep_alive = await self.dispatch(request, writer)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Atiende un pedido; devuelve si la conexión puede reutilizarse."""
+        try:
+            return await self.route(request, writer)
+        except HttpError as exc:
+            await send_json(writer, exc.status, {"error": exc.message}, request.keep_alive, exc.headers)
+            return request.keep_alive
+        except ValueError as exc:
+            # Errores de validación de los nodos (p. ej. comando sin subtemas aprobados).
+            await send_json(writer, 422, {"error": str(exc)}, request.keep_alive)
+            return request.keep_alive
+        except ConnectionError:
+            return False
+        except Exception as exc:
+            await send_json(writer, 500, {"error": repr(exc)}, request.keep_alive)
+            return request.keep_alive
+
+    async def route(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        parts = [p for p in request.path.split("/") if p]
+
+        if parts == ["health"]:
+            self._require(request, "GET")
+            await send_json(writer, 200, self.health(), request.keep_alive)
+            return request.keep_alive
+
+        if parts == ["threads"]:
+            self._require(request, "POST")
+            data = request.json()
+            topic = str(data.get("topic", "")).strip()
+            if not topic:
+                raise HttpError(400, "Falta 'topic'.")
+            thread_id = str(data.get("thread_id") or uuid.uuid4())
+            return await self.run(request, writer, thread_id, {"topic": topic}, data)
+
+        if len(parts) == 2 and parts[0] == "threads":
+            self._require(request, "GET")
+            await send_json(writer, 200, await self.thread_state(parts[1]), request.keep_alive)
+            return request.keep_alive
+
+        if len(parts) == 3 and parts[0] == "threads" and parts[2] in ("resume", "edit"):
+            self._require(request, "POST")
+            data = request.json()
+            command = str(data.get("command", "")).strip()
+            thread_id = parts[1]
+            snapshot = await self.graph.aget_state(self._config(thread_id))
+            if not snapshot.values:
+                raise HttpError(404, f"No existe el thread {thread_id}.")
+            if parts[2] == "resume":
+                if not snapshot.next:
+                    raise HttpError(409, "El thread no está esperando aprobación.")
+                from langgraph.types import Command
+
+                graph_input = Command(resume=command)
+            else:
+                if snapshot.next or not snapshot.values.get("final_report"):
+                    raise HttpError(409, "Solo se puede editar un thread terminado.")
+                if not command:
+                    raise HttpError(400, "Falta 'command'.")
+                graph_input = {"edit_command": command}
+            return await self.run(request, writer, thread_id, graph_input, data)
+
+        raise HttpError(404, f"Ruta desconocida: {request.path}")
+
+    @staticmethod
+    def _require(request: Request, method: str):
+        if request.method != method:
+            raise HttpError(405, f"Se esperaba {method}.")
+
+    @staticmethod
+    def _config(thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id}}
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "active": self._running,
+            "waiting": self._waiting,
+            "connections": self._connections,
+        }
+
+    async def thread_state(self, thread_id: str) -> dict:
+        snapshot = await self.graph.aget_state(self._config(thread_id))
+        if not snapshot.values:
+            raise HttpError(404, f"No existe el thread {thread_id}.")
+        state = dict(snapshot.values)
+        interrupts = [i for task in snapshot.tasks for i in getattr(task, "interrupts", ())]
+        if interrupts:
+            state["__interrupt__"] = interrupts
+        elif snapshot.next:
+            return {"thread_id": thread_id, "status": "running"}
+        return session_result(thread_id, state)
+
+    # --- ejecución del grafo -------------------------------------------------
+
+    async def _acquire(self):
+        if self._active.locked():
+            if self._waiting >= SERVER_MAX_QUEUE:
+                raise HttpError(503, "Servidor saturado, reintentá en unos segundos.", {"Retry-After": "2"})
+            self._waiting += 1
+            try:
+                await self._active.acquire()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._active.acquire()
+
+    async def run(self, request: Request, writer: asyncio.StreamWriter,
+                  thread_id: str, graph_input, data: dict) -> bool:
+        if thread_id in self._busy:
+            raise HttpError(409, f"El thread {thread_id} ya tiene un pedido en curso.")
+        self._busy.add(thread_id)
+        try:
+            await self._acquire()
+            self._running += 1
+            try:
+                if request.wants_stream(data):
+                    await self._run_sse(writer, thread_id, graph_input)
+                    return False
+                state = {}
+                async for kind, value in astream_events(self.graph, graph_input, self._config(thread_id)):
+                    if kind == "state":
+                        state = value
+                await send_json(writer, 200, session_result(thread_id, state), request.keep_alive)
+                return request.keep_alive
+            finally:
+                self._running -= 1
+                self._active.release()
+        finally:
+            self._busy.discard(thread_id)
+
+    async def _run_sse(self, writer: asyncio.StreamWriter, thread_id: str, graph_input):
+        writer.write(_head(200, {
+            "Content-Type": "text/event-stream; charset=utf-8",
+            "Cache-Control": "no-cache",
+            "Connection": "close",
+        }))
+        writer.write(_sse("thread", {"thread_id": thread_id}))
+        await writer.drain()
+        try:
+            async for kind, value in astream_events(self.graph, graph_input, self._config(thread_id)):
+                if kind == "token":
+                    writer.write(_sse("token", {"text": value}))
+                else:
+                    writer.write(_sse("result", session_result(thread_id, value)))
+                await writer.drain()
+        except ConnectionError:
+            return
+        except Exception as exc:
+            # Los headers ya salieron: el error viaja como evento.
+            writer.write(_sse("error", {"error": str(exc) if isinstance(exc, ValueError) else repr(exc)}))
+            await writer.drain()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8000, graph=None):
+    loop = asyncio.get_running_loop()
+    # Acota los hilos que usan to_thread / run_in_executor (nodos sync, checkpointer).
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(1, SERVER_THREADS)))
+
+    app = ResearchServer(graph)
+    server = await asyncio.start_server(app.handle_connection, host, port, backlog=SERVER_MAX_CONNECTIONS)
+    print(f"[server] escuchando en http://{host}:{port}")
+    async with server:
+        await server.serve_forever()